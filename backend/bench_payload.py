@@ -0,0 +1,60 @@
+"""
+Measure DKG asset payload size and serialization cost per embedding encoding.
+
+Usage (from backend/):
+    python bench_payload.py [prophecies] [--model]
+
+Builds knowledge asset content for the given number of prophecies with each
+embededProphet encoding and reports the JSON payload size, the time to build
+and serialize it, and the time to verify every embededProphetHash from the
+payload. Random unit vectors of the bge-large-en dimension are used unless
+--model is given, in which case sample sentences are embedded.
+"""
+import json
+import sys
+import time
+
+import numpy as np
+
+from prophet import Prophet
+from prophet_metadata_dkg import _prophet_node
+from vector_io import EMBEDDING_ENCODINGS, decode_embedding, verify_prophet_hash
+
+DIMENSION = 1024
+
+
+def sample_embeddings(count: int, use_model: bool) -> np.ndarray:
+    if use_model:
+        from embedding import get_embedding_engine
+        return get_embedding_engine().encode([f"Prophecy number {i} will come true" for i in range(count)])
+    vectors = np.random.default_rng(0).normal(size=(count, DIMENSION)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+if __name__ == "__main__":
+    args = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    count = int(args[0]) if args else 100
+    embeddings = sample_embeddings(count, "--model" in sys.argv)
+    texts = [f"Prophecy number {i} will come true" for i in range(count)]
+
+    print(f"{count} prophecies, dimension {embeddings.shape[1]}")
+    baseline = None
+    for encoding in EMBEDDING_ENCODINGS:
+        start = time.perf_counter()
+        nodes = [_prophet_node(Prophet._build_prophet_data(text, embedding, "sha256", "bytes", encoding))
+                 for text, embedding in zip(texts, embeddings)]
+        payload = json.dumps({"public": nodes})
+        build = time.perf_counter() - start
+
+        start = time.perf_counter()
+        parsed = json.loads(payload)["public"]
+        verified = all(verify_prophet_hash(node) for node in parsed)
+        verify = time.perf_counter() - start
+
+        error = max(float(np.abs(decode_embedding(node["embededProphet"], node.get("embededProphetDtype")) - embedding).max())
+                    for node, embedding in zip(parsed, embeddings))
+        size = len(payload.encode())
+        baseline = baseline or size
+        print(f"{encoding:>8}: {size / count / 1024:7.2f} KiB/prophecy ({baseline / size:4.1f}x smaller)  "
+              f"build+serialize {build * 1000 / count:6.3f} ms  parse+verify {verify * 1000 / count:6.3f} ms  "
+              f"hash ok={verified}  max abs error {error:.1e}")
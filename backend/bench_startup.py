@@ -0,0 +1,54 @@
+"""
+Measure worker cold-start cost.
+
+Usage (from backend/, with the usual .env):
+    python bench_startup.py [runs]
+
+Reports the wall time of `import main` in fresh interpreters, then the time each
+deferred client takes to warm up, so the cost moved out of import is visible.
+"""
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+IMPORT_SNIPPET = "import time; t = time.perf_counter(); import main; print(time.perf_counter() - t)"
+
+
+def time_import(runs: int) -> list:
+    timings = []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, "-c", IMPORT_SNIPPET],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout
+        timings.append(float(output.strip().splitlines()[-1]))
+    return timings
+
+
+def time_call(label: str, fn) -> None:
+    start = time.perf_counter()
+    try:
+        fn()
+        print(f"{label:>16}: {time.perf_counter() - start:7.3f}s")
+    except Exception as e:
+        print(f"{label:>16}: failed after {time.perf_counter() - start:.3f}s ({e})")
+
+
+if __name__ == "__main__":
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    timings = time_import(runs)
+    print(f"{'import main':>16}: median {statistics.median(timings):.3f}s, "
+          f"min {min(timings):.3f}s over {runs} runs")
+
+    from chain import warm_up_chain
+    from embedding import warm_up_embedding_engines
+    from prophet_metadata_dkg import get_dkg
+
+    time_call("web3 + contract", warm_up_chain)
+    time_call("dkg", get_dkg)
+    time_call("embedding model", warm_up_embedding_engines)
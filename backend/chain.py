@@ -0,0 +1,75 @@
+import json
+import os
+from functools import lru_cache
+
+
+@lru_cache(maxsize=None)
+def get_web3():
+    """
+    Build the Web3 HTTP client on first use and reuse it afterwards.
+
+    web3 is imported here rather than at module level so importing the API does
+    not pay for it.
+    """
+    from web3 import Web3
+
+    return Web3(Web3.HTTPProvider(os.getenv("WEB3_PROVIDER_URL"), session=get_http_session()))
+
+
+@lru_cache(maxsize=None)
+def get_http_session():
+    """
+    Keep-alive HTTP session shared by the Web3 provider and batched JSON-RPC reads.
+
+    The connection pool size comes from WEB3_POOL_SIZE, so concurrent requests
+    reuse open connections to the node instead of reconnecting each time.
+    """
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    pool_size = int(os.getenv("WEB3_POOL_SIZE", "10"))
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+@lru_cache(maxsize=None)
+def get_prophet_contract():
+    """
+    Instantiate the ProphetNFT contract from PROPHET_CONTRACT_ADDRESS and PROPHET_CONTRACT_ABI.
+
+    Raises:
+        ValueError: If either variable is missing
+    """
+    address = os.getenv("PROPHET_CONTRACT_ADDRESS")
+    abi = os.getenv("PROPHET_CONTRACT_ABI")
+    if not address or not abi:
+        raise ValueError("PROPHET_CONTRACT_ADDRESS and PROPHET_CONTRACT_ABI environment variables are required")
+    web3 = get_web3()
+    return web3.eth.contract(address=web3.to_checksum_address(address), abi=json.loads(abi))
+
+
+@lru_cache(maxsize=None)
+def get_usdc_address() -> str:
+    return get_web3().to_checksum_address(os.getenv("USDC_CONTRACT_ADDRESS"))
+
+
+@lru_cache(maxsize=4096)
+def to_checksum_address(address: str) -> str:
+    from web3 import Web3
+
+    return Web3.to_checksum_address(address)
+
+
+def chain_ready() -> bool:
+    return get_prophet_contract.cache_info().currsize > 0
+
+
+def warm_up_chain() -> None:
+    """
+    Build the Web3 client and contract ahead of the first request.
+    """
+    get_prophet_contract()
+    get_usdc_address()
@@ -0,0 +1,333 @@
+"""
+Index ProphetNFT ProphecyCreated events into Supabase.
+
+Usage (from backend/, with the usual .env):
+    python chain_indexer.py [--once]
+
+Logs are read in block windows with eth_getLogs, decoded, bulk-upserted into
+the prophecies table and embedded in batches; the last processed block is
+checkpointed in SQLite so a restart resumes where it stopped. Only the
+process holding the indexer lease (a row in the same SQLite file) indexes;
+other API workers started with CHAIN_INDEXER=1 wait to take over.
+"""
+import argparse
+import asyncio
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from chain import get_prophet_contract, get_web3, to_checksum_address
+from db import execute, get_supabase
+
+logger = logging.getLogger(__name__)
+
+PROPHECY_CREATED_SIGNATURE = "ProphecyCreated(address,uint256,string,uint256,string,uint256[])"
+
+# Stake token (USDC) decimals; prophecies.betting_amount is stored in whole tokens
+STAKE_TOKEN_DECIMALS = 6
+
+
+class BlockCheckpoint:
+    def __init__(self, db_path: str, name: str = "prophecy_created"):
+        """
+        Last processed block of an indexer, persisted in SQLite.
+        """
+        self.name = name
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS indexer_checkpoints (
+                    name TEXT PRIMARY KEY,
+                    block INTEGER NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            """)
+
+    def get(self) -> Optional[int]:
+        with self._lock:
+            row = self._conn.execute("SELECT block FROM indexer_checkpoints WHERE name = ?", (self.name,)).fetchone()
+        return row[0] if row else None
+
+    def set(self, block: int) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO indexer_checkpoints (name, block, updated_at) VALUES (?, ?, ?)",
+                (self.name, block, time.time()),
+            )
+
+
+class IndexerLease:
+    def __init__(self, db_path: str, name: str = "prophecy_created", lease_seconds: float = 60.0):
+        """
+        Exclusive, expiring lease on an indexer, persisted in SQLite.
+
+        The holder renews the lease while it indexes; when its process dies the
+        lease expires and another process acquires it.
+
+        Args:
+            db_path: SQLite database file shared by the processes competing for the lease
+            name: Indexer the lease is for
+            lease_seconds: How long the lease stays held without a renewal
+        """
+        self.name = name
+        self.lease_seconds = lease_seconds
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS indexer_locks (
+                    name TEXT PRIMARY KEY,
+                    owner TEXT NOT NULL,
+                    expires_at REAL NOT NULL
+                )
+            """)
+
+    def acquire(self) -> bool:
+        """
+        Take or renew the lease.
+
+        Returns:
+            True if this process holds the lease
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute("DELETE FROM indexer_locks WHERE name = ? AND expires_at < ?", (self.name, now))
+                self._conn.execute(
+                    "INSERT OR IGNORE INTO indexer_locks (name, owner, expires_at) VALUES (?, ?, ?)",
+                    (self.name, self.owner, now + self.lease_seconds),
+                )
+                renewed = self._conn.execute(
+                    "UPDATE indexer_locks SET expires_at = ? WHERE name = ? AND owner = ?",
+                    (now + self.lease_seconds, self.name, self.owner),
+                ).rowcount
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return renewed == 1
+
+    def release(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM indexer_locks WHERE name = ? AND owner = ?", (self.name, self.owner))
+
+
+def prophecy_row(event: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Map a decoded ProphecyCreated event to a prophecies row.
+
+    The token id is the prophecy id, as used by the frontend; target dates are
+    unix timestamps on chain and stored as UTC YYYY-MM-DD.
+    """
+    args = event["args"]
+    return {
+        "id": str(args["tokenId"]),
+        "sentence": args["sentence"],
+        "betting_amount": args["bettingAmount"] / 10 ** STAKE_TOKEN_DECIMALS,
+        "oracle": args["oracle"],
+        "target_dates": [datetime.fromtimestamp(ts, tz=timezone.utc).strftime("%Y-%m-%d")
+                         for ts in args["targetDates"]],
+        "creator": to_checksum_address(args["owner"]),
+        "status": "PENDING",
+        "tx_hash": event["transactionHash"].hex(),
+    }
+
+
+class ProphecyEventIndexer:
+    def __init__(self,
+                 prophet,
+                 checkpoint: BlockCheckpoint,
+                 start_block: int = 0,
+                 window: int = 2000,
+                 confirmations: int = 2,
+                 target_date_index=None,
+                 lease: Optional[IndexerLease] = None):
+        """
+        Sync ProphecyCreated events into the prophecies and prophecy_vectors tables.
+
+        Each window of blocks is one eth_getLogs call; the window halves when
+        the node rejects a range and grows back after successful calls. Rows
+        are inserted by token id, leaving already indexed prophecies (and their
+        settlement status) untouched, and only prophecies without a stored
+        vector are embedded, so replaying a range after a crash is harmless.
+
+        Args:
+            prophet: Prophet instance used to embed and store vectors (batch_store)
+            checkpoint: Where the last processed block is kept
+            start_block: First block to scan when there is no checkpoint (deployment block)
+            window: Maximum blocks per eth_getLogs call
+            confirmations: Blocks behind the head to stay, to avoid indexing reorged logs
+            target_date_index: Optional TargetDateIndex kept in sync with new prophecies
+            lease: Optional IndexerLease; when given, only its holder indexes
+        """
+        self.prophet = prophet
+        self.checkpoint = checkpoint
+        self.start_block = start_block
+        self.max_window = window
+        self.window = window
+        self.confirmations = confirmations
+        self.target_date_index = target_date_index
+        self.lease = lease
+        self.web3 = get_web3()
+        self.contract = get_prophet_contract()
+        self.topic = self.web3.keccak(text=PROPHECY_CREATED_SIGNATURE).hex()
+
+    def _get_logs(self, from_block: int, to_block: int) -> List[Any]:
+        return self.web3.eth.get_logs({
+            "address": self.contract.address,
+            "topics": [self.topic],
+            "fromBlock": from_block,
+            "toBlock": to_block,
+        })
+
+    async def fetch_events(self, from_block: int, to_block: int) -> List[Dict[str, Any]]:
+        """
+        Decoded ProphecyCreated events in [from_block, to_block], shrinking the window on RPC errors.
+        """
+        try:
+            logs = await asyncio.to_thread(self._get_logs, from_block, to_block)
+        except Exception as e:
+            if to_block == from_block:
+                raise
+            # Providers cap the range or result size of eth_getLogs; split and retry
+            self.window = max(1, (to_block - from_block + 1) // 2)
+            logger.warning(f"eth_getLogs {from_block}-{to_block} failed ({e}); retrying with window {self.window}")
+            middle = from_block + self.window - 1
+            return await self.fetch_events(from_block, middle) + await self.fetch_events(middle + 1, to_block)
+        event = self.contract.events.ProphecyCreated()
+        return [event.process_log(log) for log in logs]
+
+    async def store(self, rows: List[Dict[str, Any]]) -> None:
+        """
+        Bulk-insert new prophecies, then embed the ones that have no vector yet.
+
+        Prophecies already in the table are skipped rather than overwritten, so
+        replaying a range does not reset a settled prophecy back to PENDING.
+        """
+        if not rows:
+            return
+        supabase = get_supabase()
+        inserted = await execute(supabase.table("prophecies").upsert(rows, on_conflict="id", ignore_duplicates=True))
+        if self.target_date_index is not None:
+            for row in inserted.data or []:
+                self.target_date_index.add(row["id"], row["target_dates"], row["oracle"], row["status"])
+
+        ids = [row["id"] for row in rows]
+        existing = await execute(supabase.table(self.prophet.table_name).select("prophecy_id").in_("prophecy_id", ids))
+        stored = {row["prophecy_id"] for row in existing.data or []}
+        items = [{"id": row["id"], "text": row["sentence"], "oracle": row["oracle"],
+                  "target_dates": row["target_dates"]}
+                 for row in rows if row["id"] not in stored]
+        if items:
+            summary = await self.prophet.batch_store(items)
+            if summary["failed"]:
+                raise RuntimeError(f"Embedding failed for {sum(len(f['ids']) for f in summary['failed'])} prophecies")
+
+    async def sync_once(self) -> int:
+        """
+        Index every confirmed block after the checkpoint.
+
+        Returns:
+            Number of events indexed
+        """
+        head = await asyncio.to_thread(lambda: self.web3.eth.block_number) - self.confirmations
+        last = self.checkpoint.get()
+        from_block = self.start_block if last is None else last + 1
+        indexed = 0
+        while from_block <= head:
+            if self.lease is not None and not self.lease.acquire():
+                logger.warning("Chain indexer lease lost; stopping this sync")
+                break
+            to_block = min(from_block + self.window - 1, head)
+            events = await self.fetch_events(from_block, to_block)
+            # The same token can only be created once; keep the last log per id
+            rows = list({row["id"]: row for row in map(prophecy_row, events)}.values())
+            await self.store(rows)
+            self.checkpoint.set(to_block)
+            indexed += len(rows)
+            logger.info(f"Indexed {len(rows)} prophecies from blocks {from_block}-{to_block}")
+            from_block = to_block + 1
+            self.window = min(self.max_window, self.window * 2)
+        return indexed
+
+    async def _keep_lease(self) -> None:
+        # Renew while a long window is being embedded
+        while True:
+            await asyncio.sleep(self.lease.lease_seconds / 3)
+            self.lease.acquire()
+
+    async def run(self, poll_interval: float = 5.0) -> None:
+        """
+        Poll for new blocks until cancelled, while holding the lease if there is one.
+        """
+        holding = False
+        try:
+            while True:
+                try:
+                    if self.lease is None:
+                        await self.sync_once()
+                    elif self.lease.acquire():
+                        if not holding:
+                            logger.info(f"Chain indexer lease acquired by {self.lease.owner}")
+                        holding = True
+                        keep = asyncio.create_task(self._keep_lease())
+                        try:
+                            await self.sync_once()
+                        finally:
+                            keep.cancel()
+                    else:
+                        holding = False
+                except Exception as e:
+                    logger.error(f"Chain indexer error: {str(e)}")
+                await asyncio.sleep(poll_interval)
+        finally:
+            if holding:
+                self.lease.release()
+
+
+def create_indexer(prophet, target_date_index=None) -> ProphecyEventIndexer:
+    """
+    Build the indexer from INDEXER_DB, INDEXER_START_BLOCK, INDEXER_WINDOW,
+    INDEXER_CONFIRMATIONS and INDEXER_LEASE_SECONDS.
+    """
+    db_path = os.getenv("INDEXER_DB", "indexer.sqlite3")
+    return ProphecyEventIndexer(
+        prophet,
+        BlockCheckpoint(db_path),
+        start_block=int(os.getenv("INDEXER_START_BLOCK", "0")),
+        window=int(os.getenv("INDEXER_WINDOW", "2000")),
+        confirmations=int(os.getenv("INDEXER_CONFIRMATIONS", "2")),
+        target_date_index=target_date_index,
+        lease=IndexerLease(db_path, lease_seconds=float(os.getenv("INDEXER_LEASE_SECONDS", "60"))),
+    )
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+    from prophet import Prophet
+
+    parser = argparse.ArgumentParser(description="Index ProphecyCreated events into Supabase")
+    parser.add_argument("--once", action="store_true", help="Sync up to the current head and exit")
+    args = parser.parse_args()
+
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO)
+    indexer = create_indexer(Prophet())
+    if args.once:
+        if not indexer.lease.acquire():
+            raise SystemExit("Another process holds the chain indexer lease")
+        try:
+            print(f"Indexed {asyncio.run(indexer.sync_once())} prophecies")
+        finally:
+            indexer.lease.release()
+    else:
+        asyncio.run(indexer.run(float(os.getenv("INDEXER_POLL_INTERVAL", "5"))))
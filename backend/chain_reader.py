@@ -0,0 +1,311 @@
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from chain import get_http_session, get_prophet_contract, to_checksum_address
+
+logger = logging.getLogger(__name__)
+
+ZERO_ADDRESS = "0x0000000000000000000000000000000000000000"
+
+# Fields of ProphetNFT.prophecies(tokenId) that never change after minting
+IMMUTABLE_PROPHECY_FIELDS = ("creator", "deposit", "text", "imageCID")
+
+
+class ChainRPCError(Exception):
+    pass
+
+
+class LRUCache:
+    def __init__(self, maxsize: int):
+        """
+        Thread-safe mapping that evicts the least recently used entry beyond maxsize.
+        """
+        self.maxsize = maxsize
+        self._data: "OrderedDict[Any, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key) -> bool:
+        with self._lock:
+            return key in self._data
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._data:
+                return default
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def put(self, key, value) -> None:
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        with self._lock:
+            return self._data.pop(key, default)
+
+
+class ChainReader:
+    def __init__(self,
+                 url: Optional[str] = None,
+                 batch_size: int = 100,
+                 confirmations: int = 2,
+                 ttl: float = 5.0,
+                 cache_size: int = 10000):
+        """
+        Batched JSON-RPC reads of receipts and prophecy data, with caching.
+
+        Many reads are sent as one JSON-RPC batch POST over the pooled session,
+        so checking a burst of prophecies costs a few round-trips. Receipts are
+        cached for good once they are `confirmations` blocks deep and for `ttl`
+        seconds before that; the immutable fields of a prophecy are cached for
+        good once its creation receipt is final, and everything else for `ttl`.
+        Each cache keeps at most `cache_size` entries, evicting the least
+        recently used, so arbitrary hashes and token ids cannot grow it without bound.
+
+        Args:
+            url: JSON-RPC endpoint (defaults to WEB3_PROVIDER_URL)
+            batch_size: Maximum requests per batch POST
+            confirmations: Blocks after which a receipt is treated as final
+            ttl: Seconds to keep reads that may still change
+            cache_size: Maximum entries per cache
+        """
+        self.url = url or os.getenv("WEB3_PROVIDER_URL")
+        self.batch_size = batch_size
+        self.confirmations = confirmations
+        self.ttl = ttl
+        self.session = get_http_session()
+        self._lock = threading.Lock()
+        self._next_id = 0
+        # tx hash -> receipt, and tx hash -> (expires, receipt) before finality
+        self._final_receipts = LRUCache(cache_size)
+        self._recent_receipts = LRUCache(cache_size)
+        # token id -> True once its creation receipt is final
+        self._final_tokens = LRUCache(cache_size)
+        # token id -> immutable fields, and token id -> (expires, prophecy)
+        self._immutable = LRUCache(cache_size)
+        self._recent_prophecies = LRUCache(cache_size)
+
+    def batch(self, calls: List[Tuple[str, List[Any]]]) -> List[Any]:
+        """
+        Send (method, params) calls as JSON-RPC batches.
+
+        Returns:
+            Results in call order; a ChainRPCError instance for calls the node answered with an error
+
+        Raises:
+            ChainRPCError: If a batch POST fails or the response is not a batch
+        """
+        results: List[Any] = []
+        for start in range(0, len(calls), self.batch_size):
+            chunk = calls[start:start + self.batch_size]
+            with self._lock:
+                first_id = self._next_id
+                self._next_id += len(chunk)
+            payload = [{"jsonrpc": "2.0", "id": first_id + i, "method": method, "params": params}
+                       for i, (method, params) in enumerate(chunk)]
+            try:
+                response = self.session.post(self.url, json=payload, timeout=30)
+                response.raise_for_status()
+                body = response.json()
+            except Exception as e:
+                raise ChainRPCError(f"JSON-RPC batch of {len(chunk)} calls failed: {e}") from e
+            if not isinstance(body, list):
+                raise ChainRPCError(f"JSON-RPC batch not supported by the node: {body}")
+            by_id = {item.get("id"): item for item in body}
+            for i, (method, _) in enumerate(chunk):
+                item = by_id.get(first_id + i, {})
+                if "error" in item or "result" not in item:
+                    logger.warning(f"{method} failed in batch: {item.get('error')}")
+                    results.append(ChainRPCError(f"{method} failed: {item.get('error')}"))
+                else:
+                    results.append(item["result"])
+        return results
+
+    def _is_final(self, receipt: Dict[str, Any], head: int) -> bool:
+        return head - int(receipt["blockNumber"], 16) >= self.confirmations
+
+    def get_receipts(self, tx_hashes: Iterable[str]) -> Dict[str, Optional[Dict[str, Any]]]:
+        """
+        Raw receipts by transaction hash (None while unmined), in one batch with the head block.
+
+        Raises:
+            ChainRPCError: If the node fails any of the reads (reads that succeeded are still cached)
+        """
+        receipts: Dict[str, Optional[Dict[str, Any]]] = {}
+        missing = []
+        now = time.monotonic()
+        for tx_hash in dict.fromkeys(h.lower() for h in tx_hashes):
+            final = self._final_receipts.get(tx_hash)
+            recent = self._recent_receipts.get(tx_hash)
+            if final is not None:
+                receipts[tx_hash] = final
+            elif recent is not None and recent[0] > now:
+                receipts[tx_hash] = recent[1]
+            else:
+                missing.append(tx_hash)
+        if not missing:
+            return receipts
+
+        results = self.batch([("eth_blockNumber", [])] + [("eth_getTransactionReceipt", [h]) for h in missing])
+        if isinstance(results[0], ChainRPCError):
+            raise results[0]
+        head = int(results[0], 16)
+        failed = []
+        for tx_hash, receipt in zip(missing, results[1:]):
+            if isinstance(receipt, ChainRPCError):
+                failed.append(tx_hash)
+                continue
+            receipts[tx_hash] = receipt
+            if receipt is None:
+                continue
+            if self._is_final(receipt, head):
+                self._final_receipts.put(tx_hash, receipt)
+                self._recent_receipts.pop(tx_hash)
+            else:
+                self._recent_receipts.put(tx_hash, (now + self.ttl, receipt))
+        if failed:
+            raise ChainRPCError(f"eth_getTransactionReceipt failed for {len(failed)} transactions: {', '.join(failed)}")
+        return receipts
+
+    def verify_prophecies(self, tx_hashes: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Check ProphecyCreated transactions.
+
+        Returns:
+            Per transaction hash: 'status' (missing, failed, confirmed or final)
+            and the decoded 'prophecies' (token id, owner, sentence, betting amount, oracle, target dates)
+        """
+        from hexbytes import HexBytes
+
+        contract = get_prophet_contract()
+        event = contract.events.ProphecyCreated()
+        verified = {}
+        for tx_hash, receipt in self.get_receipts(tx_hashes).items():
+            if receipt is None:
+                verified[tx_hash] = {"status": "missing", "prophecies": []}
+                continue
+            if int(receipt["status"], 16) != 1:
+                verified[tx_hash] = {"status": "failed", "prophecies": []}
+                continue
+            prophecies = []
+            for log in receipt["logs"]:
+                if log["address"].lower() != contract.address.lower():
+                    continue
+                try:
+                    decoded = event.process_log({
+                        "address": to_checksum_address(log["address"]),
+                        "topics": [HexBytes(topic) for topic in log["topics"]],
+                        "data": HexBytes(log["data"]),
+                        "blockHash": HexBytes(log["blockHash"]),
+                        "blockNumber": int(log["blockNumber"], 16),
+                        "transactionHash": HexBytes(log["transactionHash"]),
+                        "transactionIndex": int(log["transactionIndex"], 16),
+                        "logIndex": int(log["logIndex"], 16),
+                    })
+                except Exception:
+                    # Other events of the contract (Transfer, ...)
+                    continue
+                args = decoded["args"]
+                prophecies.append({
+                    "token_id": args["tokenId"],
+                    "owner": to_checksum_address(args["owner"]),
+                    "sentence": args["sentence"],
+                    "betting_amount": args["bettingAmount"],
+                    "oracle": args["oracle"],
+                    "target_dates": list(args["targetDates"]),
+                })
+            if tx_hash in self._final_receipts:
+                status = "final"
+                for p in prophecies:
+                    self._final_tokens.put(p["token_id"], True)
+            else:
+                status = "confirmed"
+            verified[tx_hash] = {"status": status, "prophecies": prophecies}
+        return verified
+
+    def get_prophecies(self, token_ids: Iterable[int], immutable_only: bool = False) -> Dict[int, Optional[Dict[str, Any]]]:
+        """
+        ProphetNFT.prophecies(tokenId) for many tokens in one batch of eth_call.
+
+        Args:
+            token_ids: Token ids to read
+            immutable_only: Only creator, deposit, text and imageCID are needed,
+                so tokens with those fields cached skip the node entirely
+
+        Returns:
+            Decoded prophecy data per token id; None for tokens that do not exist
+
+        Raises:
+            ChainRPCError: If any eth_call fails (reads that succeeded are still cached)
+        """
+        from eth_abi import decode
+
+        contract = get_prophet_contract()
+        fn_abi = next(item for item in contract.abi if item.get("type") == "function" and item["name"] == "prophecies")
+        output_names = [output["name"] for output in fn_abi["outputs"]]
+        output_types = [output["type"] for output in fn_abi["outputs"]]
+
+        prophecies: Dict[int, Optional[Dict[str, Any]]] = {}
+        missing = []
+        now = time.monotonic()
+        for token_id in dict.fromkeys(int(t) for t in token_ids):
+            immutable = self._immutable.get(token_id) if immutable_only else None
+            recent = self._recent_prophecies.get(token_id)
+            if immutable is not None:
+                prophecies[token_id] = dict(immutable)
+            elif recent is not None and recent[0] > now:
+                prophecies[token_id] = recent[1]
+            else:
+                missing.append(token_id)
+        if not missing:
+            return prophecies
+
+        calls = [("eth_call", [{"to": contract.address,
+                                "data": contract.encodeABI(fn_name="prophecies", args=[token_id])}, "latest"])
+                 for token_id in missing]
+        failed = []
+        for token_id, result in zip(missing, self.batch(calls)):
+            if isinstance(result, ChainRPCError):
+                failed.append(token_id)
+                continue
+            data = dict(zip(output_names, decode(output_types, bytes.fromhex(result[2:]))))
+            if data["creator"] == ZERO_ADDRESS:
+                prophecies[token_id] = None
+                continue
+            data["creator"] = to_checksum_address(data["creator"])
+            prophecies[token_id] = data
+            self._recent_prophecies.put(token_id, (now + self.ttl, data))
+            if token_id in self._final_tokens:
+                self._immutable.put(token_id,
+                                    {field: data[field] for field in IMMUTABLE_PROPHECY_FIELDS if field in data})
+        if failed:
+            raise ChainRPCError(f"prophecies() failed for tokens {', '.join(map(str, failed))}")
+        return prophecies
+
+
+_reader: Optional[ChainReader] = None
+
+
+def get_chain_reader() -> ChainReader:
+    """
+    Shared reader configured from WEB3_BATCH_SIZE, CHAIN_FINALITY_CONFIRMATIONS, CHAIN_CACHE_TTL and CHAIN_CACHE_SIZE.
+    """
+    global _reader
+    if _reader is None:
+        _reader = ChainReader(
+            batch_size=int(os.getenv("WEB3_BATCH_SIZE", "100")),
+            confirmations=int(os.getenv("CHAIN_FINALITY_CONFIRMATIONS", "2")),
+            ttl=float(os.getenv("CHAIN_CACHE_TTL", "5")),
+            cache_size=int(os.getenv("CHAIN_CACHE_SIZE", "10000")),
+        )
+    return _reader
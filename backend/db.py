@@ -0,0 +1,76 @@
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Optional
+
+from supabase import create_client, Client
+from supabase.lib.client_options import ClientOptions
+
+_client: Optional[Client] = None
+_executor: Optional[ThreadPoolExecutor] = None
+_lock = threading.Lock()
+
+
+def get_supabase() -> Client:
+    """
+    Return the process-wide Supabase client.
+
+    Every module shares this client, and with it one keep-alive HTTP connection
+    pool. The request timeout comes from SUPABASE_TIMEOUT (seconds, default 10).
+
+    Raises:
+        ValueError: If SUPABASE_URL or SUPABASE_KEY is not set
+    """
+    global _client
+    with _lock:
+        if _client is None:
+            url = os.getenv("SUPABASE_URL")
+            key = os.getenv("SUPABASE_KEY")
+            if not url or not key:
+                raise ValueError("SUPABASE_URL and SUPABASE_KEY environment variables are required")
+            timeout = float(os.getenv("SUPABASE_TIMEOUT", "10"))
+            _client = create_client(url, key, options=ClientOptions(postgrest_client_timeout=timeout))
+    return _client
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=int(os.getenv("SUPABASE_POOL_SIZE", "10")),
+                thread_name_prefix="supabase",
+            )
+    return _executor
+
+
+async def execute(query: Any, timeout: Optional[float] = None) -> Any:
+    """
+    Run a Supabase query builder's execute() without blocking the event loop.
+
+    Calls run on a bounded thread pool (SUPABASE_POOL_SIZE workers), which also
+    caps the number of concurrent HTTP requests to Supabase.
+
+    Args:
+        query: Query or RPC builder, e.g. get_supabase().table("prophecies").select("*")
+        timeout: Seconds to wait before giving up (defaults to SUPABASE_TIMEOUT)
+
+    Returns:
+        The API response
+
+    Raises:
+        asyncio.TimeoutError: If the call takes longer than timeout
+    """
+    if timeout is None:
+        timeout = float(os.getenv("SUPABASE_TIMEOUT", "10"))
+    loop = asyncio.get_running_loop()
+    return await asyncio.wait_for(loop.run_in_executor(_get_executor(), query.execute), timeout)
+
+
+def shutdown() -> None:
+    global _executor
+    with _lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False)
+            _executor = None
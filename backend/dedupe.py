@@ -0,0 +1,153 @@
+import os
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from db import execute
+from embedding_cache import text_hash
+from vector_index import local_index_enabled
+
+# Nearest neighbours fetched from match_prophecies when the local index is not ready
+DEDUPE_RPC_CANDIDATES = 20
+
+
+def dedupe_enabled() -> bool:
+    return os.getenv("PROPHECY_DEDUPE", "1").lower() not in ("0", "false", "no")
+
+
+def dedupe_threshold() -> float:
+    return float(os.getenv("PROPHECY_DEDUPE_THRESHOLD", "0.97"))
+
+
+async def find_duplicate(supabase,
+                         index,
+                         text: str,
+                         embedding: np.ndarray,
+                         oracle: Optional[str] = None,
+                         threshold: Optional[float] = None,
+                         table_name: str = "prophecy_vectors") -> Optional[Dict[str, Any]]:
+    """
+    Find the canonical prophecy that the given text duplicates, within its oracle.
+
+    Duplicates are detected only to link them: the caller still stores the
+    vector, with canonical_id pointing at the returned prophecy, so settlement
+    and search treat the duplicate like any other prophecy.
+
+    Args:
+        supabase: Client used while the local index is not ready
+        index: Process-wide PartitionedVectorIndex
+        text: Text about to be stored
+        embedding: Its normalized embedding
+        oracle: Only match prophecies of this oracle
+        threshold: Minimum similarity for a near-duplicate (defaults to PROPHECY_DEDUPE_THRESHOLD)
+        table_name: Vector table holding canonical_id links
+
+    Returns:
+        {"prophecy_id", "similarity", "exact"} for the canonical prophecy, or None
+    """
+    threshold = dedupe_threshold() if threshold is None else threshold
+    if local_index_enabled() and index.ready:
+        return index.find_duplicate(text, embedding, threshold, oracle=oracle)
+
+    # Normalized-equal texts share a cached embedding, so they come back first with similarity 1
+    response = await execute(supabase.rpc(
+        'match_prophecies',
+        {
+            'query_embedding': embedding.tolist(),
+            'match_threshold': threshold,
+            'match_count': DEDUPE_RPC_CANDIDATES
+        }
+    ))
+    similarities = {item["prophecy_id"]: item["similarity"] for item in response.data or []}
+    if not similarities:
+        return None
+    candidate_ids: List[str] = list(similarities)
+    if oracle:
+        rows = await execute(supabase.table("prophecies").select("id").in_("id", candidate_ids).eq("oracle", oracle))
+        allowed = {row["id"] for row in rows.data or []}
+        candidate_ids = [prophecy_id for prophecy_id in candidate_ids if prophecy_id in allowed]
+        if not candidate_ids:
+            return None
+
+    rows = await execute(
+        supabase.table(table_name).select("prophecy_id,text,canonical_id").in_("prophecy_id", candidate_ids)
+    )
+    stored = {row["prophecy_id"]: row for row in rows.data or []}
+    digest = text_hash(text)
+    exact = [prophecy_id for prophecy_id in candidate_ids
+             if prophecy_id in stored and text_hash(stored[prophecy_id]["text"]) == digest]
+    match = exact[0] if exact else candidate_ids[0]
+    canonical = (stored.get(match) or {}).get("canonical_id") or match
+    return {"prophecy_id": canonical, "similarity": similarities[match], "exact": bool(exact)}
+
+
+async def collapse_duplicates(supabase,
+                              matches: List[Dict[str, Any]],
+                              table_name: str = "prophecy_vectors") -> List[Dict[str, Any]]:
+    """
+    Keep the best match per canonical prophecy, reported under the canonical id.
+
+    Args:
+        supabase: Client used to look up canonical_id links
+        matches: Rows with 'prophecy_id' and 'similarity', best first
+        table_name: Vector table holding canonical_id links
+
+    Returns:
+        The matches with duplicates of an earlier match removed
+    """
+    if not matches or not dedupe_enabled():
+        return matches
+    rows = await execute(
+        supabase.table(table_name).select("prophecy_id,canonical_id")
+        .in_("prophecy_id", [item["prophecy_id"] for item in matches])
+    )
+    canonical = {row["prophecy_id"]: row.get("canonical_id") or row["prophecy_id"] for row in rows.data or []}
+    collapsed: Dict[str, Dict[str, Any]] = {}
+    for item in matches:
+        canonical_id = canonical.get(item["prophecy_id"], item["prophecy_id"])
+        if canonical_id not in collapsed:
+            collapsed[canonical_id] = dict(item, prophecy_id=canonical_id)
+    return list(collapsed.values())
+
+
+async def match_distinct(supabase,
+                         embedding: np.ndarray,
+                         limit: int,
+                         threshold: float,
+                         oracle: Optional[str] = None,
+                         rpc_name: str = "match_prophecies",
+                         table_name: str = "prophecy_vectors",
+                         max_rounds: int = 4) -> List[Dict[str, Any]]:
+    """
+    Up to limit distinct prophecies from the match RPC, filtered by oracle and collapsed by canonical_id.
+
+    The RPC is over-fetched, and asked again for four times as many rows
+    while duplicates or other oracles leave fewer than limit matches.
+
+    Returns:
+        RPC rows ({"prophecy_id", "similarity", ...}) ordered by similarity
+    """
+    count = limit * 4
+    for _ in range(max_rounds):
+        response = await execute(supabase.rpc(
+            rpc_name,
+            {
+                'query_embedding': embedding.tolist(),
+                'match_threshold': threshold,
+                'match_count': count
+            }
+        ))
+        rows = response.data or []
+        matches = rows
+        if oracle and matches:
+            allowed = await execute(
+                supabase.table("prophecies").select("id").in_("id", [item["prophecy_id"] for item in matches])
+                .eq("oracle", oracle)
+            )
+            allowed_ids = {row["id"] for row in allowed.data or []}
+            matches = [item for item in matches if item["prophecy_id"] in allowed_ids]
+        matches = await collapse_duplicates(supabase, matches, table_name)
+        if len(matches) >= limit or len(rows) < count:
+            break
+        count *= 4
+    return matches[:limit]
@@ -0,0 +1,364 @@
+import asyncio
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+JobHandler = Callable[[Dict[str, Any]], Awaitable[str]]
+# Returns a UAL or an exception for each job id
+BatchJobHandler = Callable[[List[Dict[str, Any]]], Awaitable[Dict[str, Union[str, Exception]]]]
+
+
+class DKGJobQueue:
+    def __init__(self,
+                 db_path: str,
+                 handler: JobHandler,
+                 workers: int = 2,
+                 max_attempts: int = 5,
+                 base_backoff: float = 2.0,
+                 max_backoff: float = 300.0,
+                 poll_interval: float = 1.0,
+                 batch_handler: Optional[BatchJobHandler] = None,
+                 batch_size: int = 1,
+                 batch_max_wait: float = 0.0,
+                 lease_seconds: float = 120.0):
+        """
+        Durable SQLite-backed queue that publishes prophecies to the DKG in the background.
+
+        Jobs survive restarts and may be shared by several processes: a claimed
+        job carries its owner and a lease that is renewed while it is being
+        published, and only jobs whose lease has expired (their process died)
+        are returned to pending. Failed attempts are retried with exponential
+        backoff until max_attempts is reached.
+
+        With a batch_handler, workers accumulate pending jobs and flush them
+        together once batch_size jobs are waiting or the oldest has waited
+        batch_max_wait seconds.
+
+        Args:
+            db_path: SQLite database file (":memory:" for a throwaway queue)
+            handler: Coroutine that publishes one job and returns its UAL
+            workers: Number of concurrent publishing workers
+            max_attempts: Attempts before a job is marked failed
+            base_backoff: Delay in seconds before the first retry, doubled on each attempt
+            max_backoff: Upper bound on the retry delay in seconds
+            poll_interval: Seconds an idle worker waits before checking for new jobs
+            batch_handler: Coroutine that publishes several jobs at once (enables batch mode)
+            batch_size: Number of pending jobs that triggers a flush
+            batch_max_wait: Seconds after which a partial batch is flushed anyway
+            lease_seconds: How long a claimed job stays owned without a renewal
+        """
+        self.handler = handler
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.poll_interval = poll_interval
+        self.batch_handler = batch_handler
+        self.batch_size = max(1, batch_size)
+        self.batch_max_wait = batch_max_wait
+        self.lease_seconds = lease_seconds
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._create_schema()
+
+    def _create_schema(self) -> None:
+        with self._lock:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS dkg_jobs (
+                    id TEXT PRIMARY KEY,
+                    prophecy_id TEXT NOT NULL,
+                    options TEXT,
+                    status TEXT NOT NULL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    ual TEXT,
+                    error TEXT,
+                    next_run_at REAL NOT NULL,
+                    owner TEXT,
+                    lease_expires_at REAL,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            """)
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_dkg_jobs_status ON dkg_jobs(status, next_run_at)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_dkg_jobs_prophecy ON dkg_jobs(prophecy_id, status)"
+            )
+
+    @staticmethod
+    def _to_dict(row: sqlite3.Row) -> Dict[str, Any]:
+        job = dict(row)
+        job["options"] = json.loads(job["options"]) if job["options"] else None
+        return job
+
+    def enqueue(self, prophecy_id: str, options: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Add a publish job and wake an idle worker.
+
+        Returns:
+            The new job
+        """
+        now = time.time()
+        job_id = str(uuid.uuid4())
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO dkg_jobs (id, prophecy_id, options, status, next_run_at, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (job_id, prophecy_id, json.dumps(options) if options else None, PENDING, now, now, now),
+            )
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return self.get(job_id)
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM dkg_jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._to_dict(row) if row else None
+
+    def find_active(self, prophecy_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Return the pending or running job for a prophecy, if one exists.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM dkg_jobs WHERE prophecy_id = ? AND status IN (?, ?) ORDER BY created_at LIMIT 1",
+                (prophecy_id, PENDING, RUNNING),
+            ).fetchone()
+        return self._to_dict(row) if row else None
+
+    def claim(self) -> Optional[Dict[str, Any]]:
+        """
+        Atomically move the oldest due pending job to running.
+        """
+        jobs = self._claim(1, 0.0)
+        return jobs[0] if jobs else None
+
+    def claim_batch(self) -> List[Dict[str, Any]]:
+        """
+        Atomically claim up to batch_size due jobs, or none if the batch is not ready to flush.
+        """
+        return self._claim(self.batch_size, self.batch_max_wait)
+
+    def _claim(self, limit: int, max_wait: float) -> List[Dict[str, Any]]:
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = self._conn.execute(
+                    "SELECT * FROM dkg_jobs WHERE status = ? AND next_run_at <= ? "
+                    "ORDER BY created_at LIMIT ?",
+                    (PENDING, now, limit),
+                ).fetchall()
+                # Hold a partial batch open until its oldest job has waited long enough
+                if len(rows) < limit and rows and rows[0]["created_at"] > now - max_wait:
+                    rows = []
+                if rows:
+                    self._conn.executemany(
+                        "UPDATE dkg_jobs SET status = ?, attempts = attempts + 1, owner = ?, "
+                        "lease_expires_at = ?, updated_at = ? WHERE id = ?",
+                        [(RUNNING, self.owner, now + self.lease_seconds, now, row["id"]) for row in rows],
+                    )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+        jobs = []
+        for row in rows:
+            job = self._to_dict(row)
+            job["attempts"] += 1
+            job["status"] = RUNNING
+            job["owner"] = self.owner
+            job["lease_expires_at"] = now + self.lease_seconds
+            jobs.append(job)
+        return jobs
+
+    def renew(self, job_ids: List[str]) -> int:
+        """
+        Extend the lease of jobs this queue is still publishing.
+
+        Returns:
+            Number of leases renewed
+        """
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.executemany(
+                "UPDATE dkg_jobs SET lease_expires_at = ?, updated_at = ? WHERE id = ? AND status = ? AND owner = ?",
+                [(now + self.lease_seconds, now, job_id, RUNNING, self.owner) for job_id in job_ids],
+            )
+        return cursor.rowcount
+
+    async def _keep_leases(self, job_ids: List[str]) -> None:
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            await asyncio.to_thread(self.renew, job_ids)
+
+    def complete(self, job_id: str, ual: str) -> None:
+        with self._lock:
+            self._conn.execute(
+                "UPDATE dkg_jobs SET status = ?, ual = ?, error = NULL, owner = NULL, lease_expires_at = NULL, "
+                "updated_at = ? WHERE id = ? AND owner = ?",
+                (DONE, ual, time.time(), job_id, self.owner),
+            )
+
+    def fail(self, job: Dict[str, Any], error: str) -> None:
+        """
+        Record a failed attempt, scheduling a retry with backoff or giving up.
+        """
+        now = time.time()
+        if job["attempts"] >= self.max_attempts:
+            status, next_run_at = FAILED, now
+        else:
+            delay = min(self.max_backoff, self.base_backoff * 2 ** (job["attempts"] - 1))
+            status, next_run_at = PENDING, now + delay
+        with self._lock:
+            self._conn.execute(
+                "UPDATE dkg_jobs SET status = ?, error = ?, next_run_at = ?, owner = NULL, lease_expires_at = NULL, "
+                "updated_at = ? WHERE id = ? AND owner = ?",
+                (status, error, next_run_at, now, job["id"], self.owner),
+            )
+
+    def recover(self) -> int:
+        """
+        Return running jobs whose lease has expired (their process stopped) to the pending state.
+
+        Jobs still leased by a live process, including other workers sharing
+        the database, are left alone.
+        """
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE dkg_jobs SET status = ?, next_run_at = ?, owner = NULL, lease_expires_at = NULL, "
+                "updated_at = ? WHERE status = ? AND (lease_expires_at IS NULL OR lease_expires_at < ?)",
+                (PENDING, now, now, RUNNING, now),
+            )
+        return cursor.rowcount
+
+    async def process_one(self) -> bool:
+        """
+        Claim and publish a single job.
+
+        Returns:
+            True if a job was processed, False if none was due
+        """
+        if self.batch_handler is not None:
+            return await self.process_batch()
+
+        job = await asyncio.to_thread(self.claim)
+        if job is None:
+            return False
+        lease = asyncio.create_task(self._keep_leases([job["id"]]))
+        try:
+            ual = await self.handler(job)
+        except Exception as e:
+            logger.error(f"DKG job {job['id']} attempt {job['attempts']} failed: {str(e)}")
+            await asyncio.to_thread(self.fail, job, str(e))
+        else:
+            logger.info(f"DKG job {job['id']} published with UAL: {ual}")
+            await asyncio.to_thread(self.complete, job["id"], ual)
+        finally:
+            lease.cancel()
+        return True
+
+    async def process_batch(self) -> bool:
+        """
+        Claim and publish a batch of jobs if one is ready to flush.
+
+        Returns:
+            True if a batch was processed, False otherwise
+        """
+        jobs = await asyncio.to_thread(self.claim_batch)
+        if not jobs:
+            return False
+        lease = asyncio.create_task(self._keep_leases([job["id"] for job in jobs]))
+        try:
+            results = await self.batch_handler(jobs)
+        except Exception as e:
+            results = {job["id"]: e for job in jobs}
+        finally:
+            lease.cancel()
+
+        for job in jobs:
+            result = results.get(job["id"], RuntimeError("No result returned for job"))
+            if isinstance(result, Exception):
+                logger.error(f"DKG job {job['id']} attempt {job['attempts']} failed: {str(result)}")
+                await asyncio.to_thread(self.fail, job, str(result))
+            else:
+                await asyncio.to_thread(self.complete, job["id"], result)
+        logger.info(f"Processed batch of {len(jobs)} DKG jobs")
+        return True
+
+    async def _worker(self) -> None:
+        while True:
+            try:
+                if await self.process_one():
+                    continue
+            except Exception as e:
+                logger.error(f"DKG worker error: {str(e)}")
+            try:
+                # Pick up jobs of processes that died while publishing
+                recovered = await asyncio.to_thread(self.recover)
+                if recovered:
+                    logger.info(f"Recovered {recovered} DKG jobs with expired leases")
+                    continue
+            except Exception as e:
+                logger.error(f"DKG lease recovery error: {str(e)}")
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self) -> None:
+        """
+        Recover jobs with expired leases and start the workers on the running event loop.
+        """
+        recovered = self.recover()
+        if recovered:
+            logger.info(f"Recovered {recovered} interrupted DKG jobs")
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+
+def create_job_queue(handler: JobHandler, batch_handler: Optional[BatchJobHandler] = None) -> DKGJobQueue:
+    """
+    Build the queue from DKG_JOB_DB, DKG_WORKERS, DKG_MAX_ATTEMPTS and DKG_LEASE_SECONDS.
+
+    Batch mode is enabled when DKG_BATCH_SIZE is greater than 1 and a
+    batch_handler is given; DKG_BATCH_MAX_WAIT sets the flush timeout in seconds.
+    """
+    batch_size = int(os.getenv("DKG_BATCH_SIZE", "1"))
+    return DKGJobQueue(
+        os.getenv("DKG_JOB_DB", "dkg_jobs.sqlite3"),
+        handler,
+        workers=int(os.getenv("DKG_WORKERS", "2")),
+        max_attempts=int(os.getenv("DKG_MAX_ATTEMPTS", "5")),
+        batch_handler=batch_handler if batch_size > 1 else None,
+        batch_size=batch_size,
+        batch_max_wait=float(os.getenv("DKG_BATCH_MAX_WAIT", "30")),
+        lease_seconds=float(os.getenv("DKG_LEASE_SECONDS", "120")),
+    )
@@ -0,0 +1,234 @@
+import asyncio
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+
+class DKGPublishRegistry:
+    def __init__(self, db_path: str, claim_seconds: float = 120.0, poll_interval: float = 1.0):
+        """
+        Local record of prophecies already published to the DKG.
+
+        Maps each urn:prophet: id (and its embededProphetHash) to the UAL of the
+        asset holding it, so repeat publish requests are answered without
+        embedding or touching the chain. Publishes in progress are claimed per
+        urn with an expiring row in the same database, so concurrent requests
+        for the same prophecy, from this or another process sharing the file,
+        wait on the first one instead of publishing it again.
+
+        Args:
+            db_path: SQLite database file (":memory:" for a throwaway registry)
+            claim_seconds: How long a publish claim stays held without a renewal
+            poll_interval: Seconds between checks while another process publishes
+        """
+        self.claim_seconds = claim_seconds
+        self.poll_interval = poll_interval
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        self._in_flight: Dict[str, asyncio.Future] = {}
+        with self._lock:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS dkg_assets (
+                    urn TEXT PRIMARY KEY,
+                    ual TEXT NOT NULL,
+                    embedding_hash TEXT,
+                    prophecy_id TEXT,
+                    created_at REAL NOT NULL
+                )
+            """)
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS dkg_claims (
+                    urn TEXT PRIMARY KEY,
+                    owner TEXT NOT NULL,
+                    expires_at REAL NOT NULL
+                )
+            """)
+
+    def get(self, urn: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM dkg_assets WHERE urn = ?", (urn,)).fetchone()
+        return dict(row) if row else None
+
+    def get_many(self, urns: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        urns = list(set(urns))
+        found = {}
+        # Stay under SQLite's bound-parameter limit
+        for start in range(0, len(urns), 500):
+            chunk = urns[start:start + 500]
+            with self._lock:
+                rows = self._conn.execute(
+                    f"SELECT * FROM dkg_assets WHERE urn IN ({','.join('?' * len(chunk))})", chunk
+                ).fetchall()
+            found.update({row["urn"]: dict(row) for row in rows})
+        return found
+
+    def record(self,
+               urn: str,
+               ual: str,
+               embedding_hash: Optional[str] = None,
+               prophecy_id: Optional[str] = None) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO dkg_assets (urn, ual, embedding_hash, prophecy_id, created_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (urn, ual, embedding_hash, prophecy_id, time.time()),
+            )
+
+    def in_flight(self, urn: str) -> Optional[asyncio.Future]:
+        """
+        The pending publish of urn started on this process, if any.
+        """
+        return self._in_flight.get(urn)
+
+    def _claim(self, urn: str) -> bool:
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute("DELETE FROM dkg_claims WHERE urn = ? AND expires_at < ?", (urn, now))
+                claimed = self._conn.execute(
+                    "INSERT OR IGNORE INTO dkg_claims (urn, owner, expires_at) VALUES (?, ?, ?)",
+                    (urn, self.owner, now + self.claim_seconds),
+                ).rowcount
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return claimed == 1
+
+    def _release(self, urn: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM dkg_claims WHERE urn = ? AND owner = ?", (urn, self.owner))
+
+    def claimed_elsewhere(self, urn: str) -> bool:
+        """
+        Whether another process holds an unexpired publish claim on urn.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT 1 FROM dkg_claims WHERE urn = ? AND owner != ? AND expires_at >= ?",
+                (urn, self.owner, time.time()),
+            ).fetchone()
+        return row is not None
+
+    def renew(self, urns: List[str]) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "UPDATE dkg_claims SET expires_at = ? WHERE urn = ? AND owner = ?",
+                [(now + self.claim_seconds, urn, self.owner) for urn in urns],
+            )
+
+    async def keep_claims(self, urns: List[str]) -> None:
+        """
+        Renew the claims on urns until cancelled; run as a task while publishing.
+        """
+        while True:
+            await asyncio.sleep(self.claim_seconds / 3)
+            self.renew(urns)
+
+    def begin(self, urn: str) -> Optional[asyncio.Future]:
+        """
+        Claim urn for publishing; other callers on this process can await the returned future.
+
+        Returns:
+            The future, or None if another process already holds the claim
+        """
+        if not self._claim(urn):
+            return None
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[urn] = future
+        return future
+
+    async def wait_elsewhere(self, urn: str) -> Optional[str]:
+        """
+        Wait for another process's publish of urn to end.
+
+        Returns:
+            The recorded UAL, or None if the claim was released or expired without one
+        """
+        while self.claimed_elsewhere(urn):
+            existing = self.get(urn)
+            if existing:
+                return existing["ual"]
+            await asyncio.sleep(self.poll_interval)
+        existing = self.get(urn)
+        return existing["ual"] if existing else None
+
+    def finish(self,
+               urn: str,
+               ual: str,
+               embedding_hash: Optional[str] = None,
+               prophecy_id: Optional[str] = None) -> None:
+        self.record(urn, ual, embedding_hash, prophecy_id)
+        self._release(urn)
+        future = self._in_flight.pop(urn, None)
+        if future is not None and not future.done():
+            future.set_result(ual)
+
+    def abort(self, urn: str, error: Exception) -> None:
+        future = self._in_flight.pop(urn, None)
+        if future is None:
+            return
+        self._release(urn)
+        if not future.done():
+            future.set_exception(error)
+            # Nobody may be waiting; mark the exception as retrieved
+            future.exception()
+
+    async def publish_once(self,
+                           urn: str,
+                           publish: Callable[[], Awaitable[Tuple[str, Optional[str]]]],
+                           prophecy_id: Optional[str] = None) -> str:
+        """
+        Return the UAL for urn, publishing it only if it is neither recorded nor
+        being published here or by another process.
+
+        Args:
+            urn: urn:prophet: id of the prophecy
+            publish: Coroutine factory returning (UAL, embededProphetHash)
+            prophecy_id: Prophecy id to record with the UAL
+
+        Returns:
+            UAL of the asset holding the prophecy
+        """
+        while True:
+            existing = self.get(urn)
+            if existing:
+                return existing["ual"]
+            pending = self.in_flight(urn)
+            if pending is not None:
+                return await asyncio.shield(pending)
+            if self.begin(urn) is not None:
+                break
+            ual = await self.wait_elsewhere(urn)
+            if ual is not None:
+                return ual
+            # The other process gave up; try to claim it ourselves
+
+        keep = asyncio.create_task(self.keep_claims([urn]))
+        try:
+            ual, embedding_hash = await publish()
+        except Exception as e:
+            self.abort(urn, e)
+            raise
+        finally:
+            keep.cancel()
+        self.finish(urn, ual, embedding_hash, prophecy_id)
+        return ual
+
+
+def create_publish_registry() -> DKGPublishRegistry:
+    """
+    Build the registry from DKG_REGISTRY_DB and DKG_CLAIM_SECONDS.
+    """
+    return DKGPublishRegistry(
+        os.getenv("DKG_REGISTRY_DB", "dkg_registry.sqlite3"),
+        claim_seconds=float(os.getenv("DKG_CLAIM_SECONDS", "120")),
+    )
@@ -0,0 +1,179 @@
+import os
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from embedding_backends import create_backend
+from embedding_cache import EmbeddingCache, get_embedding_cache, normalize_text
+
+DEFAULT_MODEL_NAME = "BAAI/bge-large-en"
+
+EngineKey = Tuple[str, str, str, str, Optional[int], bool]
+
+
+class EmbeddingEngine:
+    def __init__(self,
+                 model_name: str = DEFAULT_MODEL_NAME,
+                 device: Optional[str] = None,
+                 precision: str = "float32",
+                 cache: Optional[EmbeddingCache] = None,
+                 backend: str = "torch",
+                 num_threads: Optional[int] = None,
+                 quantize: bool = False):
+        """
+        Lazily loaded embedding model shared by every consumer in the process.
+
+        Args:
+            model_name: Name of the sentence transformer model to use
+            device: Torch device ("cpu", "cuda", ...); None lets the library choose
+            precision: Model weight precision ("float32" or "float16", torch backend only)
+            cache: Embedding cache consulted before running the model (None disables caching)
+            backend: Inference backend ("torch" or "onnx")
+            num_threads: CPU thread count for inference (library default when None)
+            quantize: Use an int8 quantized model (onnx backend only)
+        """
+        if precision not in ("float32", "float16"):
+            raise ValueError(f"Unsupported precision: {precision}. Use 'float32' or 'float16'")
+
+        self.model_name = model_name
+        self.device = device
+        self.precision = precision
+        self.cache = cache
+        self.backend = create_backend(backend, model_name, device=device, precision=precision,
+                                      num_threads=num_threads, quantize=quantize)
+        # Outputs of other configurations differ slightly, so they get their own cache entries
+        default_config = backend == "torch" and precision == "float32"
+        self.cache_namespace = model_name if default_config else \
+            f"{model_name}|{backend}|{precision}{'|int8' if quantize else ''}"
+        self._model = None
+        self._lock = threading.Lock()
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._model is not None
+
+    @property
+    def model(self):
+        """
+        Return the backend's loaded model, loading it on first access.
+        """
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    self._model = self._load_model()
+        return self._model
+
+    def _load_model(self):
+        print(f"Loading model: {self.model_name} (backend={self.backend.name}, "
+              f"device={self.device or 'auto'}, precision={self.precision})")
+        return self.backend.load()
+
+    def encode(self, texts: List[str]):
+        """
+        Encode texts into normalized embeddings.
+
+        Args:
+            texts: List of text strings to embed
+
+        Returns:
+            NumPy array of shape (len(texts), dimension)
+        """
+        if self.cache is None:
+            return self.backend.encode(self.model, texts)
+
+        results: List[Optional[np.ndarray]] = [self.cache.get(self.cache_namespace, text) for text in texts]
+
+        # Encode each distinct missing text once, even if it repeats within the batch
+        missing: Dict[str, List[int]] = {}
+        for i, text in enumerate(texts):
+            if results[i] is None:
+                missing.setdefault(normalize_text(text), []).append(i)
+
+        if missing:
+            pending = list(missing)
+            embeddings = self.backend.encode(self.model, [texts[missing[key][0]] for key in pending])
+            for key, embedding in zip(pending, embeddings):
+                self.cache.put(self.cache_namespace, key, embedding)
+                for i in missing[key]:
+                    results[i] = embedding
+
+        return np.stack(results).astype(np.float32, copy=False)
+
+    def warm_up(self) -> None:
+        """
+        Load the model and run one forward pass so the first request does not pay for it.
+        """
+        self.backend.encode(self.model, ["warm up"])
+
+
+_engines: Dict[EngineKey, EmbeddingEngine] = {}
+_engines_lock = threading.Lock()
+
+
+def get_embedding_engine(model_name: Optional[str] = None,
+                         device: Optional[str] = None,
+                         precision: Optional[str] = None,
+                         backend: Optional[str] = None) -> EmbeddingEngine:
+    """
+    Return the process-wide engine for (model name, device, precision, backend), creating it if needed.
+
+    Unspecified arguments fall back to the EMBEDDING_MODEL, EMBEDDING_DEVICE,
+    EMBEDDING_PRECISION and EMBEDDING_BACKEND environment variables; the thread
+    count and ONNX quantization come from EMBEDDING_THREADS and
+    EMBEDDING_ONNX_QUANTIZE. The model itself is only loaded on first use or by
+    an explicit warm_up().
+    """
+    model_name = model_name or os.getenv("EMBEDDING_MODEL", DEFAULT_MODEL_NAME)
+    device = device or os.getenv("EMBEDDING_DEVICE") or None
+    precision = precision or os.getenv("EMBEDDING_PRECISION", "float32")
+    backend = backend or os.getenv("EMBEDDING_BACKEND", "torch")
+    num_threads = int(os.getenv("EMBEDDING_THREADS", "0")) or None
+    quantize = os.getenv("EMBEDDING_ONNX_QUANTIZE", "").lower() in ("1", "true", "yes")
+
+    key = (model_name, device or "auto", precision, backend, num_threads, quantize)
+    with _engines_lock:
+        engine = _engines.get(key)
+        if engine is None:
+            engine = EmbeddingEngine(model_name, device=device, precision=precision,
+                                     cache=get_embedding_cache(), backend=backend,
+                                     num_threads=num_threads, quantize=quantize)
+            _engines[key] = engine
+    return engine
+
+
+def warm_up_embedding_engines(*engines: EmbeddingEngine) -> None:
+    """
+    Eagerly load the given engines, or the default engine when none are given.
+    """
+    for engine in engines or (get_embedding_engine(),):
+        engine.warm_up()
+
+
+def verify_backend_agreement(reference: EmbeddingEngine,
+                             candidate: EmbeddingEngine,
+                             texts: List[str],
+                             min_cosine: float = 0.99) -> float:
+    """
+    Check that two engines produce equivalent embeddings, bypassing the cache.
+
+    Args:
+        reference: Engine to compare against, typically the torch backend
+        candidate: Engine under test, e.g. the onnx backend
+        texts: Sample sentences to embed with both
+        min_cosine: Lowest acceptable per-text cosine similarity
+
+    Returns:
+        Lowest cosine similarity observed
+
+    Raises:
+        ValueError: If any text falls below min_cosine
+    """
+    expected = np.asarray(reference.backend.encode(reference.model, texts), dtype=np.float32)
+    actual = np.asarray(candidate.backend.encode(candidate.model, texts), dtype=np.float32)
+    cosines = (expected * actual).sum(axis=1)
+    worst = float(cosines.min())
+    if worst < min_cosine:
+        raise ValueError(f"Backend disagreement: cosine {worst:.4f} < {min_cosine} "
+                         f"for {texts[int(cosines.argmin())]!r}")
+    return worst
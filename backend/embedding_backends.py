@@ -0,0 +1,200 @@
+import inspect
+import json
+import os
+from typing import Any, List, Optional
+
+import numpy as np
+
+EMBEDDING_BACKENDS = ("torch", "onnx")
+
+
+def _normalize(embeddings: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (embeddings / norms).astype(np.float32, copy=False)
+
+
+class SentenceTransformerBackend:
+    name = "torch"
+
+    def __init__(self,
+                 model_name: str,
+                 device: Optional[str] = None,
+                 precision: str = "float32",
+                 num_threads: Optional[int] = None):
+        """
+        PyTorch eager inference through sentence-transformers.
+
+        Args:
+            model_name: Name of the sentence transformer model to use
+            device: Torch device ("cpu", "cuda", ...); None lets the library choose
+            precision: Model weight precision ("float32" or "float16")
+            num_threads: Intra-op CPU thread count (library default when None)
+        """
+        self.model_name = model_name
+        self.device = device
+        self.precision = precision
+        self.num_threads = num_threads
+
+    def load(self) -> Any:
+        import torch
+        from sentence_transformers import SentenceTransformer
+
+        if self.num_threads:
+            torch.set_num_threads(self.num_threads)
+        model = SentenceTransformer(self.model_name, device=self.device)
+        if self.precision == "float16":
+            model = model.half()
+        return model
+
+    def encode(self, model: Any, texts: List[str]) -> np.ndarray:
+        return model.encode(texts, normalize_embeddings=True)
+
+
+class OnnxBackend:
+    name = "onnx"
+
+    def __init__(self,
+                 model_name: str,
+                 num_threads: Optional[int] = None,
+                 quantize: bool = False,
+                 cache_dir: Optional[str] = None,
+                 batch_size: int = 32,
+                 max_length: int = 512):
+        """
+        CPU inference through ONNX Runtime, optionally with int8 dynamic quantization.
+
+        The transformer is exported to ONNX on first use (requires torch and
+        transformers once) and reused from cache_dir afterwards. Pooling follows
+        the sentence-transformers pooling config of the model (CLS for bge), which
+        is read at export time and saved next to the exported model.
+
+        Args:
+            model_name: Name of the sentence transformer model to use
+            num_threads: ONNX Runtime intra-op thread count (library default when None)
+            quantize: Run an int8 dynamically quantized copy of the model
+            cache_dir: Directory for exported models (defaults to ~/.cache/prophet/onnx)
+            batch_size: Texts per inference call
+            max_length: Maximum tokens per text
+        """
+        self.model_name = model_name
+        self.num_threads = num_threads
+        self.quantize = quantize
+        self.cache_dir = cache_dir or os.path.join(os.path.expanduser("~"), ".cache", "prophet", "onnx")
+        self.batch_size = batch_size
+        self.max_length = max_length
+
+    @property
+    def model_dir(self) -> str:
+        return os.path.join(self.cache_dir, self.model_name.replace("/", "__"))
+
+    @property
+    def pooling_path(self) -> str:
+        return os.path.join(self.model_dir, "pooling.json")
+
+    def _pooling_mode(self) -> str:
+        from huggingface_hub import hf_hub_download
+
+        try:
+            with open(hf_hub_download(self.model_name, "1_Pooling/config.json")) as f:
+                config = json.load(f)
+        except Exception as e:
+            raise RuntimeError(f"Could not read the sentence-transformers pooling config of {self.model_name}") from e
+        if config.get("pooling_mode_cls_token"):
+            return "cls"
+        if config.get("pooling_mode_mean_tokens"):
+            return "mean"
+        raise ValueError(f"Unsupported pooling in {self.model_name}: only CLS and mean pooling are implemented")
+
+    def _export(self, path: str) -> None:
+        import torch
+        from transformers import AutoModel, AutoTokenizer
+
+        print(f"Exporting {self.model_name} to ONNX: {path}")
+        pooling = self._pooling_mode()
+        tokenizer = AutoTokenizer.from_pretrained(self.model_name)
+        model = AutoModel.from_pretrained(self.model_name).eval()
+        inputs = tokenizer(["export"], return_tensors="pt")
+        # Graph inputs follow the forward() signature, not the tokenizer's key order
+        # (BERT takes attention_mask before token_type_ids)
+        input_names = [name for name in inspect.signature(model.forward).parameters if name in inputs]
+        dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+        dynamic_axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+        with torch.no_grad():
+            torch.onnx.export(
+                model,
+                ({name: inputs[name] for name in input_names},),
+                path,
+                input_names=input_names,
+                output_names=["last_hidden_state"],
+                dynamic_axes=dynamic_axes,
+                opset_version=14,
+            )
+        tokenizer.save_pretrained(self.model_dir)
+        with open(self.pooling_path, "w") as f:
+            json.dump({"pooling": pooling}, f)
+
+    def load(self) -> Any:
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        os.makedirs(self.model_dir, exist_ok=True)
+        path = os.path.join(self.model_dir, "model.onnx")
+        quantized_path = os.path.join(self.model_dir, "model.int8.onnx")
+        # Exports without the saved pooling config are incomplete and redone
+        if not os.path.exists(path) or not os.path.exists(self.pooling_path):
+            if os.path.exists(quantized_path):
+                os.remove(quantized_path)
+            self._export(path)
+        if self.quantize:
+            if not os.path.exists(quantized_path):
+                from onnxruntime.quantization import QuantType, quantize_dynamic
+                quantize_dynamic(path, quantized_path, weight_type=QuantType.QInt8)
+            path = quantized_path
+
+        options = ort.SessionOptions()
+        if self.num_threads:
+            options.intra_op_num_threads = self.num_threads
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        session = ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        tokenizer = AutoTokenizer.from_pretrained(self.model_dir)
+        with open(self.pooling_path) as f:
+            pooling = json.load(f)["pooling"]
+        return session, tokenizer, pooling
+
+    def encode(self, model: Any, texts: List[str]) -> np.ndarray:
+        session, tokenizer, pooling = model
+        input_names = {node.name for node in session.get_inputs()}
+        outputs = []
+        for start in range(0, len(texts), self.batch_size):
+            batch = tokenizer(texts[start:start + self.batch_size], padding=True, truncation=True,
+                              max_length=self.max_length, return_tensors="np")
+            feeds = {name: batch[name].astype(np.int64) for name in batch if name in input_names}
+            hidden = session.run(["last_hidden_state"], feeds)[0]
+            if pooling == "mean":
+                mask = batch["attention_mask"][..., None].astype(np.float32)
+                pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            else:
+                pooled = hidden[:, 0]
+            outputs.append(pooled)
+        return _normalize(np.concatenate(outputs))
+
+
+def create_backend(backend: str,
+                   model_name: str,
+                   device: Optional[str] = None,
+                   precision: str = "float32",
+                   num_threads: Optional[int] = None,
+                   quantize: bool = False):
+    """
+    Build an embedding backend by name ('torch' or 'onnx').
+    """
+    if backend == "torch":
+        return SentenceTransformerBackend(model_name, device=device, precision=precision, num_threads=num_threads)
+    if backend == "onnx":
+        if precision != "float32":
+            raise ValueError(f"Precision {precision} is not supported by the onnx backend; "
+                             "use float32 (or quantize for int8)")
+        return OnnxBackend(model_name, num_threads=num_threads, quantize=quantize,
+                           cache_dir=os.getenv("EMBEDDING_ONNX_DIR") or None)
+    raise ValueError(f"Unsupported embedding backend: {backend}. Use one of {', '.join(EMBEDDING_BACKENDS)}")
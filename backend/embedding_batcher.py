@@ -0,0 +1,143 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from embedding import EmbeddingEngine
+
+
+class EmbeddingBatcher:
+    def __init__(self,
+                 engine: EmbeddingEngine,
+                 max_batch_size: int = 32,
+                 max_wait_ms: float = 5.0,
+                 executor: Optional[ThreadPoolExecutor] = None):
+        """
+        Coalesce concurrent single-text embedding requests into model batches.
+
+        Requests are queued on the running event loop; a background task drains
+        the queue into batches of at most max_batch_size, waiting at most
+        max_wait_ms after the first request for more to arrive, and runs the
+        forward pass in a worker thread so the event loop is never blocked.
+
+        Args:
+            engine: Shared embedding engine to encode with
+            max_batch_size: Maximum number of texts per forward pass
+            max_wait_ms: Maximum time to hold a partial batch open
+            executor: Thread pool to run the model in (defaults to a single worker)
+        """
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1")
+
+        self.engine = engine
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._executor = executor or ThreadPoolExecutor(max_workers=1, thread_name_prefix="embedding")
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _ensure_worker(self) -> asyncio.Queue:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._worker is None or self._worker.done():
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._worker = loop.create_task(self._run())
+        return self._queue
+
+    async def embed(self, text: str):
+        """
+        Embed one text, sharing a forward pass with any concurrent callers.
+
+        Returns:
+            Normalized embedding as a NumPy array
+        """
+        queue = self._ensure_worker()
+        future = asyncio.get_running_loop().create_future()
+        await queue.put((text, future))
+        return await future
+
+    async def embed_many(self, texts: List[str]):
+        """
+        Embed several texts through the shared queue.
+
+        Returns:
+            List of normalized embeddings in input order
+        """
+        return await asyncio.gather(*(self.embed(text) for text in texts))
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        queue = self._queue
+        while True:
+            batch: List[Tuple[str, asyncio.Future]] = [await queue.get()]
+            try:
+                deadline = loop.time() + self.max_wait
+                while len(batch) < self.max_batch_size:
+                    remaining = deadline - loop.time()
+                    if remaining <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(queue.get(), remaining))
+                    except asyncio.TimeoutError:
+                        break
+
+                texts = [text for text, _ in batch]
+                try:
+                    embeddings = await loop.run_in_executor(self._executor, self.engine.encode, texts)
+                except Exception as e:
+                    for _, future in batch:
+                        if not future.done():
+                            future.set_exception(e)
+                    continue
+            except asyncio.CancelledError:
+                # Requests already taken off the queue are not reached by close()
+                for _, future in batch:
+                    future.cancel()
+                raise
+
+            for (_, future), embedding in zip(batch, embeddings):
+                if not future.done():
+                    future.set_result(embedding)
+
+    async def close(self) -> None:
+        """
+        Stop the background worker. Pending requests are cancelled.
+        """
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+        if self._queue is not None:
+            while not self._queue.empty():
+                _, future = self._queue.get_nowait()
+                future.cancel()
+
+
+_batchers: Dict[int, EmbeddingBatcher] = {}
+
+
+def get_embedding_batcher(engine: EmbeddingEngine) -> EmbeddingBatcher:
+    """
+    Return the process-wide batcher for an engine.
+
+    Batch limits come from EMBEDDING_MAX_BATCH_SIZE and EMBEDDING_MAX_WAIT_MS.
+    """
+    batcher = _batchers.get(id(engine))
+    if batcher is None:
+        batcher = EmbeddingBatcher(
+            engine,
+            max_batch_size=int(os.getenv("EMBEDDING_MAX_BATCH_SIZE", "32")),
+            max_wait_ms=float(os.getenv("EMBEDDING_MAX_WAIT_MS", "5")),
+        )
+        _batchers[id(engine)] = batcher
+    return batcher
+
+
+async def close_embedding_batchers() -> None:
+    for batcher in list(_batchers.values()):
+        await batcher.close()
+    _batchers.clear()
@@ -0,0 +1,238 @@
+import fcntl
+import hashlib
+import os
+import re
+import threading
+import unicodedata
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+CacheKey = Tuple[str, str]
+
+
+def normalize_text(text: str) -> str:
+    """
+    Canonical form used for cache keys: NFC, trimmed, internal whitespace collapsed.
+    """
+    return re.sub(r"\s+", " ", unicodedata.normalize("NFC", text)).strip()
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+
+
+class DiskEmbeddingStore:
+    # Keys are hex SHA-256 digests of normalized text
+    KEY_BYTES = 64
+
+    def __init__(self, directory: str):
+        """
+        Append-only on-disk embedding tier for one model, safe to share between processes.
+
+        Each record is the key followed by its float32 vector, written with a
+        single append under an exclusive flock, so a key can never point at
+        another key's vector. A torn record left by a crash is truncated the
+        next time the lock is taken. Records appended by other processes are
+        picked up when the file has grown.
+
+        Args:
+            directory: Directory holding records.bin, dimension.txt and the lock file
+        """
+        os.makedirs(directory, exist_ok=True)
+        self.records_path = os.path.join(directory, "records.bin")
+        self.dimension_path = os.path.join(directory, "dimension.txt")
+        self.lock_path = os.path.join(directory, "lock")
+        self.dimension: Optional[int] = None
+        self._rows: Dict[str, int] = {}
+        self._size = 0
+        self._mmap: Optional[np.memmap] = None
+        # Guards the in-memory row index; writers are serialized by the flock
+        self._index_lock = threading.Lock()
+        with self._locked():
+            self._refresh(truncate=True)
+
+    @contextmanager
+    def _locked(self):
+        # flock locks belong to the open file, so threads of one process exclude each other too
+        with open(self.lock_path, "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _record_dtype(self) -> np.dtype:
+        return np.dtype([("key", f"S{self.KEY_BYTES}"), ("vector", "<f4", (self.dimension,))])
+
+    def _refresh(self, truncate: bool = False) -> None:
+        """
+        Index records appended since the last refresh, by this or another process.
+
+        Args:
+            truncate: Cut off a trailing partial record (only while holding the lock)
+        """
+        with self._index_lock:
+            self._refresh_index(truncate)
+
+    def _refresh_index(self, truncate: bool) -> None:
+        if self.dimension is None:
+            if not os.path.exists(self.dimension_path):
+                return
+            with open(self.dimension_path) as f:
+                self.dimension = int(f.read().strip())
+        size = os.path.getsize(self.records_path) if os.path.exists(self.records_path) else 0
+        if size == self._size:
+            return
+        dtype = self._record_dtype()
+        complete = size - size % dtype.itemsize
+        if truncate and complete != size:
+            with open(self.records_path, "r+b") as f:
+                f.truncate(complete)
+        if complete < self._size:
+            # The file was replaced or cut back; index it from scratch
+            self._rows, self._size = {}, 0
+        if complete > self._size:
+            self._mmap = np.memmap(self.records_path, dtype=dtype, mode="r", shape=(complete // dtype.itemsize,))
+            keys = self._mmap["key"]
+            for row in range(self._size // dtype.itemsize, complete // dtype.itemsize):
+                self._rows.setdefault(keys[row].decode(), row)
+        self._size = complete
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        row = self._rows.get(key)
+        if row is None:
+            self._refresh()
+            row = self._rows.get(key)
+            if row is None:
+                return None
+        return np.array(self._mmap[row]["vector"])
+
+    def put(self, key: str, embedding: np.ndarray) -> None:
+        if key in self._rows:
+            return
+        if len(key) != self.KEY_BYTES:
+            raise ValueError(f"Expected a {self.KEY_BYTES}-character key, got {len(key)}")
+        vector = np.ascontiguousarray(embedding, dtype=np.float32).reshape(-1)
+        with self._locked():
+            self._refresh(truncate=True)
+            if key in self._rows:
+                return
+            if self.dimension is None:
+                with open(self.dimension_path, "w") as f:
+                    f.write(str(vector.shape[0]))
+                self.dimension = vector.shape[0]
+            elif vector.shape[0] != self.dimension:
+                raise ValueError(f"Expected dimension {self.dimension}, got {vector.shape[0]}")
+            record = np.zeros(1, dtype=self._record_dtype())
+            record["key"] = key.encode()
+            record["vector"] = vector
+            with open(self.records_path, "ab") as f:
+                f.write(record.tobytes())
+            self._refresh()
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+
+class EmbeddingCache:
+    def __init__(self, max_entries: int = 10000, disk_dir: Optional[str] = None):
+        """
+        Content-addressed embedding cache keyed by (model name, normalized text hash).
+
+        Args:
+            max_entries: Capacity of the in-memory LRU tier
+            disk_dir: Directory for the persistent memory-mapped tier (disabled when None)
+        """
+        self.max_entries = max_entries
+        self.disk_dir = disk_dir
+        self._memory: "OrderedDict[CacheKey, np.ndarray]" = OrderedDict()
+        self._disk: Dict[str, DiskEmbeddingStore] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def _disk_store(self, model_name: str) -> Optional[DiskEmbeddingStore]:
+        # Called with _lock held; stores do their own file locking
+        if not self.disk_dir:
+            return None
+        store = self._disk.get(model_name)
+        if store is None:
+            directory = os.path.join(self.disk_dir, hashlib.sha1(model_name.encode()).hexdigest()[:16])
+            store = DiskEmbeddingStore(directory)
+            self._disk[model_name] = store
+        return store
+
+    def get(self, model_name: str, text: str) -> Optional[np.ndarray]:
+        digest = text_hash(text)
+        key = (model_name, digest)
+        with self._lock:
+            embedding = self._memory.get(key)
+            if embedding is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return embedding
+            store = self._disk_store(model_name)
+
+        # Disk reads run outside the lock so memory hits of other threads are not held up
+        embedding = store.get(digest) if store is not None else None
+        with self._lock:
+            if embedding is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            self._remember(key, embedding)
+            return embedding
+
+    def put(self, model_name: str, text: str, embedding: np.ndarray) -> None:
+        digest = text_hash(text)
+        embedding = np.ascontiguousarray(embedding, dtype=np.float32)
+        with self._lock:
+            self._remember((model_name, digest), embedding)
+            store = self._disk_store(model_name)
+        # The flock, append and re-mmap happen outside the process-wide lock
+        if store is not None:
+            store.put(digest, embedding)
+
+    def _remember(self, key: CacheKey, embedding: np.ndarray) -> None:
+        embedding.flags.writeable = False
+        self._memory[key] = embedding
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "entries": len(self._memory),
+                "disk_entries": sum(len(store) for store in self._disk.values()),
+            }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+            self.hits = self.disk_hits = self.misses = 0
+
+
+_cache: Optional[EmbeddingCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_embedding_cache() -> EmbeddingCache:
+    """
+    Return the process-wide cache, configured from EMBEDDING_CACHE_SIZE and EMBEDDING_CACHE_DIR.
+    """
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = EmbeddingCache(
+                max_entries=int(os.getenv("EMBEDDING_CACHE_SIZE", "10000")),
+                disk_dir=os.getenv("EMBEDDING_CACHE_DIR") or None,
+            )
+    return _cache
@@ -4,33 +4,38 @@ from pydantic import BaseModel, validator
 from datetime import datetime, date
 from typing import Optional, List, Dict, Any
 import uuid
-from supabase import create_client, Client
+from supabase import Client
 import os
 from dotenv import load_dotenv
 import logging
 from vector_store import SupabaseVectorStore
 from models import ProphecyCreate, Prophecy
-from web3 import Web3
-from eth_account import Account
 import json
 from prophet import Prophet
-from prophet_metadata_dkg import create_knowledge
+from prophet_metadata_dkg import create_knowledge, create_knowledge_batch, dkg_ready, get_dkg, prophet_id
+from chain import chain_ready, to_checksum_address, warm_up_chain
+from chain_indexer import create_indexer
+from chain_reader import ChainRPCError, get_chain_reader
+from dkg_jobs import create_job_queue
+from dkg_registry import create_publish_registry
+from embedding import warm_up_embedding_engines
+from embedding_batcher import close_embedding_batchers
+from embedding_cache import get_embedding_cache
+from target_date_index import get_target_date_index
+from vector_index import fetch_embeddings, local_index_enabled
+import asyncio
+import db
+from db import execute, get_supabase
 
 # 環境変数の読み込み
 load_dotenv()
 
-# Supabaseクライアントの初期化
-supabase_url = os.getenv("SUPABASE_URL")
-supabase_key = os.getenv("SUPABASE_KEY")
-if not supabase_url or not supabase_key:
-    raise ValueError("SUPABASE_URL and SUPABASE_KEY environment variables are required")
-supabase: Client = create_client(
-    supabase_url=supabase_url,
-    supabase_key=supabase_key
-)
+# Supabaseクライアントの初期化（全モジュールで共有）
+supabase: Client = get_supabase()
 
 app = FastAPI()
 vector_store = SupabaseVectorStore()
+target_date_index = get_target_date_index()
 
 # CORSの設定
 app.add_middleware(
@@ -44,9 +49,94 @@ app.add_middleware(
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
-# Prophetインスタンスの初期化
+# Prophetインスタンスの初期化（埋め込みモデルはvector_storeと共有）
 prophet_instance = Prophet()
 
+@app.on_event("startup")
+async def warm_up_embedding_model():
+    # EMBEDDING_WARMUP=1 の場合は起動時にモデルをロードし、初回リクエストの遅延を避ける
+    if os.getenv("EMBEDDING_WARMUP", "").lower() in ("1", "true", "yes"):
+        warm_up_embedding_engines(prophet_instance.engine)
+
+@app.on_event("startup")
+async def warm_up_chain_clients():
+    # Web3/コントラクト/DKGクライアントは初回利用時に生成される。CHAIN_WARMUP=1 なら起動時にバックグラウンドで準備する
+    if os.getenv("CHAIN_WARMUP", "").lower() in ("1", "true", "yes"):
+        loop = asyncio.get_running_loop()
+        loop.run_in_executor(None, warm_up_chain)
+        loop.run_in_executor(None, get_dkg)
+
+vector_index_task: Optional[asyncio.Task] = None
+
+async def sync_local_vector_index(interval: float):
+    # 構築に失敗した場合は次の周期で再構築し、構築後は他のプロセスが保存したベクトルを差分で取り込む
+    loop = asyncio.get_running_loop()
+    while True:
+        try:
+            if not vector_store.index.ready:
+                await loop.run_in_executor(None, vector_store.build_index)
+            else:
+                added = await loop.run_in_executor(None, vector_store.sync_index)
+                if added:
+                    logger.info(f"Synced {added} vectors into the local vector index")
+        except Exception:
+            logger.exception("Local vector index build/sync failed")
+        if interval <= 0:
+            return
+        await asyncio.sleep(interval)
+
+def log_task_exception(task: asyncio.Task):
+    if not task.cancelled() and task.exception() is not None:
+        logger.error("Background task failed", exc_info=task.exception())
+
+@app.on_event("startup")
+async def build_local_vector_index():
+    # 類似検索用のローカルANNインデックスをバックグラウンドで構築（完了まではRPCで検索）
+    global vector_index_task
+    if local_index_enabled():
+        interval = float(os.getenv("LOCAL_VECTOR_INDEX_SYNC_INTERVAL", "60"))
+        vector_index_task = asyncio.create_task(sync_local_vector_index(interval))
+        vector_index_task.add_done_callback(log_task_exception)
+
+@app.on_event("shutdown")
+async def stop_local_vector_index():
+    if vector_index_task is not None:
+        vector_index_task.cancel()
+        await asyncio.gather(vector_index_task, return_exceptions=True)
+
+target_date_index_task: Optional[asyncio.Task] = None
+
+async def sync_target_date_index(interval: float):
+    # 他のワーカーやチェーンの取り込みで作成・更新（精算）された予言をupdated_atから差分で取り込む
+    loop = asyncio.get_running_loop()
+    while True:
+        try:
+            await loop.run_in_executor(None, target_date_index.sync_from_supabase, supabase)
+        except Exception:
+            logger.exception("Target date index build/sync failed")
+        if interval <= 0:
+            return
+        await asyncio.sleep(interval)
+
+@app.on_event("startup")
+async def build_target_date_index():
+    # 精算対象の予言を日付で引くためのインデックスをバックグラウンドで構築し、定期的に同期
+    global target_date_index_task
+    interval = float(os.getenv("TARGET_DATE_INDEX_SYNC_INTERVAL", "60"))
+    target_date_index_task = asyncio.create_task(sync_target_date_index(interval))
+    target_date_index_task.add_done_callback(log_task_exception)
+
+@app.on_event("shutdown")
+async def stop_target_date_index():
+    if target_date_index_task is not None:
+        target_date_index_task.cancel()
+        await asyncio.gather(target_date_index_task, return_exceptions=True)
+
+@app.on_event("shutdown")
+async def stop_embedding_batchers():
+    await close_embedding_batchers()
+    db.shutdown()
+
 class Prophet(BaseModel):
     id: str
     sentence: str
@@ -61,6 +151,18 @@ class AddToDKGRequest(BaseModel):
     prophecy_id: str
     options: Optional[Dict[str, Any]] = None
 
+# 1リクエストで確認できるtx_hashの上限（ノードへのバッチとキャッシュの肥大化を防ぐ）
+MAX_VERIFY_TX_HASHES = int(os.getenv("MAX_VERIFY_TX_HASHES", "500"))
+
+class VerifyProphecyRequest(BaseModel):
+    tx_hashes: List[str]
+
+    @validator('tx_hashes')
+    def validate_tx_hashes(cls, v):
+        if len(v) > MAX_VERIFY_TX_HASHES:
+            raise ValueError(f"At most {MAX_VERIFY_TX_HASHES} transaction hashes are allowed")
+        return v
+
 class ProphecyCreate(BaseModel):
     sentence: str
     betting_amount: float
@@ -118,19 +220,6 @@ class ProphecyCreate(BaseModel):
             raise ValueError(f"Invalid oracle. Must be one of: {', '.join(valid_oracles)}")
         return v
 
-# Web3の設定
-web3 = Web3(Web3.HTTPProvider(os.getenv("WEB3_PROVIDER_URL")))
-
-# アドレスをチェックサムアドレスに変換
-prophet_address = web3.to_checksum_address(os.getenv("PROPHET_CONTRACT_ADDRESS"))
-usdc_address = web3.to_checksum_address(os.getenv("USDC_CONTRACT_ADDRESS"))
-
-# コントラクトのインスタンス化
-prophet_contract = web3.eth.contract(
-    address=prophet_address,
-    abi=json.loads(os.getenv("PROPHET_CONTRACT_ABI"))
-)
-
 @app.post("/prophecies")
 async def create_prophecy(prophecy: ProphecyCreate):
     try:
@@ -141,19 +230,23 @@ async def create_prophecy(prophecy: ProphecyCreate):
             "betting_amount": prophecy.betting_amount,
             "oracle": prophecy.oracle,
             "target_dates": prophecy.target_dates,
-            "creator": web3.to_checksum_address(prophecy.creator),  # creatorアドレスもチェックサム化
+            "creator": to_checksum_address(prophecy.creator),  # creatorアドレスもチェックサム化
             "status": prophecy.status,
             "tx_hash": prophecy.tx_hash
         }
         
-        result = supabase.table("prophecies").insert(prophecy_data).execute()
+        result = await execute(supabase.table("prophecies").insert(prophecy_data))
+        target_date_index.add(prophecy.id, prophecy.target_dates, prophecy.oracle, prophecy.status)
         
-        # ベクトルDBへの保存
-        await vector_store.store_vector(prophecy.id, prophecy.sentence)
+        # ベクトルDBへの保存（重複・ほぼ重複の予言はベクトルを保存せず、既存の予言IDを返す）
+        stored = await vector_store.store_vector(prophecy.id, prophecy.sentence,
+                                                 oracle=prophecy.oracle, target_dates=prophecy.target_dates)
         
         return {
             "status": "success",
-            "id": prophecy.id
+            "id": prophecy.id,
+            "canonical_id": stored["canonical_id"] if stored else prophecy.id,
+            "duplicate": bool(stored and stored["duplicate"])
         }
     except ValidationError as e:
         logger.error(f"Validation error: {str(e)}")
@@ -162,11 +255,57 @@ async def create_prophecy(prophecy: ProphecyCreate):
         logger.error(f"Error creating prophecy: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/prophecies/verify")
+async def verify_prophecies(request: VerifyProphecyRequest):
+    # 複数のtx_hashのreceiptを1回のJSON-RPCバッチで取得し、ProphecyCreatedイベントを確認する
+    try:
+        loop = asyncio.get_running_loop()
+        verified = await loop.run_in_executor(None, get_chain_reader().verify_prophecies, request.tx_hashes)
+        return {"transactions": verified}
+    except ChainRPCError as e:
+        # ノード側の失敗は未採掘のtxと区別して返す
+        logger.error(f"Chain RPC error verifying prophecies: {str(e)}")
+        raise HTTPException(status_code=502, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error verifying prophecies: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/prophecies/due")
+async def get_due_prophecies(start: date,
+                             end: Optional[date] = None,
+                             oracle: Optional[str] = None,
+                             status: Optional[str] = "PENDING",
+                             include_embeddings: bool = True):
+    # target_datesの期間が [start, end] と重なる予言のIDとembeddingをまとめて返す（精算用）
+    try:
+        loop = asyncio.get_running_loop()
+        if not target_date_index.ready:
+            await loop.run_in_executor(None, target_date_index.build_from_supabase, supabase)
+        prophecy_ids = target_date_index.query(start, end, oracle=oracle, status=status)
+        
+        embeddings = {}
+        if include_embeddings and prophecy_ids:
+            embeddings = await loop.run_in_executor(None, fetch_embeddings, supabase, prophecy_ids)
+        
+        return {
+            "start": start,
+            "end": end or start,
+            "count": len(prophecy_ids),
+            "prophecies": [
+                {"id": prophecy_id, "embedding": embeddings[prophecy_id].tolist() if prophecy_id in embeddings else None}
+                if include_embeddings else {"id": prophecy_id}
+                for prophecy_id in prophecy_ids
+            ]
+        }
+    except Exception as e:
+        logger.error(f"Error fetching due prophecies: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @app.get("/prophecies/{prophecy_id}")
 async def get_prophecy(prophecy_id: str):
     logger.debug(f"Fetching prophecy with ID: {prophecy_id}")
     try:
-        result = supabase.table("prophecies").select("*").eq("id", prophecy_id).execute()
+        result = await execute(supabase.table("prophecies").select("*").eq("id", prophecy_id))
         
         if not result.data or len(result.data) == 0:
             logger.warning(f"Prophecy not found with ID: {prophecy_id}")
@@ -180,72 +319,267 @@ async def get_prophecy(prophecy_id: str):
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/prophecies/{prophecy_id}/similar")
-async def get_similar_prophecies(prophecy_id: str, limit: int = 5):
+async def get_similar_prophecies(prophecy_id: str, limit: int = 5, oracle: Optional[str] = None):
     try:
         # 元の予言を取得
-        prophecy = supabase.table("prophecies").select("*").eq("id", prophecy_id).execute()
+        prophecy = await execute(supabase.table("prophecies").select("*").eq("id", prophecy_id))
         if not prophecy.data:
             raise HTTPException(status_code=404, detail="Prophecy not found")
         
-        # 類似予言を検索
-        similar_results = vector_store.search_similar(prophecy.data[0]["sentence"], top_k=limit)
+        # 類似予言を検索（自分自身が含まれる分を1件多く取得、oracle指定時はそのオラクル内のみ）
+        similar_results = await vector_store.search_similar(prophecy.data[0]["sentence"], top_k=limit + 1, oracle=oracle)
+        scores = {}
+        for similar_id, score in similar_results:
+            if similar_id != prophecy_id and similar_id not in scores:
+                scores[similar_id] = score
+        similar_ids = list(scores)[:limit]
+        if not similar_ids:
+            return []
         
-        # 類似予言のIDを使って予言データを取得
-        similar_prophecies = []
-        for text, score in similar_results:
-            prophecy_data = supabase.table("prophecies").select("*").eq("sentence", text).execute()
-            if prophecy_data.data:
-                similar_prophecies.extend(prophecy_data.data)
+        # 類似予言をIDで一括取得し、類似度順に並べる
+        rows = await execute(supabase.table("prophecies").select("*").in_("id", similar_ids))
+        rows_by_id = {row["id"]: row for row in rows.data or []}
         
-        return similar_prophecies
+        return [
+            {**rows_by_id[similar_id], "similarity": scores[similar_id]}
+            for similar_id in similar_ids
+            if similar_id in rows_by_id
+        ]
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error finding similar prophecies: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.post("/api/add-to-dkg")
+def dkg_embedding_encoding() -> str:
+    # DKGアセット内のembededProphetの形式: list（JSONの数値配列）/ float32 / float16（base64）
+    return os.getenv("DKG_EMBEDDING_ENCODING", "list")
+
+async def publish_prophecy_to_dkg(job: Dict[str, Any]) -> str:
+    """
+    DKG公開ジョブの処理本体（ワーカーから呼ばれる）。予言を取得し、埋め込みを生成してDKGに公開します。
+    
+    Returns:
+        UAL（Uniform Asset Locator）
+    """
+    result = await execute(supabase.table("prophecies").select("*").eq("id", job["prophecy_id"]))
+    if not result.data:
+        raise ValueError(f"Prophecy not found with ID: {job['prophecy_id']}")
+    sentence = result.data[0]["sentence"]
+    
+    async def publish():
+        # 予言データを生成
+        prophet_data = await prophet_instance.agenerate_prophet_data(sentence, encoding=dkg_embedding_encoding())
+        logger.debug(f"Generated prophet data with hash: {prophet_data['embededProphetHash']}")
+        
+        # チェーンの確定待ちはワーカースレッドで行う
+        ual = await asyncio.to_thread(create_knowledge, prophet_data, job["options"])
+        return ual, prophet_data["embededProphetHash"]
+    
+    # 公開済みならレジストリのUALを返し、公開中なら同じ公開の完了を待つ（埋め込み・チェーン呼び出しなし）
+    return await dkg_registry.publish_once(prophet_id({"prophet": sentence}), publish, job["prophecy_id"])
+
+async def wait_published_elsewhere(urn: str) -> str:
+    # 別プロセスの公開が記録されずに終わった場合は、ジョブの再試行で改めて公開する
+    ual = await dkg_registry.wait_elsewhere(urn)
+    if ual is None:
+        raise RuntimeError("Knowledge asset publish by another process did not complete")
+    return ual
+
+async def publish_prophecies_to_dkg(jobs: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    DKG公開ジョブをまとめて処理し、複数の予言を1つのナレッジアセットとして公開します。
+    
+    Returns:
+        ジョブIDごとのUAL、または失敗時の例外
+    """
+    prophecy_ids = list({job["prophecy_id"] for job in jobs})
+    result = await execute(supabase.table("prophecies").select("id,sentence").in_("id", prophecy_ids))
+    sentences = {row["id"]: row["sentence"] for row in result.data or []}
+    
+    outcomes: Dict[str, Any] = {}
+    urns = {job["id"]: prophet_id({"prophet": sentences[job["prophecy_id"]]})
+            for job in jobs if job["prophecy_id"] in sentences}
+    for job in jobs:
+        if job["prophecy_id"] not in sentences:
+            outcomes[job["id"]] = ValueError(f"Prophecy not found with ID: {job['prophecy_id']}")
+    
+    # 公開済みの予言はレジストリから、他で（別プロセスを含む）公開中の予言はその完了を待って返す
+    registered = dkg_registry.get_many(urns.values())
+    waiting: Dict[str, Any] = {}
+    found = []
+    started = set()
+    for job in jobs:
+        urn = urns.get(job["id"])
+        if urn is None:
+            continue
+        if urn in registered:
+            outcomes[job["id"]] = registered[urn]["ual"]
+        elif urn in started or dkg_registry.in_flight(urn) is not None:
+            waiting[job["id"]] = dkg_registry.in_flight(urn)
+        elif dkg_registry.begin(urn) is not None:
+            started.add(urn)
+            found.append(job)
+        else:
+            waiting[job["id"]] = asyncio.ensure_future(wait_published_elsewhere(urn))
+    
+    keep = asyncio.create_task(dkg_registry.keep_claims(list(started)))
+    try:
+        # 埋め込みはバッチングキューでまとめて計算される
+        prophet_data = await asyncio.gather(
+            *(prophet_instance.agenerate_prophet_data(sentences[job["prophecy_id"]], encoding=dkg_embedding_encoding())
+              for job in found)
+        )
+        
+        # DKGオプションが同じジョブごとに1回の公開にまとめる
+        groups: Dict[str, List[int]] = {}
+        for i, job in enumerate(found):
+            groups.setdefault(json.dumps(job["options"], sort_keys=True), []).append(i)
+        
+        for indexes in groups.values():
+            options = found[indexes[0]]["options"]
+            published = await asyncio.to_thread(
+                create_knowledge_batch, [prophet_data[i] for i in indexes], options,
+                int(os.getenv("DKG_MAX_PER_ASSET", "50"))
+            )
+            for i in indexes:
+                job, urn = found[i], urns[found[i]["id"]]
+                asset = published.get(urn)
+                if isinstance(asset, dict):
+                    dkg_registry.finish(urn, asset["ual"], prophet_data[i]["embededProphetHash"], job["prophecy_id"])
+                    outcomes[job["id"]] = asset["ual"]
+                else:
+                    # アセットの公開で発生した例外をそのままジョブのエラーとして記録する
+                    error = asset if isinstance(asset, Exception) else RuntimeError("Knowledge asset publish failed")
+                    dkg_registry.abort(urn, error)
+                    outcomes[job["id"]] = error
+    finally:
+        keep.cancel()
+        # 埋め込みや公開が途中で失敗した場合も、待っている呼び出しと他プロセス向けの公開中の印を解放する
+        for job in found:
+            dkg_registry.abort(urns[job["id"]], RuntimeError("Knowledge asset publish failed"))
+    
+    results = await asyncio.gather(*(asyncio.shield(future) for future in waiting.values()), return_exceptions=True)
+    outcomes.update(zip(waiting, results))
+    return outcomes
+
+dkg_registry = create_publish_registry()
+dkg_queue = create_job_queue(publish_prophecy_to_dkg, publish_prophecies_to_dkg)
+
+@app.on_event("startup")
+async def start_dkg_workers():
+    dkg_queue.start()
+
+@app.on_event("shutdown")
+async def stop_dkg_workers():
+    await dkg_queue.stop()
+
+chain_indexer_task: Optional[asyncio.Task] = None
+
+@app.on_event("startup")
+async def start_chain_indexer():
+    # CHAIN_INDEXER=1 の場合、ProphecyCreatedイベントをチェーンから取り込み続ける
+    global chain_indexer_task
+    if os.getenv("CHAIN_INDEXER", "").lower() in ("1", "true", "yes"):
+        indexer = create_indexer(prophet_instance, target_date_index)
+        chain_indexer_task = asyncio.create_task(indexer.run(float(os.getenv("INDEXER_POLL_INTERVAL", "5"))))
+
+@app.on_event("shutdown")
+async def stop_chain_indexer():
+    if chain_indexer_task is not None:
+        chain_indexer_task.cancel()
+        await asyncio.gather(chain_indexer_task, return_exceptions=True)
+
+@app.post("/api/add-to-dkg", status_code=202)
 async def add_to_dkg(request: AddToDKGRequest):
     """
-    指定された予言をDKG（Distributed Knowledge Graph）に追加します。
+    指定された予言をDKG（Distributed Knowledge Graph）に追加するジョブを登録します。
+    
+    公開はバックグラウンドのワーカーが行い、結果は GET /api/dkg-jobs/{job_id} で確認できます。
     
     Args:
         request: AddToDKGRequest - 予言IDとオプションのDKGオプション
         
     Returns:
-        UAL（Uniform Asset Locator）- DKGに追加されたアセットの識別子
+        ジョブID
         
     Raises:
-        HTTPException: 予言が見つからない場合や、DKGへの追加に失敗した場合
+        HTTPException: 予言が見つからない場合や、ジョブの登録に失敗した場合
     """
     try:
         logger.debug(f"Adding prophecy with ID {request.prophecy_id} to DKG")
         
-        result = supabase.table("prophecies").select("*").eq("id", request.prophecy_id).execute()
+        result = await execute(supabase.table("prophecies").select("id,sentence").eq("id", request.prophecy_id))
         
         if not result.data or len(result.data) == 0:
             logger.warning(f"Prophecy not found with ID: {request.prophecy_id}")
             raise HTTPException(status_code=404, detail="Prophecy not found")
-            
-        prophecy = result.data[0]
-        logger.debug(f"Found prophecy: {prophecy}")
         
-        # 予言データを生成
-        prophet_data = prophet_instance.generate_prophet_data(prophecy["sentence"])
-        logger.debug(f"Generated prophet data with hash: {prophet_data['embededProphetHash']}")
+        # 公開済みならジョブを作らずにUALを返す
+        published = dkg_registry.get(prophet_id({"prophet": result.data[0]["sentence"]}))
+        if published:
+            return {
+                "status": "published",
+                "prophecy_id": request.prophecy_id,
+                "job_id": None,
+                "ual": published["ual"]
+            }
         
+        # 同じ予言の公開ジョブが待機中・実行中ならそのジョブを返す
+        job = dkg_queue.find_active(request.prophecy_id)
+        if job is not None:
+            return {
+                "status": job["status"],
+                "prophecy_id": request.prophecy_id,
+                "job_id": job["id"]
+            }
         
-        ual = create_knowledge(prophet_data, request.options)
-        logger.info(f"Successfully added prophecy to DKG with UAL: {ual}")
+        job = dkg_queue.enqueue(request.prophecy_id, request.options)
+        logger.info(f"Queued DKG job {job['id']} for prophecy {request.prophecy_id}")
         
-        # 結果を返す
         return {
-            "status": "success",
+            "status": "queued",
             "prophecy_id": request.prophecy_id,
-            "ual": ual
+            "job_id": job["id"]
         }
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error adding prophecy to DKG: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/dkg-jobs/{job_id}")
+async def get_dkg_job(job_id: str):
+    """
+    DKG公開ジョブの状態を返します。完了していれば UAL を含みます。
+    """
+    job = dkg_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return {
+        "job_id": job["id"],
+        "prophecy_id": job["prophecy_id"],
+        "status": job["status"],
+        "attempts": job["attempts"],
+        "ual": job["ual"],
+        "error": job["error"]
+    }
+
+@app.get("/ready")
+async def get_readiness():
+    # 各コンポーネントの初期化状況（ウォームアップ完了の確認用）
+    return {
+        "embedding_model": prophet_instance.engine.is_loaded,
+        "vector_index": vector_store.index.ready,
+        "chain": chain_ready(),
+        "dkg": dkg_ready()
+    }
+
+@app.get("/metrics/embedding-cache")
+async def get_embedding_cache_stats():
+    # 埋め込みキャッシュのヒット/ミス数
+    return get_embedding_cache().stats()
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
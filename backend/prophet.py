@@ -1,59 +1,76 @@
 import os
 import asyncio
-from typing import List, Dict, Any, Optional, Union
-from sentence_transformers import SentenceTransformer
+from typing import Callable, Iterator, List, Dict, Any, Optional, Union
 from supabase import create_client, Client
-import hashlib
-import json
+import numpy as np
+from db import execute, get_supabase
+from dedupe import dedupe_enabled, dedupe_threshold, find_duplicate, match_distinct
+from embedding import EmbeddingEngine, get_embedding_engine
+from embedding_batcher import get_embedding_batcher
+from embedding_cache import text_hash
+from vector_index import PartitionedVectorIndex, get_vector_index, local_index_enabled, parse_embedding
+from vector_io import encode_embedding, hash_embedding, published_embedding, write_vector_export
 
 class Prophet:
     def __init__(self, 
-                 model_name: str = "BAAI/bge-large-en",
+                 model_name: Optional[str] = None,
                  supabase_url: Optional[str] = None,
                  supabase_key: Optional[str] = None,
-                 table_name: str = "prophecy_vectors"):
+                 table_name: str = "prophecy_vectors",
+                 device: Optional[str] = None,
+                 precision: Optional[str] = None,
+                 vector_precision: Optional[str] = None):
         """
         Initialize the Prophet with embedding model and database connection.
         
         Args:
-            model_name: Name of the sentence transformer model to use
+            model_name: Name of the sentence transformer model to use (defaults to EMBEDDING_MODEL or BAAI/bge-large-en)
             supabase_url: Supabase URL (defaults to environment variable)
             supabase_key: Supabase API key (defaults to environment variable)
             table_name: Name of the table to store vectors in
+            device: Device to run the model on (defaults to EMBEDDING_DEVICE or auto)
+            precision: Model weight precision (defaults to EMBEDDING_PRECISION or float32)
+            vector_precision: Precision of the local search index: 'float32', 'float16',
+                'int8' or 'binary' (defaults to VECTOR_PRECISION or float32)
         """
-        self.model_name = model_name
-        self.model = self._initialize_model()
+        self.engine = self._initialize_model(model_name, device, precision)
+        self.model_name = self.engine.model_name
         self.table_name = table_name
+        self.index: PartitionedVectorIndex = get_vector_index(table_name, vector_precision)
         
-        # Initialize Supabase client if credentials are provided
+        # Use a dedicated client for explicit credentials, otherwise the shared one
         self.supabase: Optional[Client] = None
         if supabase_url and supabase_key:
             self.supabase = create_client(supabase_url, supabase_key)
-        else:
-            url = os.getenv("SUPABASE_URL")
-            key = os.getenv("SUPABASE_KEY")
-            if url and key:
-                self.supabase = create_client(url, key)
+        elif os.getenv("SUPABASE_URL") and os.getenv("SUPABASE_KEY"):
+            self.supabase = get_supabase()
     
-    def _initialize_model(self) -> SentenceTransformer:
+    def _initialize_model(self,
+                          model_name: Optional[str] = None,
+                          device: Optional[str] = None,
+                          precision: Optional[str] = None) -> EmbeddingEngine:
         """
-        Initialize the embedding model.
+        Attach to the shared embedding engine. The model is loaded on first use.
         
         Returns:
-            Initialized SentenceTransformer model
+            Process-wide EmbeddingEngine for this model
         """
-        print(f"Loading model: {self.model_name}")
-        return SentenceTransformer(self.model_name)
+        return get_embedding_engine(model_name, device=device, precision=precision)
     
-    def embed_text(self, text: Union[str, List[str]]) -> Union[List[float], List[List[float]]]:
+    @property
+    def model(self):
+        return self.engine.model
+    
+    def embed_array(self, text: Union[str, List[str]]) -> np.ndarray:
         """
-        Convert text to vector embeddings.
+        Convert text to vector embeddings as a NumPy array.
         
         Args:
             text: Single text string or list of text strings to embed
             
         Returns:
-            Embedding vector(s) as list of floats or list of list of floats
+            Contiguous float32 array of shape (dimension,) for a single text
+            or (len(text), dimension) for a list
         
         Raises:
             ValueError: If text is empty or None
@@ -66,27 +83,80 @@ class Prophet:
             is_single_text = isinstance(text, str)
             input_texts = [text] if is_single_text else text
             
-            embeddings = self.model.encode(input_texts, normalize_embeddings=True)
+            embeddings = np.ascontiguousarray(self.engine.encode(input_texts), dtype=np.float32)
 
-            embedding_lists = [embedding.tolist() for embedding in embeddings]
-
-            return embedding_lists[0] if is_single_text else embedding_lists
+            return embeddings[0] if is_single_text else embeddings
             
         except Exception as e:
             print(f"Error during text embedding: {e}")
             raise
     
+    def embed_text(self, text: Union[str, List[str]]) -> Union[List[float], List[List[float]]]:
+        """
+        Convert text to vector embeddings.
+        
+        Args:
+            text: Single text string or list of text strings to embed
+            
+        Returns:
+            Embedding vector(s) as list of floats or list of list of floats
+        
+        Raises:
+            ValueError: If text is empty or None
+        """
+        return self.embed_array(text).tolist()
+    
+    async def aembed_array(self, text: str) -> np.ndarray:
+        """
+        Convert a single text to a float32 embedding without blocking the event loop.
+        
+        Concurrent calls are coalesced into batched forward passes that run in
+        a worker thread.
+        
+        Args:
+            text: Text string to embed
+            
+        Returns:
+            Contiguous float32 array of shape (dimension,)
+        
+        Raises:
+            ValueError: If text is empty or None
+        """
+        if not text:
+            raise ValueError("Text cannot be empty or None")
+        
+        embedding = await get_embedding_batcher(self.engine).embed(text)
+        return np.ascontiguousarray(embedding, dtype=np.float32)
+    
+    async def aembed_text(self, text: str) -> List[float]:
+        """
+        Async variant of embed_text for a single text.
+        
+        Returns:
+            Embedding vector as list of floats
+        """
+        return (await self.aembed_array(text)).tolist()
+    
     async def store_vector(self, 
                           id: str, 
                           text: str, 
-                          metadata: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+                          metadata: Optional[Dict[str, Any]] = None,
+                          oracle: Optional[str] = None,
+                          target_dates: Optional[List[str]] = None,
+                          dedupe: Optional[bool] = None) -> Dict[str, Any]:
         """
         Store vector embedding and metadata in the database.
         
+        A prophecy duplicating an existing one of the same oracle is stored as
+        usual, with canonical_id set to the existing prophecy.
+        
         Args:
             id: Unique identifier for the embedding
             text: Text to embed and store
             metadata: Additional metadata to store with the embedding
+            oracle: Oracle of the prophecy, selecting its local index partition
+            target_dates: Target dates of the prophecy (for month partitioning)
+            dedupe: Link duplicates (defaults to PROPHECY_DEDUPE)
             
         Returns:
             Response data from the database
@@ -100,41 +170,75 @@ class Prophet:
             
         try:
             # Generate embedding
-            embedding = self.embed_text(text)
+            embedding = await self.aembed_array(text)
+            canonical_id = await self._canonical_id(text, embedding, oracle, dedupe)
             
             # Prepare data
             data = {
                 "prophecy_id": id,
-                "embedding": embedding,
+                "embedding": embedding.tolist(),
                 "text": text
             }
+            if canonical_id:
+                data["canonical_id"] = canonical_id
             
             # Add metadata if provided
             if metadata:
                 data.update(metadata)
                 
             # Insert into database
-            response = self.supabase.table(self.table_name).insert(data).execute()
+            response = await execute(self.supabase.table(self.table_name).insert(data))
             print(f"Successfully stored vector for id: {id}")
+            
+            # Keep the local index in sync with the database
+            if local_index_enabled():
+                self.index.add([id], [text], [embedding], [oracle], [target_dates], [canonical_id])
             return response.data
             
         except Exception as e:
             print(f"Error storing vector in database: {e}")
             raise
     
+    async def _canonical_id(self,
+                            text: str,
+                            embedding: np.ndarray,
+                            oracle: Optional[str],
+                            dedupe: Optional[bool]) -> Optional[str]:
+        """
+        Id of the existing prophecy this one duplicates, or None.
+        """
+        if not (dedupe_enabled() if dedupe is None else dedupe):
+            return None
+        duplicate = await find_duplicate(self.supabase, self.index, text, embedding, oracle,
+                                         table_name=self.table_name)
+        if duplicate is None:
+            return None
+        print(f"Prophecy text duplicates {duplicate['prophecy_id']} (similarity {duplicate['similarity']:.3f})")
+        return duplicate["prophecy_id"]
+    
     async def find_similar(self, 
                           text: str, 
                           limit: int = 5, 
                           threshold: float = 0.7,
-                          rpc_name: str = 'match_prophecies') -> List[Dict[str, Any]]:
+                          rpc_name: str = 'match_prophecies',
+                          oracle: Optional[str] = None,
+                          month: Optional[str] = None) -> List[Dict[str, Any]]:
         """
         Find similar items in the vector database based on text similarity.
         
+        Served from the local vector index once it has been built, falling back
+        to the Supabase RPC otherwise. With an oracle filter only that oracle's
+        index partition is searched. Stored duplicates are returned once, under
+        their canonical prophecy id.
+        
         Args:
             text: Query text to find similar items for
             limit: Maximum number of results to return
             threshold: Similarity threshold (0-1)
             rpc_name: Name of the RPC function in Supabase
+            oracle: Only return prophecies of this oracle (e.g. 'BBC')
+            month: Only return prophecies whose first target date is in this
+                YYYY-MM (local index with VECTOR_PARTITION=oracle_month only)
             
         Returns:
             List of similar items with their metadata
@@ -147,19 +251,15 @@ class Prophet:
             
         try:
             # Generate query embedding
-            query_embedding = self.embed_text(text)
-            
-            # Perform similarity search
-            response = self.supabase.rpc(
-                rpc_name,
-                {
-                    'query_embedding': query_embedding,
-                    'match_threshold': threshold,
-                    'match_count': limit
-                }
-            ).execute()
+            query_embedding = await self.aembed_array(text)
             
-            return response.data
+            if local_index_enabled() and self.index.ready:
+                return self.index.search(query_embedding, k=limit, threshold=threshold,
+                                         oracle=oracle, month=month)
+            
+            # Over-fetch from the RPC so that filtering and collapsing duplicates still leave limit results
+            return await match_distinct(self.supabase, query_embedding, limit, threshold, oracle=oracle,
+                                        rpc_name=rpc_name, table_name=self.table_name)
             
         except Exception as e:
             print(f"Error during similarity search: {e}")
@@ -178,124 +278,321 @@ class Prophet:
         return self.embed_text(texts)
     
     async def batch_store(self, 
-                         items: List[Dict[str, Any]]) -> Dict[str, Any]:
+                         items: List[Dict[str, Any]],
+                         chunk_size: int = 256,
+                         max_concurrency: int = 4,
+                         progress_callback: Optional[Callable[[Dict[str, Any]], None]] = None,
+                         dedupe: Optional[bool] = None) -> Dict[str, Any]:
         """
-        Store multiple vectors efficiently in a single operation.
+        Store multiple vectors efficiently in chunks.
+        
+        Each chunk is embedded with a single batched model call in a worker
+        thread and inserted as one request; up to max_concurrency inserts are
+        in flight while the next chunk is being encoded. A failed chunk does
+        not abort the remaining ones.
         
         Args:
-            items: List of dictionaries with 'id', 'text', and optional 'metadata'
+            items: List of dictionaries with 'id', 'text', and optional 'metadata',
+                'oracle' and 'target_dates' (local index partition)
+            chunk_size: Number of items embedded and inserted together
+            max_concurrency: Maximum number of concurrent insert requests
+            progress_callback: Called after each chunk with a progress dictionary
+            dedupe: Link items duplicating an earlier item of the batch, or an existing
+                prophecy of the same oracle in the local index, through canonical_id;
+                defaults to PROPHECY_DEDUPE. Existing prophecies are only checked once
+                the local index is ready, to avoid Supabase round trips per item.
             
         Returns:
-            Response data from the database
+            Dictionary containing:
+                - stored: Number of vectors inserted
+                - failed: List of {"chunk", "ids", "error"} for chunks that failed
+                - total: Number of items submitted
+                - duplicates: {prophecy_id: canonical_id} for stored items linked as duplicates
+                - inserted: Rows returned by the inserts (what batch_store returned before
+                  it was chunked), in chunk completion order
             
         Raises:
             ConnectionError: If Supabase client is not initialized
+            ValueError: If an item is missing 'id' or 'text', or chunk settings are invalid
         """
         if not self.supabase:
             raise ConnectionError("Supabase client not initialized")
+        if chunk_size < 1 or max_concurrency < 1:
+            raise ValueError("chunk_size and max_concurrency must be at least 1")
+        for item in items:
+            if 'id' not in item or 'text' not in item:
+                raise ValueError("Each item must contain 'id' and 'text' keys")
+        
+        loop = asyncio.get_running_loop()
+        semaphore = asyncio.Semaphore(max_concurrency)
+        summary: Dict[str, Any] = {"stored": 0, "failed": [], "total": len(items), "duplicates": {}, "inserted": []}
+        # (oracle, normalized text hash) -> first id of the batch with that text
+        batch_texts: Dict[Any, str] = {}
+        dedupe = dedupe_enabled() if dedupe is None else dedupe
+        check_existing = dedupe and local_index_enabled() and self.index.ready
+        if dedupe and not check_existing:
+            print("Local vector index not ready; only linking duplicates within the batch")
+        
+        def report(chunk_index: int) -> None:
+            if progress_callback:
+                progress_callback({
+                    "chunk": chunk_index,
+                    "stored": summary["stored"],
+                    "failed": sum(len(failure["ids"]) for failure in summary["failed"]),
+                    "total": summary["total"]
+                })
+        
+        async def insert_chunk(chunk_index: int,
+                               chunk: List[Dict[str, Any]],
+                               records: List[Dict[str, Any]],
+                               embeddings) -> None:
+            try:
+                response = await execute(self.supabase.table(self.table_name).insert(records))
+                summary["stored"] += len(records)
+                summary["inserted"].extend(response.data or [])
+                summary["duplicates"].update({record["prophecy_id"]: record["canonical_id"]
+                                              for record in records if "canonical_id" in record})
+                if local_index_enabled():
+                    self.index.add(
+                        [record["prophecy_id"] for record in records],
+                        [record["text"] for record in records],
+                        embeddings,
+                        [item.get('oracle') for item in chunk],
+                        [item.get('target_dates') for item in chunk],
+                        [record.get("canonical_id") for record in records]
+                    )
+            except Exception as e:
+                print(f"Error storing chunk {chunk_index}: {e}")
+                summary["failed"].append({
+                    "chunk": chunk_index,
+                    "ids": [record["prophecy_id"] for record in records],
+                    "error": str(e)
+                })
+            finally:
+                semaphore.release()
+                report(chunk_index)
+        
+        tasks = []
+        for chunk_index, start in enumerate(range(0, len(items), chunk_size)):
+            chunk = items[start:start + chunk_size]
+            await semaphore.acquire()
+            try:
+                # One batched forward pass per chunk
+                embeddings = await loop.run_in_executor(
+                    None, self.engine.encode, [item['text'] for item in chunk]
+                )
+            except Exception as e:
+                semaphore.release()
+                print(f"Error embedding chunk {chunk_index}: {e}")
+                summary["failed"].append({
+                    "chunk": chunk_index,
+                    "ids": [item['id'] for item in chunk],
+                    "error": str(e)
+                })
+                report(chunk_index)
+                continue
             
-        try:
-            # Process each item
-            data_to_insert = []
-            for item in items:
-                if 'id' not in item or 'text' not in item:
-                    raise ValueError("Each item must contain 'id' and 'text' keys")
-                
-                # Generate embedding
-                embedding = self.embed_text(item['text'])
-                
-                # Prepare record
+            records = []
+            for item, embedding in zip(chunk, embeddings):
+                canonical_id = None
+                if dedupe:
+                    batch_key = (item.get('oracle'), text_hash(item['text']))
+                    canonical_id = batch_texts.get(batch_key)
+                    if canonical_id is None:
+                        if check_existing:
+                            duplicate = self.index.find_duplicate(item['text'], embedding, dedupe_threshold(),
+                                                                  oracle=item.get('oracle'))
+                            canonical_id = duplicate["prophecy_id"] if duplicate else None
+                        batch_texts[batch_key] = canonical_id or item['id']
                 record = {
                     "prophecy_id": item['id'],
-                    "embedding": embedding,
+                    "embedding": embedding.tolist(),
                     "text": item['text']
                 }
-                
+                if canonical_id:
+                    record["canonical_id"] = canonical_id
                 if 'metadata' in item and item['metadata']:
                     record.update(item['metadata'])
-                
-                data_to_insert.append(record)
-                
-            # Insert all records
-            response = self.supabase.table(self.table_name).insert(data_to_insert).execute()
-            print(f"Successfully stored {len(data_to_insert)} vectors")
-            return response.data
+                records.append(record)
             
-        except Exception as e:
-            print(f"Error batch storing vectors: {e}")
-            raise
+            tasks.append(asyncio.create_task(insert_chunk(chunk_index, chunk, records, embeddings)))
+        
+        await asyncio.gather(*tasks)
+        print(f"Successfully stored {summary['stored']} of {summary['total']} vectors "
+              f"({len(summary['failed'])} failed chunks)")
+        return summary
     
-    def export_vectors(self, ids: Optional[List[str]] = None) -> Dict[str, Any]:
+    def iter_vectors(self, 
+                     ids: Optional[List[str]] = None, 
+                     page_size: int = 1000) -> Iterator[Dict[str, Any]]:
         """
-        Export vectors and metadata from the database.
+        Stream vectors and metadata from the database one page at a time.
+        
+        Pages are fetched with keyset pagination on the table's primary key, so
+        memory use is bounded by page_size regardless of the table size.
         
         Args:
-            ids: Optional list of specific IDs to export
+            ids: Optional list of specific prophecy IDs to export
+            page_size: Number of rows fetched per request
             
-        Returns:
-            Dictionary with vectors and metadata
+        Yields:
+            Dictionaries with 'id', 'prophecy_id', 'text' and a float32 'embedding' array
             
         Raises:
             ConnectionError: If Supabase client is not initialized
         """
         if not self.supabase:
             raise ConnectionError("Supabase client not initialized")
-            
-        try:
-            query = self.supabase.table(self.table_name)
+        
+        last_id = 0
+        while True:
+            query = (self.supabase.table(self.table_name)
+                     .select("id,prophecy_id,text,embedding")
+                     .gt("id", last_id))
             
             # Filter by IDs if provided
             if ids:
                 query = query.in_("prophecy_id", ids)
-                
-            response = query.execute()
-            return response.data
             
+            rows = query.order("id").limit(page_size).execute().data or []
+            for row in rows:
+                row["embedding"] = parse_embedding(row["embedding"])
+                yield row
+            
+            if len(rows) < page_size:
+                return
+            last_id = rows[-1]["id"]
+    
+    def export_vectors(self, ids: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """
+        Export vectors and metadata from the database.
+        
+        Loads every row into memory; use export_vectors_to_file for large tables.
+        
+        Args:
+            ids: Optional list of specific IDs to export
+            
+        Returns:
+            List of rows with embeddings as lists of floats
+            
+        Raises:
+            ConnectionError: If Supabase client is not initialized
+        """
+        try:
+            return [
+                {**row, "embedding": row["embedding"].tolist()}
+                for row in self.iter_vectors(ids)
+            ]
+        except Exception as e:
+            print(f"Error exporting vectors: {e}")
+            raise
+    
+    def export_vectors_to_file(self, 
+                               path_prefix: str, 
+                               ids: Optional[List[str]] = None, 
+                               page_size: int = 1000) -> int:
+        """
+        Export vectors to a memory-mappable float32 .npy matrix plus a parallel .jsonl file.
+        
+        Runs in constant memory; reload with vector_io.load_vector_export.
+        
+        Args:
+            path_prefix: Output path without extension
+            ids: Optional list of specific prophecy IDs to export
+            page_size: Number of rows fetched per request
+            
+        Returns:
+            Number of vectors exported
+            
+        Raises:
+            ConnectionError: If Supabase client is not initialized
+        """
+        try:
+            count = write_vector_export(self.iter_vectors(ids, page_size), path_prefix)
+            print(f"Exported {count} vectors to {path_prefix}.npy")
+            return count
         except Exception as e:
             print(f"Error exporting vectors: {e}")
             raise
             
-    def generate_prophet_data(self, text: str, hash_method: str = 'sha256') -> Dict[str, Any]:
+    def generate_prophet_data(self, 
+                              text: str, 
+                              hash_method: str = 'sha256', 
+                              hash_input: str = 'bytes',
+                              encoding: str = 'list') -> Dict[str, Any]:
         """
         Generate and return prophet data with original text, embedded vector, and hash.
         
         Args:
             text: Prophet text to embed
             hash_method: Hashing algorithm to use ('sha256', 'md5', 'sha1')
+            hash_input: 'bytes' hashes the canonical float32 bytes of the embedding;
+                'json' hashes its JSON float list as earlier versions did
+            encoding: 'list' ships the embedding as a JSON float list; 'float32' and
+                'float16' ship base64 of its little-endian bytes (about 4x and 8x smaller)
             
         Returns:
             Dictionary containing:
                 - prophet: Original text
-                - embededProphet: Vector embedding
+                - embededProphet: Vector embedding as list of floats, or a base64 string
+                - embededProphetDtype: 'float32' or 'float16' (base64 encodings only)
                 - embededProphetHash: Hash of the embedding
                 
         Raises:
-            ValueError: If an unsupported hash method is specified
+            ValueError: If an unsupported hash method, hash input or encoding is specified
         """
-
+        self._check_hash_method(hash_method)
+        
+        try:
+            return self._build_prophet_data(text, self.embed_array(text), hash_method, hash_input, encoding)
+        except Exception as e:
+            print(f"Error generating prophet data: {e}")
+            raise
+    
+    async def agenerate_prophet_data(self, 
+                                     text: str, 
+                                     hash_method: str = 'sha256', 
+                                     hash_input: str = 'bytes',
+                                     encoding: str = 'list') -> Dict[str, Any]:
+        """
+        Async variant of generate_prophet_data that embeds through the batching queue.
+        """
+        self._check_hash_method(hash_method)
+        
+        try:
+            return self._build_prophet_data(text, await self.aembed_array(text), hash_method, hash_input, encoding)
+        except Exception as e:
+            print(f"Error generating prophet data: {e}")
+            raise
+    
+    @staticmethod
+    def _check_hash_method(hash_method: str) -> None:
         # Support for different hash methods
         if hash_method not in ['sha256', 'md5', 'sha1']:
             raise ValueError(f"Unsupported hash method: {hash_method}. Use 'sha256', 'md5', or 'sha1'")
-        
-        try:
-            embedded_prophet = self.embed_text(text)
-            embedding_json = json.dumps(embedded_prophet, sort_keys=True)
-            
-            # Create hash based on specified method
-            if hash_method == 'sha256':
-                embedded_prophet_hash = hashlib.sha256(embedding_json.encode()).hexdigest()
-            elif hash_method == 'md5':
-                embedded_prophet_hash = hashlib.md5(embedding_json.encode()).hexdigest()
-            else:  # sha1
-                embedded_prophet_hash = hashlib.sha1(embedding_json.encode()).hexdigest()
-            
-            # Return the prophet data in the requested format
+    
+    @staticmethod
+    def _build_prophet_data(text: str, 
+                            embedded_prophet: np.ndarray, 
+                            hash_method: str, 
+                            hash_input: str,
+                            encoding: str = 'list') -> Dict[str, Any]:
+        # Return the prophet data in the requested format; the list or base64 view
+        # is only materialized here, at the serialization boundary
+        if encoding == 'list':
             return {
                 "prophet": text,
-                "embededProphet": embedded_prophet,
-                "embededProphetHash": embedded_prophet_hash
+                "embededProphet": embedded_prophet.tolist(),
+                "embededProphetHash": hash_embedding(embedded_prophet, hash_method, hash_input)
             }
-            
-        except Exception as e:
-            print(f"Error generating prophet data: {e}")
-            raise
\ No newline at end of file
+        if hash_input != 'bytes':
+            raise ValueError("Compact embedding encodings only support hash_input='bytes'")
+        
+        # Hash what a reader decodes, so the hash is reproducible from the payload
+        published = published_embedding(embedded_prophet, encoding)
+        return {
+            "prophet": text,
+            "embededProphet": encode_embedding(published, encoding),
+            "embededProphetDtype": encoding,
+            "embededProphetHash": hash_embedding(published, hash_method, hash_input)
+        }
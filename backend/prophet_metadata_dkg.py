@@ -1,6 +1,5 @@
-from dkg import DKG
-from typing import Literal, Dict, Any, Optional
-from dkg.providers import BlockchainProvider, NodeHTTPProvider
+from typing import Literal, Dict, Any, List, Optional, Union
+from functools import lru_cache
 import json
 import os
 import sys
@@ -15,6 +14,17 @@ PROPHET_JSONLD_CONTEXT = {
     "embededProphetHash": "https://github.com/JinTanba/prophetdotfun/blob/main/backend/ontology/terms.md"
 }
 
+# Context for compact payloads: embededProphet is base64 of little-endian bytes of the dtype in embededProphetDtype
+PROPHET_JSONLD_COMPACT_CONTEXT = {
+    **PROPHET_JSONLD_CONTEXT,
+    "xsd": "http://www.w3.org/2001/XMLSchema#",
+    "embededProphet": {
+        "@id": "https://github.com/JinTanba/prophetdotfun/blob/main/backend/ontology/terms.md",
+        "@type": "xsd:base64Binary"
+    },
+    "embededProphetDtype": "https://github.com/JinTanba/prophetdotfun/blob/main/backend/ontology/terms.md"
+}
+
 DEFAULT_ASSET_OPTIONS = {
     "epochs_num": 1,
     "immutable": True,
@@ -22,33 +32,95 @@ DEFAULT_ASSET_OPTIONS = {
 }
 
 rpc_endpoint = os.getenv("RPC_ENDPOINT_BC1", "http://127.0.0.1:9545")
-node_provider = NodeHTTPProvider(endpoint_uri="https://sepolia.base.org", api_version="v1")
-blockchain_provider = BlockchainProvider(
-    environment="development",
-    blockchain_id="base:84532",
-    rpc_uri="https://sepolia.base.org"
-)
-dkg = DKG(node_provider, blockchain_provider)
 
-def create_knowledge(prophet_data: Dict[str, Any], options: Optional[Dict[str, Any]] = None) -> str:
+@lru_cache(maxsize=None)
+def get_dkg():
+    """
+    Build the DKG client on first use and reuse it afterwards.
+
+    Importing dkg and creating its providers is deferred so that importing this
+    module stays cheap and does not need network access.
+    """
+    from dkg import DKG
+    from dkg.providers import BlockchainProvider, NodeHTTPProvider
+
+    node_provider = NodeHTTPProvider(endpoint_uri="https://sepolia.base.org", api_version="v1")
+    blockchain_provider = BlockchainProvider(
+        environment="development",
+        blockchain_id="base:84532",
+        rpc_uri="https://sepolia.base.org"
+    )
+    return DKG(node_provider, blockchain_provider)
+
+def dkg_ready() -> bool:
+    return get_dkg.cache_info().currsize > 0
+
+def prophet_id(prophet_data: Dict[str, Any]) -> str:
+    return f"urn:prophet:{hashlib.md5(prophet_data['prophet'].encode()).hexdigest()}"
+
+def _prophet_node(prophet_data: Dict[str, Any]) -> Dict[str, Any]:
+    compact = "embededProphetDtype" in prophet_data
+    return {
+        "@context": PROPHET_JSONLD_COMPACT_CONTEXT if compact else PROPHET_JSONLD_CONTEXT,
+        "@id": prophet_id(prophet_data),
+        "@type": "Dataset",
+        **prophet_data
+    }
+
+def _asset_options(options: Optional[Dict[str, Any]]) -> Dict[str, Any]:
     final_options = DEFAULT_ASSET_OPTIONS.copy()
     if options:
         final_options.update(options)
+    return final_options
 
+def create_knowledge(prophet_data: Dict[str, Any], options: Optional[Dict[str, Any]] = None) -> str:
     content = {
-        "public": [
-            {
-                "@context": PROPHET_JSONLD_CONTEXT,
-                "@id": f"urn:prophet:{hashlib.md5(prophet_data['prophet'].encode()).hexdigest()}",
-                "@type": "Dataset",
-                **prophet_data
-            }
-        ]
+        "public": [_prophet_node(prophet_data)]
     }
 
     try:
-        result = dkg.asset.create(content, final_options)
+        result = get_dkg().asset.create(content, _asset_options(options))
         return result["UAL"]
     except Exception as e:
         raise
 
+def create_knowledge_batch(prophet_data_list: List[Dict[str, Any]],
+                           options: Optional[Dict[str, Any]] = None,
+                           max_per_asset: int = 50) -> Dict[str, Union[Dict[str, str], Exception]]:
+    """
+    Publish many prophecies as knowledge assets holding up to max_per_asset Datasets each,
+    paying one on-chain transaction per asset instead of one per prophecy.
+
+    Args:
+        prophet_data_list: Outputs of Prophet.generate_prophet_data
+        options: DKG asset options, merged over DEFAULT_ASSET_OPTIONS
+        max_per_asset: Maximum number of prophecies packed into one asset
+
+    Returns:
+        Mapping of each urn:prophet: id to {"ual": asset UAL, "sub_id": the id within the asset},
+        or to the exception raised while publishing its asset.
+    """
+    if max_per_asset < 1:
+        raise ValueError("max_per_asset must be at least 1")
+
+    # The same sentence maps to the same @id, so publish it once
+    nodes: Dict[str, Dict[str, Any]] = {}
+    for prophet_data in prophet_data_list:
+        nodes.setdefault(prophet_id(prophet_data), _prophet_node(prophet_data))
+
+    final_options = _asset_options(options)
+    dkg = get_dkg()
+    ids = list(nodes)
+    published: Dict[str, Union[Dict[str, str], Exception]] = {}
+    for start in range(0, len(ids), max_per_asset):
+        chunk = ids[start:start + max_per_asset]
+        try:
+            result = dkg.asset.create({"public": [nodes[node_id] for node_id in chunk]}, final_options)
+        except Exception as e:
+            print(f"Error publishing {len(chunk)} prophecies to the DKG: {e}")
+            for node_id in chunk:
+                published[node_id] = e
+            continue
+        for node_id in chunk:
+            published[node_id] = {"ual": result["UAL"], "sub_id": node_id}
+    return published
@@ -0,0 +1,232 @@
+import os
+import tempfile
+import threading
+from typing import Optional, Tuple
+
+import numpy as np
+
+VECTOR_PRECISIONS = ("float32", "float16", "int8", "binary")
+
+# Rows scored per step, so search never materializes a float32 copy of the whole matrix
+SEARCH_BLOCK_SIZE = 65536
+
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def _check_precision(precision: str) -> None:
+    if precision not in VECTOR_PRECISIONS:
+        raise ValueError(f"Unsupported vector precision: {precision}. Use one of {', '.join(VECTOR_PRECISIONS)}")
+
+
+def quantize_int8(vectors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Symmetric scalar quantization with one scale per vector.
+
+    Returns:
+        Tuple of int8 codes (n, dimension) and float32 scales (n,)
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    scales = np.abs(vectors).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    codes = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+
+def quantize_binary(vectors: np.ndarray) -> np.ndarray:
+    """
+    Sign-bit codes packed eight dimensions per byte.
+    """
+    return np.packbits(np.asarray(vectors) > 0, axis=1)
+
+
+def hamming_distances(codes: np.ndarray, query_code: np.ndarray) -> np.ndarray:
+    return _POPCOUNT[np.bitwise_xor(codes, query_code)].sum(axis=1, dtype=np.int32)
+
+
+class QuantizedMatrix:
+    def __init__(self,
+                 dimension: int,
+                 precision: str = "float16",
+                 rescore_multiplier: int = 10,
+                 rescore_dir: Optional[str] = None):
+        """
+        Exact-scan vector store holding reduced-precision codes.
+
+        Exposes the subset of the faiss index interface used by LocalVectorIndex
+        (ntotal, add, search). Codes live in a buffer that grows geometrically,
+        so adding vectors between searches costs amortized O(1) per vector.
+
+        Only the packed sign bits of binary vectors are kept in memory. Their
+        float32 vectors are appended to an unnamed temporary file, and a search
+        rescores the k * rescore_multiplier nearest candidates by Hamming distance
+        against a memory map of that file. Scores are then the exact cosine
+        similarity, so the usual similarity thresholds still apply.
+
+        Args:
+            dimension: Embedding dimension
+            precision: One of 'float16', 'int8', 'binary'
+            rescore_multiplier: Candidate pool size relative to k for binary search
+            rescore_dir: Directory for the binary rescoring file (defaults to
+                VECTOR_RESCORE_DIR or the system temporary directory)
+        """
+        _check_precision(precision)
+        if precision == "float32":
+            raise ValueError("Use a float index for float32 vectors")
+
+        self.dimension = dimension
+        self.precision = precision
+        self.rescore_multiplier = rescore_multiplier
+        self.ntotal = 0
+        if precision == "float16":
+            self._codes = np.empty((0, dimension), dtype=np.float16)
+        elif precision == "int8":
+            self._codes = np.empty((0, dimension), dtype=np.int8)
+        else:
+            self._codes = np.empty((0, (dimension + 7) // 8), dtype=np.uint8)
+        self._scales = np.empty(0, dtype=np.float32)
+        self._lock = threading.Lock()
+        self._rescore_file = None
+        self._rescore_view: Optional[np.ndarray] = None
+        if precision == "binary":
+            self._rescore_file = tempfile.TemporaryFile(dir=rescore_dir or os.getenv("VECTOR_RESCORE_DIR"))
+
+    def _reserve(self, rows: int) -> None:
+        capacity = self._codes.shape[0]
+        if rows <= capacity:
+            return
+        capacity = max(rows, 2 * capacity, 1024)
+        codes = np.empty((capacity, self._codes.shape[1]), dtype=self._codes.dtype)
+        codes[:self.ntotal] = self._codes[:self.ntotal]
+        self._codes = codes
+        if self.precision == "int8":
+            scales = np.empty(capacity, dtype=np.float32)
+            scales[:self.ntotal] = self._scales[:self.ntotal]
+            self._scales = scales
+
+    def add(self, vectors: np.ndarray) -> None:
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, self.dimension)
+        n = vectors.shape[0]
+        with self._lock:
+            self._reserve(self.ntotal + n)
+            rows = slice(self.ntotal, self.ntotal + n)
+            if self.precision == "float16":
+                self._codes[rows] = vectors
+            elif self.precision == "int8":
+                self._codes[rows], self._scales[rows] = quantize_int8(vectors)
+            else:
+                self._codes[rows] = quantize_binary(vectors)
+                self._rescore_file.seek(0, os.SEEK_END)
+                self._rescore_file.write(np.ascontiguousarray(vectors).tobytes())
+                self._rescore_file.flush()
+            self.ntotal += n
+
+    def _rescore_vectors(self, rows: int) -> np.ndarray:
+        # Remap only when vectors were added since the last search
+        with self._lock:
+            if self._rescore_view is None or self._rescore_view.shape[0] != rows:
+                self._rescore_view = np.memmap(self._rescore_file, dtype=np.float32, mode="r",
+                                               shape=(rows, self.dimension))
+            return self._rescore_view
+
+    @property
+    def nbytes(self) -> int:
+        """
+        Memory held by the codes (binary rescoring vectors stay on disk).
+        """
+        return self._codes[:self.ntotal].nbytes + self._scales[:self.ntotal].nbytes
+
+    def _scores(self, codes: np.ndarray, scales: np.ndarray, query: np.ndarray) -> np.ndarray:
+        scores = np.empty(codes.shape[0], dtype=np.float32)
+        for start in range(0, codes.shape[0], SEARCH_BLOCK_SIZE):
+            block = codes[start:start + SEARCH_BLOCK_SIZE].astype(np.float32)
+            scores[start:start + SEARCH_BLOCK_SIZE] = block @ query
+        if self.precision == "int8":
+            scores *= scales
+        return scores
+
+    def search(self, queries: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Return the top-k inner-product scores and row numbers for each query, padded with -1.
+        """
+        queries = np.asarray(queries, dtype=np.float32).reshape(-1, self.dimension)
+        all_scores = np.full((queries.shape[0], k), -np.inf, dtype=np.float32)
+        all_rows = np.full((queries.shape[0], k), -1, dtype=np.int64)
+        ntotal = self.ntotal
+        if ntotal == 0:
+            return all_scores, all_rows
+
+        codes, scales = self._codes[:ntotal], self._scales[:ntotal]
+        rescore_vectors = self._rescore_vectors(ntotal) if self.precision == "binary" else None
+        for qi, query in enumerate(queries):
+            if self.precision == "binary":
+                pool = min(ntotal, k * self.rescore_multiplier)
+                distances = hamming_distances(codes, quantize_binary(query[None, :])[0])
+                # Sorted rows read the memory map front to back
+                candidates = np.sort(np.argpartition(distances, pool - 1)[:pool])
+                scores = rescore_vectors[candidates] @ query
+            else:
+                candidates = None
+                scores = self._scores(codes, scales, query)
+
+            top = min(k, scores.shape[0])
+            best = np.argpartition(-scores, top - 1)[:top]
+            best = best[np.argsort(-scores[best])]
+            all_scores[qi, :top] = scores[best]
+            all_rows[qi, :top] = best if candidates is None else candidates[best]
+        return all_scores, all_rows
+
+
+def recall_at_k(vectors: np.ndarray,
+                queries: np.ndarray,
+                precision: str,
+                k: int = 10,
+                rescore_multiplier: int = 10) -> float:
+    """
+    Benchmark a precision against exact float32 search.
+
+    Args:
+        vectors: Normalized float32 corpus (n, dimension)
+        queries: Normalized float32 queries (m, dimension)
+        precision: Precision to evaluate
+        k: Number of neighbours compared
+        rescore_multiplier: Candidate pool size relative to k for binary search
+
+    Returns:
+        Mean fraction of the exact top-k recovered by the quantized search
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    queries = np.asarray(queries, dtype=np.float32)
+    k = min(k, vectors.shape[0])
+    exact = np.argsort(-(queries @ vectors.T), axis=1)[:, :k]
+    if precision == "float32":
+        return 1.0
+
+    matrix = QuantizedMatrix(vectors.shape[1], precision, rescore_multiplier)
+    matrix.add(vectors)
+    _, rows = matrix.search(queries, k)
+    hits = [len(set(expected) & set(found)) for expected, found in zip(exact, rows)]
+    return float(np.mean(hits)) / k
+
+
+if __name__ == "__main__":
+    # Usage: python quantization.py <export prefix> [num queries] [k]
+    # Benchmarks every precision against float32 on a Prophet.export_vectors_to_file export.
+    import sys
+    from vector_io import load_vector_export
+
+    corpus, _ = load_vector_export(sys.argv[1])
+    corpus = np.asarray(corpus, dtype=np.float32)
+    num_queries = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    top_k = int(sys.argv[3]) if len(sys.argv) > 3 else 10
+    sample = np.random.default_rng(0).choice(corpus.shape[0], min(num_queries, corpus.shape[0]), replace=False)
+
+    print(f"{corpus.shape[0]} vectors, dimension {corpus.shape[1]}, {len(sample)} queries, k={top_k}")
+    for name in VECTOR_PRECISIONS:
+        if name == "float32":
+            size = corpus.nbytes
+        else:
+            quantized = QuantizedMatrix(corpus.shape[1], name)
+            quantized.add(corpus)
+            size = quantized.nbytes
+        recall = recall_at_k(corpus, corpus[sample], name, top_k)
+        print(f"{name:>8}: {size / 2**20:9.2f} MiB ({corpus.nbytes / size:4.1f}x)  recall@{top_k}={recall:.3f}")
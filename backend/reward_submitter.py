@@ -0,0 +1,332 @@
+"""
+Submit settled rewards to ProphetNFT in batched updateRewards transactions.
+
+Usage (from backend/, with the usual .env and REWARD_SUBMITTER_KEY set to the contract owner's key):
+    python reward_submitter.py --date YYYY-MM-DD [--oracle BBC] [--dry-run]
+
+Rewards for the given settlement date are read from the settlements table
+(the best-matching headline per prophecy), queued in SQLite and sent in
+chunks sized to fit the gas budget. Progress is persisted per token, so an
+interrupted run picks up where it stopped without resending confirmed rewards.
+"""
+import argparse
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from web3.exceptions import ContractLogicError
+
+from chain import get_prophet_contract, get_web3
+
+logger = logging.getLogger(__name__)
+
+PENDING = "pending"
+SENT = "sent"
+CONFIRMED = "confirmed"
+# updateReward would revert for the token (redeemed or nonexistent); not retried
+FAILED = "failed"
+
+# Stake token (USDC) decimals; settlement payouts are in whole tokens
+STAKE_TOKEN_DECIMALS = 6
+
+
+def rewards_from_settlements(rows: Iterable[Dict[str, Any]]) -> Dict[int, int]:
+    """
+    Reward per token id in stake-token base units, taking each prophecy's best-matching headline.
+
+    Prophecies whose id is not a token id (created through the API without
+    minting) have nothing to update on chain and are skipped.
+    """
+    best: Dict[str, Dict[str, Any]] = {}
+    skipped = set()
+    for row in rows:
+        if not str(row["prophecy_id"]).isdigit():
+            skipped.add(row["prophecy_id"])
+            continue
+        current = best.get(row["prophecy_id"])
+        if current is None or row["similarity"] > current["similarity"]:
+            best[row["prophecy_id"]] = row
+    if skipped:
+        logger.warning(f"Skipping {len(skipped)} prophecies without a numeric token id")
+    return {int(prophecy_id): int(round(row["payout"] * 10 ** STAKE_TOKEN_DECIMALS))
+            for prophecy_id, row in best.items()}
+
+
+def fetch_settlements(supabase,
+                      oracle_date: str,
+                      oracle: Optional[str] = None,
+                      page_size: int = 1000) -> List[Dict[str, Any]]:
+    """
+    Page through the settlements of one date by id, so the PostgREST row cap does not truncate them.
+    """
+    settlements = []
+    last_id = 0
+    while True:
+        query = (supabase.table("settlements")
+                 .select("id,prophecy_id,similarity,payout")
+                 .eq("oracle_date", oracle_date)
+                 .gt("id", last_id))
+        if oracle:
+            query = query.eq("oracle", oracle)
+        rows = query.order("id").limit(page_size).execute().data or []
+        settlements.extend(rows)
+        if len(rows) < page_size:
+            return settlements
+        last_id = rows[-1]["id"]
+
+
+class RewardSubmitter:
+    def __init__(self,
+                 db_path: str,
+                 private_key: str,
+                 max_chunk: int = 500,
+                 gas_budget: int = 10_000_000,
+                 gas_margin: float = 1.2,
+                 max_in_flight: int = 4,
+                 receipt_timeout: float = 180.0):
+        """
+        Batched, resumable reward updates through ProphetNFT.updateRewards.
+
+        Chunk size starts at max_chunk and is halved until the estimated gas of
+        a chunk fits gas_budget; later chunks reuse the size that fit. A chunk
+        whose estimate reverts (one redeemed or nonexistent token reverts the
+        whole updateRewards call) is bisected down to the offending tokens,
+        which are marked failed so the rest still go through. Up to
+        max_in_flight transactions are sent back to back with locally assigned
+        nonces before waiting for receipts. Every token's state (pending, sent
+        with its tx hash, confirmed, failed with the revert reason) is kept in SQLite.
+
+        Args:
+            db_path: SQLite database file for submission progress
+            private_key: Key of the contract owner
+            max_chunk: Maximum tokens per transaction
+            gas_budget: Maximum gas per transaction
+            gas_margin: Multiplier applied to gas estimates
+            max_in_flight: Transactions sent before waiting for receipts
+            receipt_timeout: Seconds to wait for each receipt
+        """
+        self.web3 = get_web3()
+        self.contract = get_prophet_contract()
+        self.account = self.web3.eth.account.from_key(private_key)
+        self.max_chunk = max_chunk
+        self.chunk_size = max_chunk
+        self.gas_budget = gas_budget
+        self.gas_margin = gas_margin
+        self.max_in_flight = max_in_flight
+        self.receipt_timeout = receipt_timeout
+        self._nonce: Optional[int] = None
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS reward_updates (
+                    token_id TEXT PRIMARY KEY,
+                    reward TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    tx_hash TEXT,
+                    error TEXT,
+                    updated_at REAL NOT NULL
+                )
+            """)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_reward_updates_status ON reward_updates(status)")
+
+    def enqueue(self, rewards: Dict[int, int]) -> int:
+        """
+        Queue rewards; tokens whose queued reward is unchanged keep their progress.
+
+        Returns:
+            Number of tokens (re)queued
+        """
+        now = time.time()
+        with self._lock:
+            existing = {row["token_id"]: row["reward"]
+                        for row in self._conn.execute("SELECT token_id, reward FROM reward_updates")}
+            changed = [(str(token_id), str(reward), PENDING, now) for token_id, reward in rewards.items()
+                       if existing.get(str(token_id)) != str(reward)]
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO reward_updates (token_id, reward, status, tx_hash, error, updated_at) "
+                "VALUES (?, ?, ?, NULL, NULL, ?)",
+                changed,
+            )
+        return len(changed)
+
+    def _rows(self, status: str) -> List[sqlite3.Row]:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT * FROM reward_updates WHERE status = ? ORDER BY CAST(token_id AS INTEGER)", (status,)
+            ).fetchall()
+
+    def _mark(self,
+              token_ids: List[str],
+              status: str,
+              tx_hash: Optional[str] = None,
+              error: Optional[str] = None) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "UPDATE reward_updates SET status = ?, tx_hash = ?, error = ?, updated_at = ? WHERE token_id = ?",
+                [(status, tx_hash, error, now, token_id) for token_id in token_ids],
+            )
+
+    def _next_nonce(self) -> int:
+        if self._nonce is None:
+            self._nonce = self.web3.eth.get_transaction_count(self.account.address, "pending")
+        nonce = self._nonce
+        self._nonce += 1
+        return nonce
+
+    def _call(self, chunk: List[sqlite3.Row]):
+        return self.contract.functions.updateRewards(
+            [int(row["token_id"]) for row in chunk], [int(row["reward"]) for row in chunk]
+        )
+
+    def _fit_chunk(self, rows: List[sqlite3.Row]) -> Tuple[List[sqlite3.Row], int, List[sqlite3.Row]]:
+        """
+        Largest leading chunk (up to the current chunk size) that estimates without
+        reverting and whose gas fits the budget.
+
+        Tokens that revert on their own are marked failed and dropped.
+
+        Returns:
+            The chunk (empty if every row failed), its gas limit and the rows left after it
+        """
+        size = min(self.chunk_size, len(rows))
+        while rows:
+            chunk = rows[:size]
+            try:
+                gas = int(self._call(chunk).estimate_gas({"from": self.account.address}) * self.gas_margin)
+            except ContractLogicError as e:
+                if size > 1:
+                    # Bisect towards the token that reverts
+                    size = max(1, size // 2)
+                    continue
+                logger.error(f"updateRewards reverts for token {chunk[0]['token_id']}: {e}")
+                self._mark([chunk[0]["token_id"]], FAILED, error=str(e))
+                rows = rows[1:]
+                size = min(self.chunk_size, len(rows))
+                continue
+            if gas <= self.gas_budget or size == 1:
+                return chunk, gas, rows[size:]
+            # Only gas, not a revert, shrinks the size reused for later chunks
+            size = max(1, size // 2)
+            self.chunk_size = size
+        return [], 0, []
+
+    def _send(self, chunk: List[sqlite3.Row], gas: int) -> str:
+        tx = self._call(chunk).build_transaction({
+            "from": self.account.address,
+            "nonce": self._next_nonce(),
+            "gas": gas,
+        })
+        signed = self.account.sign_transaction(tx)
+        try:
+            tx_hash = self.web3.eth.send_raw_transaction(signed.rawTransaction).hex()
+        except Exception:
+            # Resync the nonce from the node before the next attempt
+            self._nonce = None
+            raise
+        self._mark([row["token_id"] for row in chunk], SENT, tx_hash)
+        logger.info(f"Sent updateRewards for {len(chunk)} tokens: {tx_hash}")
+        return tx_hash
+
+    def _settle_receipt(self, tx_hash: str) -> bool:
+        """
+        Wait for a sent transaction and record its outcome.
+
+        Returns:
+            True if it succeeded
+        """
+        with self._lock:
+            token_ids = [row["token_id"] for row in self._conn.execute(
+                "SELECT token_id FROM reward_updates WHERE tx_hash = ? AND status = ?", (tx_hash, SENT))]
+        try:
+            receipt = self.web3.eth.wait_for_transaction_receipt(tx_hash, timeout=self.receipt_timeout)
+        except Exception as e:
+            logger.warning(f"No receipt for {tx_hash} yet ({e}); will check again on the next run")
+            return False
+        if receipt["status"] == 1:
+            self._mark(token_ids, CONFIRMED, tx_hash)
+            return True
+        logger.error(f"updateRewards transaction {tx_hash} reverted; requeueing {len(token_ids)} tokens")
+        self._mark(token_ids, PENDING)
+        self._nonce = None
+        return False
+
+    def resume(self) -> None:
+        """
+        Resolve transactions left in the sent state by an earlier run.
+        """
+        for tx_hash in sorted({row["tx_hash"] for row in self._rows(SENT)}):
+            self._settle_receipt(tx_hash)
+
+    def submit(self) -> Dict[str, int]:
+        """
+        Send every pending reward, a few transactions at a time.
+
+        Returns:
+            Counts of tokens per status after the run and the number of transactions sent
+        """
+        self.resume()
+        transactions = 0
+        while True:
+            pending = list(self._rows(PENDING))
+            if not pending:
+                break
+            sent = []
+            while pending and len(sent) < self.max_in_flight:
+                chunk, gas, pending = self._fit_chunk(pending)
+                if chunk:
+                    sent.append(self._send(chunk, gas))
+            if not sent:
+                break
+            transactions += len(sent)
+            results = [self._settle_receipt(tx_hash) for tx_hash in sent]
+            if not any(results):
+                logger.error("No transaction in this round succeeded; stopping")
+                break
+        with self._lock:
+            counts = dict(self._conn.execute("SELECT status, COUNT(*) FROM reward_updates GROUP BY status").fetchall())
+        counts["transactions"] = transactions
+        return counts
+
+
+def create_reward_submitter() -> RewardSubmitter:
+    """
+    Build the submitter from REWARD_SUBMITTER_KEY, REWARD_DB, REWARD_MAX_CHUNK and REWARD_GAS_BUDGET.
+    """
+    private_key = os.getenv("REWARD_SUBMITTER_KEY")
+    if not private_key:
+        raise ValueError("REWARD_SUBMITTER_KEY environment variable is required")
+    return RewardSubmitter(
+        os.getenv("REWARD_DB", "rewards.sqlite3"),
+        private_key,
+        max_chunk=int(os.getenv("REWARD_MAX_CHUNK", "500")),
+        gas_budget=int(os.getenv("REWARD_GAS_BUDGET", "10000000")),
+        max_in_flight=int(os.getenv("REWARD_MAX_IN_FLIGHT", "4")),
+    )
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+    from db import get_supabase
+
+    parser = argparse.ArgumentParser(description="Submit settled rewards to ProphetNFT")
+    parser.add_argument("--date", required=True, help="Settlement date (oracle_date) to submit")
+    parser.add_argument("--oracle", help="Only this oracle's settlements")
+    parser.add_argument("--dry-run", action="store_true", help="Print the rewards without sending")
+    args = parser.parse_args()
+
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO)
+    rewards = rewards_from_settlements(fetch_settlements(get_supabase(), args.date, args.oracle))
+    if args.dry_run:
+        for token_id, reward in sorted(rewards.items()):
+            print(token_id, reward)
+    else:
+        submitter = create_reward_submitter()
+        print(f"Queued {submitter.enqueue(rewards)} rewards")
+        print(submitter.submit())
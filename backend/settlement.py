@@ -0,0 +1,332 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Any, Callable, Dict, Hashable, List, Mapping, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from vector_io import iter_vector_export
+
+# Prophecies scored per step by settle_blocks (about 256 MiB of float32 at dimension 1024)
+SETTLEMENT_BLOCK_SIZE = 65536
+
+
+def normalize_rows(vectors) -> np.ndarray:
+    """
+    Scale each row to unit length (zero rows are left as zeros).
+
+    Returns:
+        float32 matrix of shape (n, dimension)
+    """
+    vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def similarity_matrix(oracle_embeddings, prophecy_embeddings, normalized: bool = False) -> np.ndarray:
+    """
+    Cosine similarity of every oracle against every prophecy in one matrix product.
+
+    Args:
+        oracle_embeddings: One oracle embedding (dimension,) or several (m, dimension)
+        prophecy_embeddings: Prophecy embeddings (n, dimension)
+        normalized: Skip normalization when both inputs are already unit length
+            (as returned by EmbeddingEngine.encode)
+
+    Returns:
+        float32 array of shape (n,) for a single oracle, otherwise (m, n)
+    """
+    single = np.ndim(oracle_embeddings) == 1
+    if normalized:
+        oracles = np.atleast_2d(np.asarray(oracle_embeddings, dtype=np.float32))
+        prophecies = np.asarray(prophecy_embeddings, dtype=np.float32)
+    else:
+        oracles = normalize_rows(oracle_embeddings)
+        prophecies = normalize_rows(prophecy_embeddings)
+    similarities = oracles @ prophecies.T
+    return similarities[0] if single else similarities
+
+
+def payouts(bets, similarities, threshold: float = 0.0) -> np.ndarray:
+    """
+    Settled amount of each bet: bet * (1 + similarity).
+
+    Positive similarity grows the stake and negative similarity shrinks it, as in
+    the simulation's Final_Bet. Prophecies whose absolute similarity is below
+    threshold are treated as unrelated to the oracle and keep their stake.
+
+    Args:
+        bets: Bet amounts (n,)
+        similarities: Similarities (n,) or (m, n) from similarity_matrix
+        threshold: Absolute similarity below which a bet is left untouched
+
+    Returns:
+        float64 payouts with the shape of similarities
+    """
+    bets = np.asarray(bets, dtype=np.float64)
+    similarities = np.asarray(similarities, dtype=np.float64)
+    factors = 1.0 + similarities
+    if threshold > 0:
+        factors = np.where(np.abs(similarities) < threshold, 1.0, factors)
+    return bets * factors
+
+
+def settle(oracle_embeddings,
+           prophecy_embeddings,
+           bets,
+           threshold: float = 0.0,
+           normalized: bool = False) -> Dict[str, np.ndarray]:
+    """
+    Settle prophecies against one or more oracle statements.
+
+    Args:
+        oracle_embeddings: One oracle embedding (dimension,) or several (m, dimension)
+        prophecy_embeddings: Prophecy embeddings (n, dimension)
+        bets: Bet amount of each prophecy (n,)
+        threshold: Absolute similarity below which a bet is left untouched
+        normalized: Inputs are already unit length
+
+    Returns:
+        Dictionary of 'similarities', 'payouts' and 'deltas' (payout - bet), each
+        (n,) for a single oracle or (m, n) for several
+    """
+    similarities = similarity_matrix(oracle_embeddings, prophecy_embeddings, normalized=normalized)
+    settled = payouts(bets, similarities, threshold)
+    return {
+        "similarities": similarities,
+        "payouts": settled,
+        "deltas": settled - np.asarray(bets, dtype=np.float64),
+    }
+
+
+def settle_blocks(oracle_embeddings,
+                  prophecy_embeddings,
+                  bets,
+                  users: Optional[Sequence[Hashable]] = None,
+                  threshold: float = 0.0,
+                  normalized: bool = False,
+                  block_size: int = SETTLEMENT_BLOCK_SIZE) -> Dict[str, Any]:
+    """
+    Settle prophecies block by block, accumulating totals instead of per-prophecy results.
+
+    prophecy_embeddings may be a memory-mapped matrix (see vector_io.load_vector_export);
+    only block_size rows are read and converted at a time, so peak memory does
+    not grow with the number of prophecies beyond the bets and user codes.
+
+    Args:
+        oracle_embeddings: One oracle embedding (dimension,) or several (m, dimension)
+        prophecy_embeddings: Prophecy embeddings (n, dimension), typically np.memmap
+        bets: Bet amount of each prophecy (n,)
+        users: Owner of each prophecy (n,); enables per-user deltas
+        threshold: Absolute similarity below which a bet is left untouched
+        normalized: Inputs are already unit length
+        block_size: Prophecies processed per step
+
+    Returns:
+        Dictionary with 'count', 'total_bet', 'total_payout' and 'user_deltas'
+        ({user: delta}, empty without users). Payout totals and deltas are floats
+        for a single oracle and (m,) arrays for several.
+    """
+    single = np.ndim(oracle_embeddings) == 1
+    oracles = np.atleast_2d(np.asarray(oracle_embeddings, dtype=np.float32))
+    if not normalized:
+        oracles = normalize_rows(oracles)
+    bets = np.asarray(bets, dtype=np.float64)
+    count = bets.shape[0]
+    if len(prophecy_embeddings) != count:
+        raise ValueError(f"Got {len(prophecy_embeddings)} embeddings for {count} bets")
+
+    if users is not None:
+        user_keys, user_codes = np.unique(np.asarray(users, dtype=object), return_inverse=True)
+        user_totals = np.zeros((oracles.shape[0], len(user_keys)), dtype=np.float64)
+    total_payout = np.zeros(oracles.shape[0], dtype=np.float64)
+
+    for start in range(0, count, block_size):
+        block = prophecy_embeddings[start:start + block_size]
+        result = settle(oracles, block, bets[start:start + block_size], threshold, normalized)
+        total_payout += result["payouts"].sum(axis=1)
+        if users is not None:
+            codes = user_codes[start:start + block_size]
+            for row, deltas in enumerate(result["deltas"]):
+                user_totals[row] += np.bincount(codes, weights=deltas, minlength=len(user_keys))
+
+    user_deltas = {}
+    if users is not None:
+        user_deltas = {user: (float(user_totals[0, i]) if single else user_totals[:, i])
+                       for i, user in enumerate(user_keys)}
+    return {
+        "count": count,
+        "total_bet": float(bets.sum()),
+        "total_payout": float(total_payout[0]) if single else total_payout,
+        "user_deltas": user_deltas,
+    }
+
+
+def settle_export(path_prefix: str,
+                  oracle_embeddings,
+                  stakes: Union[Mapping[str, Tuple[Hashable, float]],
+                                Callable[[List[str]], Mapping[str, Tuple[Hashable, float]]]],
+                  threshold: float = 0.0,
+                  block_size: int = SETTLEMENT_BLOCK_SIZE) -> Dict[str, Any]:
+    """
+    Stream-settle a vector export written by Prophet.export_vectors_to_file.
+
+    The export's metadata is read in step with its embeddings, and bets and
+    users are built per block, so memory is bounded by block_size and the
+    number of distinct users rather than the number of prophecies.
+    Rows whose prophecy has no stake are skipped (bet 0, no user).
+
+    Args:
+        path_prefix: Export path without extension
+        oracle_embeddings: One oracle embedding (dimension,) or several (m, dimension)
+        stakes: {prophecy_id: (creator, betting_amount)}, or a function called with
+            each block's prophecy ids that returns that mapping for those ids
+            (e.g. settlement_jobs.fetch_stakes)
+        threshold: Absolute similarity below which a bet is left untouched
+        block_size: Prophecies processed per step
+
+    Returns:
+        Totals as returned by settle_blocks
+    """
+    single = np.ndim(oracle_embeddings) == 1
+    oracles = np.atleast_2d(np.asarray(oracle_embeddings, dtype=np.float32))
+    count = 0
+    total_bet = 0.0
+    total_payout = np.zeros(oracles.shape[0], dtype=np.float64)
+    user_totals: Dict[Hashable, np.ndarray] = {}
+
+    for embeddings, metadata in iter_vector_export(path_prefix, block_size):
+        prophecy_ids = [row["prophecy_id"] for row in metadata]
+        block_stakes = stakes(prophecy_ids) if callable(stakes) else stakes
+        bets = np.zeros(len(prophecy_ids), dtype=np.float64)
+        users = np.empty(len(prophecy_ids), dtype=object)
+        users[:] = ""
+        for i, prophecy_id in enumerate(prophecy_ids):
+            stake = block_stakes.get(prophecy_id)
+            if stake is not None:
+                users[i], bets[i] = stake
+
+        result = settle_blocks(oracles, embeddings, bets, users, threshold, block_size=block_size)
+        count += result["count"]
+        total_bet += result["total_bet"]
+        total_payout += result["total_payout"]
+        for user, deltas in result["user_deltas"].items():
+            if user != "":
+                user_totals[user] = user_totals.get(user, 0.0) + deltas
+
+    return {
+        "count": count,
+        "total_bet": total_bet,
+        "total_payout": float(total_payout[0]) if single else total_payout,
+        "user_deltas": {user: (float(deltas[0]) if single else deltas) for user, deltas in user_totals.items()},
+    }
+
+
+# Per-process state of settle_windows workers, set by _init_window_worker
+_worker_state: Dict[str, Any] = {}
+
+
+def _init_window_worker(shm_name: Optional[str], shape: Tuple[int, int], arrays: Dict[str, np.ndarray]) -> None:
+    _worker_state.clear()
+    _worker_state.update(arrays)
+    if shm_name is not None:
+        block = shared_memory.SharedMemory(name=shm_name)
+        _worker_state["shm"] = block
+        _worker_state["prophecies"] = np.ndarray(shape, dtype=np.float32, buffer=block.buf)
+
+
+def _settle_window_rows(start: int, end: int) -> Tuple[np.ndarray, ...]:
+    state = _worker_state
+    # Eligible pairs: same oracle source and headline date inside the prophecy's target window
+    eligible = ((state["oracle_groups"][:, None] == state["prophecy_groups"][None, start:end])
+                & (state["oracle_days"][:, None] >= state["window_starts"][None, start:end])
+                & (state["oracle_days"][:, None] <= state["window_ends"][None, start:end]))
+    oracle_rows = np.flatnonzero(eligible.any(axis=1))
+    empty = (np.empty(0, dtype=np.int64),) * 2 + (np.empty(0, dtype=np.float64),) * 2
+    if not len(oracle_rows):
+        return empty
+
+    result = settle(state["oracles"][oracle_rows], state["prophecies"][start:end],
+                    state["bets"][start:end], state["threshold"], normalized=True)
+    pair_oracles, pair_prophecies = np.nonzero(eligible[oracle_rows])
+    return (oracle_rows[pair_oracles],
+            pair_prophecies + start,
+            result["similarities"][pair_oracles, pair_prophecies].astype(np.float64),
+            result["payouts"][pair_oracles, pair_prophecies])
+
+
+def settle_windows(oracle_embeddings,
+                   oracle_days,
+                   oracle_groups,
+                   prophecy_embeddings,
+                   window_starts,
+                   window_ends,
+                   prophecy_groups,
+                   bets,
+                   threshold: float = 0.0,
+                   workers: Optional[int] = None,
+                   block_size: int = 8192) -> Dict[str, np.ndarray]:
+    """
+    Settle many oracle statements against many prophecies across CPU cores.
+
+    Only pairs whose oracle source matches and whose oracle date falls inside
+    the prophecy's target date window are settled. Prophecy embeddings are
+    placed in shared memory once and every worker scores a range of prophecy
+    rows against all eligible oracles with one matrix product.
+
+    Args:
+        oracle_embeddings: Oracle statement embeddings (m, dimension)
+        oracle_days: Date of each oracle statement as an ordinal (m,)
+        oracle_groups: Oracle source code of each statement (m,)
+        prophecy_embeddings: Prophecy embeddings (n, dimension)
+        window_starts: First target date of each prophecy as an ordinal (n,)
+        window_ends: Last target date of each prophecy as an ordinal (n,)
+        prophecy_groups: Oracle source code of each prophecy (n,)
+        bets: Bet amount of each prophecy (n,)
+        threshold: Absolute similarity below which a bet is left untouched
+        workers: Worker processes (defaults to the CPU count; 1 runs in-process)
+        block_size: Prophecy rows per task
+
+    Returns:
+        Parallel arrays 'oracle_index', 'prophecy_index', 'similarity' and 'payout'
+        with one entry per settled pair
+    """
+    prophecies = normalize_rows(prophecy_embeddings)
+    arrays = {
+        "oracles": normalize_rows(oracle_embeddings),
+        "oracle_days": np.asarray(oracle_days, dtype=np.int64),
+        "oracle_groups": np.asarray(oracle_groups, dtype=np.int64),
+        "window_starts": np.asarray(window_starts, dtype=np.int64),
+        "window_ends": np.asarray(window_ends, dtype=np.int64),
+        "prophecy_groups": np.asarray(prophecy_groups, dtype=np.int64),
+        "bets": np.asarray(bets, dtype=np.float64),
+        "threshold": threshold,
+    }
+    count = prophecies.shape[0] if np.size(prophecy_embeddings) else 0
+    ranges = [(start, min(start + block_size, count)) for start in range(0, count, block_size)]
+    workers = workers or os.cpu_count() or 1
+
+    if workers == 1 or len(ranges) <= 1:
+        _init_window_worker(None, prophecies.shape, dict(arrays, prophecies=prophecies))
+        try:
+            parts = [_settle_window_rows(start, end) for start, end in ranges]
+        finally:
+            _worker_state.clear()
+    else:
+        block = shared_memory.SharedMemory(create=True, size=max(prophecies.nbytes, 1))
+        try:
+            np.ndarray(prophecies.shape, dtype=np.float32, buffer=block.buf)[:] = prophecies
+            del prophecies
+            with ProcessPoolExecutor(max_workers=workers,
+                                     initializer=_init_window_worker,
+                                     initargs=(block.name, (count, arrays["oracles"].shape[1]), arrays)) as pool:
+                parts = list(pool.map(_settle_window_rows, *zip(*ranges)))
+        finally:
+            block.close()
+            block.unlink()
+
+    keys = ("oracle_index", "prophecy_index", "similarity", "payout")
+    if not parts:
+        return {key: np.empty(0, dtype=np.float64 if i > 1 else np.int64) for i, key in enumerate(keys)}
+    return {key: np.concatenate([part[i] for part in parts]) for i, key in enumerate(keys)}
@@ -0,0 +1,210 @@
+"""
+Nightly settlement of oracle headlines against pending prophecies.
+
+Usage (from backend/, with the usual .env):
+    python settlement_jobs.py headlines.jsonl [--workers N] [--export PREFIX] [--dry-run]
+
+Each line of headlines.jsonl is {"oracle": "BBC", "date": "YYYY-MM-DD", "sentence": "..."}.
+Every headline is settled against the pending prophecies of the same oracle
+whose target date window contains the headline date, and the results are
+upserted into the settlements table in bulk.
+"""
+import argparse
+import json
+import logging
+import os
+from datetime import date
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from supabase import Client
+
+from db import get_supabase
+from embedding import get_embedding_engine
+from settlement import settle_windows
+from vector_index import fetch_embeddings
+from vector_io import load_vector_export
+
+logger = logging.getLogger(__name__)
+
+
+def _ordinal(date_str: str) -> int:
+    return date.fromisoformat(date_str).toordinal()
+
+
+def fetch_pending_prophecies(supabase: Client,
+                             first_day: int,
+                             last_day: int,
+                             page_size: int = 1000) -> List[Dict[str, Any]]:
+    """
+    Page through pending prophecies whose target window overlaps [first_day, last_day].
+
+    Returns:
+        Prophecy rows with 'window_start' and 'window_end' ordinals added
+    """
+    prophecies = []
+    last_id = ""
+    while True:
+        rows = (supabase.table("prophecies")
+                .select("id,oracle,target_dates,betting_amount,creator")
+                .eq("status", "PENDING")
+                .gt("id", last_id)
+                .order("id")
+                .limit(page_size)
+                .execute().data or [])
+        for row in rows:
+            row["window_start"] = _ordinal(row["target_dates"][0])
+            row["window_end"] = _ordinal(row["target_dates"][-1])
+            if row["window_start"] <= last_day and row["window_end"] >= first_day:
+                prophecies.append(row)
+        if len(rows) < page_size:
+            return prophecies
+        last_id = rows[-1]["id"]
+
+
+def fetch_stakes(supabase: Client,
+                 prophecy_ids: List[str],
+                 chunk_size: int = 200) -> Dict[str, Tuple[str, float]]:
+    """
+    Creator and betting amount of the given prophecies, chunking the id filter.
+
+    Pass as settlement.settle_export(..., stakes=lambda ids: fetch_stakes(supabase, ids))
+    to look stakes up one export block at a time.
+
+    Returns:
+        {prophecy_id: (creator, betting_amount)} for the ids that exist
+    """
+    stakes = {}
+    for start in range(0, len(prophecy_ids), chunk_size):
+        rows = (supabase.table("prophecies")
+                .select("id,creator,betting_amount")
+                .in_("id", prophecy_ids[start:start + chunk_size])
+                .execute().data or [])
+        for row in rows:
+            stakes[row["id"]] = (row["creator"], float(row["betting_amount"]))
+    return stakes
+
+
+def load_prophecy_embeddings(supabase: Client,
+                             prophecy_ids: List[str],
+                             export_prefix: Optional[str] = None) -> Dict[str, np.ndarray]:
+    """
+    Embeddings of the given prophecies, from a vector export if one is given,
+    otherwise fetched from prophecy_vectors by id.
+    """
+    wanted = set(prophecy_ids)
+    embeddings = {}
+    if export_prefix:
+        matrix, metadata = load_vector_export(export_prefix)
+        for i, row in enumerate(metadata):
+            if row["prophecy_id"] in wanted:
+                embeddings[row["prophecy_id"]] = np.asarray(matrix[i], dtype=np.float32)
+        return embeddings
+
+    return fetch_embeddings(supabase, prophecy_ids)
+
+
+def write_settlements(supabase: Client, rows: Iterable[Dict[str, Any]], chunk_size: int = 500) -> int:
+    """
+    Upsert settlement rows in chunks, so re-running a night overwrites its results.
+
+    Returns:
+        Number of rows written
+    """
+    written = 0
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == chunk_size:
+            supabase.table("settlements").upsert(chunk, on_conflict="prophecy_id,oracle,oracle_date,headline").execute()
+            written += len(chunk)
+            chunk = []
+    if chunk:
+        supabase.table("settlements").upsert(chunk, on_conflict="prophecy_id,oracle,oracle_date,headline").execute()
+        written += len(chunk)
+    return written
+
+
+def run_settlement(headlines: List[Dict[str, str]],
+                   supabase: Optional[Client] = None,
+                   export_prefix: Optional[str] = None,
+                   workers: Optional[int] = None,
+                   threshold: float = 0.0,
+                   dry_run: bool = False) -> List[Dict[str, Any]]:
+    """
+    Settle a day's (or several days') headlines against all eligible pending prophecies.
+
+    Args:
+        headlines: Dictionaries with 'oracle', 'date' (YYYY-MM-DD) and 'sentence'
+        supabase: Client to read from and write to (defaults to the shared client)
+        export_prefix: Read prophecy embeddings from this vector export instead of Supabase
+        workers: Worker processes (defaults to the CPU count)
+        threshold: Absolute similarity below which a bet is left untouched
+        dry_run: Compute results without writing them
+
+    Returns:
+        Settlement rows, one per (headline, prophecy) pair
+    """
+    if not headlines:
+        return []
+    supabase = supabase or get_supabase()
+    days = [_ordinal(h["date"]) for h in headlines]
+    prophecies = fetch_pending_prophecies(supabase, min(days), max(days))
+    embeddings = load_prophecy_embeddings(supabase, [p["id"] for p in prophecies], export_prefix)
+    missing = [p["id"] for p in prophecies if p["id"] not in embeddings]
+    if missing:
+        logger.warning(f"Skipping {len(missing)} prophecies without embeddings")
+    prophecies = [p for p in prophecies if p["id"] in embeddings]
+    logger.info(f"Settling {len(headlines)} headlines against {len(prophecies)} prophecies")
+    if not prophecies:
+        return []
+
+    groups = {name: code for code, name in enumerate(sorted({h["oracle"] for h in headlines}
+                                                               | {p["oracle"] for p in prophecies}))}
+    result = settle_windows(
+        get_embedding_engine().encode([h["sentence"] for h in headlines]),
+        days,
+        [groups[h["oracle"]] for h in headlines],
+        np.stack([embeddings[p["id"]] for p in prophecies]),
+        [p["window_start"] for p in prophecies],
+        [p["window_end"] for p in prophecies],
+        [groups[p["oracle"]] for p in prophecies],
+        [float(p["betting_amount"]) for p in prophecies],
+        threshold=threshold,
+        workers=workers,
+    )
+
+    rows = []
+    for h, p, similarity, payout in zip(result["oracle_index"], result["prophecy_index"],
+                                        result["similarity"], result["payout"]):
+        headline, prophecy = headlines[h], prophecies[p]
+        rows.append({
+            "prophecy_id": prophecy["id"],
+            "oracle": headline["oracle"],
+            "oracle_date": headline["date"],
+            "headline": headline["sentence"],
+            "creator": prophecy["creator"],
+            "betting_amount": float(prophecy["betting_amount"]),
+            "similarity": float(similarity),
+            "payout": float(payout),
+        })
+    if not dry_run:
+        logger.info(f"Wrote {write_settlements(supabase, rows)} settlements")
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Settle oracle headlines against pending prophecies")
+    parser.add_argument("headlines", help="JSONL file of {oracle, date, sentence}")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("SETTLEMENT_WORKERS", "0")) or None)
+    parser.add_argument("--export", help="Vector export prefix to read embeddings from")
+    parser.add_argument("--threshold", type=float, default=0.0)
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    with open(args.headlines) as f:
+        headline_rows = [json.loads(line) for line in f if line.strip()]
+    settled = run_settlement(headline_rows, export_prefix=args.export, workers=args.workers,
+                             threshold=args.threshold, dry_run=args.dry_run)
+    print(f"Settled {len(settled)} (headline, prophecy) pairs")
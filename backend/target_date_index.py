@@ -0,0 +1,207 @@
+import threading
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+DateLike = Union[str, date]
+
+
+def _ordinal(value: DateLike) -> int:
+    if isinstance(value, str):
+        value = date.fromisoformat(value)
+    return value.toordinal()
+
+
+class TargetDateIndex:
+    def __init__(self):
+        """
+        In-process interval index over prophecy target_dates.
+
+        Each prophecy covers [target_dates[0], target_dates[-1]]. Windows are kept
+        in arrays sorted by start date; a query bisects the start dates to the
+        few candidates that can overlap (start within the longest window span
+        of the query) and checks their end dates, so lookups never scan the
+        whole table. Supabase stays the source of truth; the index is built
+        from it on startup, kept up to date as prophecies are created here, and
+        resynced from prophecies.updated_at to pick up prophecies created or
+        settled by other processes.
+        """
+        self._lock = threading.RLock()
+        self._starts = np.empty(0, dtype=np.int64)
+        self._ends = np.empty(0, dtype=np.int64)
+        self._rows = np.empty(0, dtype=np.int64)
+        self._pending: List[Tuple[int, int, int]] = []
+        self._max_span = 0
+        self.prophecy_ids: List[str] = []
+        self.oracles: List[str] = []
+        self.statuses: List[str] = []
+        self._row_by_id: Dict[str, int] = {}
+        # Serializes builds and resyncs, which advance synced_until
+        self._sync_lock = threading.Lock()
+        # Latest prophecies.updated_at loaded from Supabase
+        self.synced_until: Optional[datetime] = None
+        self.ready = False
+
+    def __len__(self) -> int:
+        return len(self.prophecy_ids)
+
+    def add(self, prophecy_id: str, target_dates: Sequence[DateLike], oracle: str, status: str = "PENDING") -> None:
+        """
+        Add a prophecy, or update its window, oracle and status if already present.
+        """
+        start, end = _ordinal(target_dates[0]), _ordinal(target_dates[-1])
+        with self._lock:
+            row = self._row_by_id.get(prophecy_id)
+            if row is not None:
+                self.oracles[row] = oracle
+                self.statuses[row] = status
+                position = np.flatnonzero(self._rows == row)
+                if len(position) and (self._starts[position[0]], self._ends[position[0]]) == (start, end):
+                    return
+                # Window changed: drop the sorted entry and re-add it below
+                self._starts, self._ends, self._rows = (np.delete(a, position)
+                                                        for a in (self._starts, self._ends, self._rows))
+                self._pending = [(s, e, r) for s, e, r in self._pending if r != row]
+            else:
+                row = len(self.prophecy_ids)
+                self._row_by_id[prophecy_id] = row
+                self.prophecy_ids.append(prophecy_id)
+                self.oracles.append(oracle)
+                self.statuses.append(status)
+            self._pending.append((start, end, row))
+            self._max_span = max(self._max_span, end - start)
+
+    def _merge_pending(self) -> None:
+        if not self._pending:
+            return
+        pending = np.array(self._pending, dtype=np.int64).reshape(-1, 3)
+        starts = np.concatenate([self._starts, pending[:, 0]])
+        order = np.argsort(starts, kind="stable")
+        self._starts = starts[order]
+        self._ends = np.concatenate([self._ends, pending[:, 1]])[order]
+        self._rows = np.concatenate([self._rows, pending[:, 2]])[order]
+        self._pending = []
+
+    def query(self,
+              start: DateLike,
+              end: Optional[DateLike] = None,
+              oracle: Optional[str] = None,
+              status: Optional[str] = "PENDING") -> List[str]:
+        """
+        Prophecies whose target window overlaps [start, end].
+
+        Args:
+            start: Date (or first date of the window) to look up
+            end: Last date of the window (defaults to start, i.e. "active on start")
+            oracle: Only prophecies for this oracle
+            status: Only prophecies with this status (None for any)
+
+        Returns:
+            Prophecy ids ordered by window start
+        """
+        first = _ordinal(start)
+        last = _ordinal(end) if end is not None else first
+        with self._lock:
+            self._merge_pending()
+            lo = np.searchsorted(self._starts, first - self._max_span, side="left")
+            hi = np.searchsorted(self._starts, last, side="right")
+            rows = self._rows[lo:hi][self._ends[lo:hi] >= first]
+            return [self.prophecy_ids[row] for row in rows
+                    if (oracle is None or self.oracles[row] == oracle)
+                    and (status is None or self.statuses[row] == status)]
+
+    def build_from_supabase(self, supabase, table_name: str = "prophecies", page_size: int = 1000) -> int:
+        """
+        Load every prophecy's target window from Supabase and mark the index ready.
+
+        Returns:
+            Number of prophecies loaded
+        """
+        with self._sync_lock:
+            loaded = 0
+            last_id = ""
+            try:
+                while True:
+                    rows = (supabase.table(table_name)
+                            .select("id,target_dates,oracle,status,updated_at")
+                            .gt("id", last_id)
+                            .order("id")
+                            .limit(page_size)
+                            .execute().data or [])
+                    loaded += self._add_rows(rows)
+                    if len(rows) < page_size:
+                        break
+                    last_id = rows[-1]["id"]
+            except Exception:
+                # A partial build must not be resumed incrementally
+                self.synced_until = None
+                raise
+
+            with self._lock:
+                self._merge_pending()
+            self.ready = True
+        print(f"Target date index ready with {len(self)} prophecies")
+        return loaded
+
+    def sync_from_supabase(self,
+                           supabase,
+                           table_name: str = "prophecies",
+                           page_size: int = 1000,
+                           lookback: float = 300.0) -> int:
+        """
+        Re-add prophecies created or updated (e.g. settled) since the last build or sync.
+
+        Rows are read from lookback seconds before the latest updated_at seen,
+        so rows of transactions that committed late are not missed; re-adding
+        an unchanged prophecy is a no-op. Builds the index if it was never built.
+
+        Returns:
+            Number of prophecies read
+        """
+        if self.synced_until is None:
+            return self.build_from_supabase(supabase, table_name, page_size)
+        with self._sync_lock:
+            since = (self.synced_until - timedelta(seconds=lookback)).isoformat()
+            synced = 0
+            offset = 0
+            while True:
+                rows = (supabase.table(table_name)
+                        .select("id,target_dates,oracle,status,updated_at")
+                        .gte("updated_at", since)
+                        .order("updated_at")
+                        .order("id")
+                        .range(offset, offset + page_size - 1)
+                        .execute().data or [])
+                synced += self._add_rows(rows)
+                if len(rows) < page_size:
+                    break
+                offset += len(rows)
+        return synced
+
+    def _add_rows(self, rows) -> int:
+        added = 0
+        for row in rows:
+            if row.get("updated_at"):
+                updated_at = datetime.fromisoformat(row["updated_at"])
+                if self.synced_until is None or updated_at > self.synced_until:
+                    self.synced_until = updated_at
+            if row.get("target_dates"):
+                self.add(row["id"], row["target_dates"], row["oracle"], row["status"])
+                added += 1
+        return added
+
+
+_index: Optional[TargetDateIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_target_date_index() -> TargetDateIndex:
+    """
+    Return the process-wide target date index.
+    """
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = TargetDateIndex()
+    return _index
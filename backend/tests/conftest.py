@@ -0,0 +1,89 @@
+import os
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+# Backend modules import each other by flat module name
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class FakeQuery:
+    """The slice of the PostgREST query builder used in tests (filters, order, limit, range, upsert)."""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.filters = []
+        self.keys = []
+        self.window = None
+        self.upserted = None
+
+    def select(self, columns):
+        return self
+
+    def upsert(self, rows, on_conflict):
+        self.upserted = (rows, on_conflict.split(","))
+        return self
+
+    def _filter(self, column, test):
+        self.filters.append(lambda row: test(row[column]))
+        return self
+
+    def eq(self, column, value):
+        return self._filter(column, lambda v: v == value)
+
+    def gt(self, column, value):
+        return self._filter(column, lambda v: v > value)
+
+    def gte(self, column, value):
+        return self._filter(column, lambda v: v >= value)
+
+    def lte(self, column, value):
+        return self._filter(column, lambda v: v <= value)
+
+    def in_(self, column, values):
+        values = set(values)
+        return self._filter(column, lambda v: v in values)
+
+    def order(self, column):
+        self.keys.append(column)
+        return self
+
+    def limit(self, n):
+        self.window = (0, n)
+        return self
+
+    def range(self, start, end):
+        self.window = (start, end + 1)
+        return self
+
+    def execute(self):
+        if self.upserted is not None:
+            rows, columns = self.upserted
+            positions = {tuple(row[c] for c in columns): i for i, row in enumerate(self.rows)}
+            for row in rows:
+                position = positions.get(tuple(row[c] for c in columns))
+                if position is None:
+                    self.rows.append(dict(row))
+                else:
+                    self.rows[position] = dict(row)
+            return SimpleNamespace(data=[dict(row) for row in rows])
+        rows = sorted((row for row in self.rows if all(f(row) for f in self.filters)),
+                      key=lambda row: tuple(row[key] for key in self.keys))
+        if self.window:
+            rows = rows[self.window[0]:self.window[1]]
+        return SimpleNamespace(data=[dict(row) for row in rows])
+
+
+class FakeSupabase:
+    def __init__(self, tables):
+        self.tables = tables
+
+    def table(self, name):
+        return FakeQuery(self.tables.setdefault(name, []))
+
+
+@pytest.fixture
+def fake_supabase():
+    """Build an in-memory Supabase client from {table_name: [row, ...]}; the row lists stay live."""
+    return FakeSupabase
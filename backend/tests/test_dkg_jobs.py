@@ -0,0 +1,175 @@
+import asyncio
+import time
+
+import pytest
+
+from dkg_jobs import DONE, FAILED, PENDING, RUNNING, DKGJobQueue
+
+
+class StubDKG:
+    """Publishes by returning a fake UAL, failing the first `failures` calls."""
+
+    def __init__(self, failures: int = 0):
+        self.failures = failures
+        self.published = []
+
+    async def __call__(self, job):
+        if self.failures:
+            self.failures -= 1
+            raise RuntimeError("node unavailable")
+        self.published.append(job["prophecy_id"])
+        return f"did:dkg:stub/{job['prophecy_id']}"
+
+
+def make_queue(db_path, handler, **kwargs):
+    kwargs.setdefault("base_backoff", 10.0)
+    return DKGJobQueue(str(db_path), handler, **kwargs)
+
+
+def test_claim_marks_job_running_with_lease(tmp_path):
+    queue = make_queue(tmp_path / "jobs.sqlite3", StubDKG(), lease_seconds=60)
+    job = queue.enqueue("p1")
+
+    claimed = queue.claim()
+
+    assert claimed["id"] == job["id"]
+    assert claimed["status"] == RUNNING
+    assert claimed["attempts"] == 1
+    stored = queue.get(job["id"])
+    assert stored["owner"] == queue.owner
+    assert stored["lease_expires_at"] > time.time()
+    assert queue.claim() is None
+
+
+def test_publish_completes_job(tmp_path):
+    dkg = StubDKG()
+    queue = make_queue(tmp_path / "jobs.sqlite3", dkg)
+    job = queue.enqueue("p1")
+
+    assert asyncio.run(queue.process_one()) is True
+
+    stored = queue.get(job["id"])
+    assert stored["status"] == DONE
+    assert stored["ual"] == "did:dkg:stub/p1"
+    assert dkg.published == ["p1"]
+
+
+def test_failed_attempt_is_retried_with_backoff(tmp_path):
+    queue = make_queue(tmp_path / "jobs.sqlite3", StubDKG(failures=1), base_backoff=10.0)
+    job = queue.enqueue("p1")
+
+    before = time.time()
+    asyncio.run(queue.process_one())
+
+    stored = queue.get(job["id"])
+    assert stored["status"] == PENDING
+    assert stored["error"] == "node unavailable"
+    assert stored["next_run_at"] >= before + 10.0
+    # Not due again until the backoff has elapsed
+    assert queue.claim() is None
+
+    queue._conn.execute("UPDATE dkg_jobs SET next_run_at = 0 WHERE id = ?", (job["id"],))
+    asyncio.run(queue.process_one())
+    stored = queue.get(job["id"])
+    assert stored["status"] == DONE
+    assert stored["attempts"] == 2
+
+
+def test_backoff_doubles_and_is_capped(tmp_path):
+    queue = make_queue(tmp_path / "jobs.sqlite3", StubDKG(), base_backoff=2.0, max_backoff=5.0)
+    job = queue.enqueue("p1")
+    delays = []
+    for _ in range(3):
+        queue._conn.execute("UPDATE dkg_jobs SET next_run_at = 0 WHERE id = ?", (job["id"],))
+        claimed = queue.claim()
+        now = time.time()
+        queue.fail(claimed, "boom")
+        delays.append(queue.get(job["id"])["next_run_at"] - now)
+
+    assert delays == pytest.approx([2.0, 4.0, 5.0], abs=0.5)
+
+
+def test_job_fails_after_max_attempts(tmp_path):
+    queue = make_queue(tmp_path / "jobs.sqlite3", StubDKG(failures=10), max_attempts=2)
+    job = queue.enqueue("p1")
+
+    for _ in range(2):
+        queue._conn.execute("UPDATE dkg_jobs SET next_run_at = 0 WHERE id = ?", (job["id"],))
+        asyncio.run(queue.process_one())
+
+    stored = queue.get(job["id"])
+    assert stored["status"] == FAILED
+    assert stored["attempts"] == 2
+    assert queue.find_active("p1") is None
+
+
+def test_recover_requeues_only_expired_leases(tmp_path):
+    db_path = tmp_path / "jobs.sqlite3"
+    # Two processes sharing the queue file
+    live = make_queue(db_path, StubDKG(), lease_seconds=60)
+    crashed = make_queue(db_path, StubDKG(), lease_seconds=60)
+    live_job = live.enqueue("p1")
+    crashed_job = live.enqueue("p2")
+    assert live.claim()["id"] == live_job["id"]
+    assert crashed.claim()["id"] == crashed_job["id"]
+    crashed._conn.execute("UPDATE dkg_jobs SET lease_expires_at = ? WHERE id = ?",
+                          (time.time() - 1, crashed_job["id"]))
+
+    # A restarting worker must not steal the job another live worker is publishing
+    restarted = make_queue(db_path, StubDKG())
+    assert restarted.recover() == 1
+    assert restarted.get(live_job["id"])["status"] == RUNNING
+    assert restarted.get(crashed_job["id"])["status"] == PENDING
+    assert restarted.claim()["id"] == crashed_job["id"]
+
+
+def test_renew_extends_only_own_leases(tmp_path):
+    db_path = tmp_path / "jobs.sqlite3"
+    owner = make_queue(db_path, StubDKG(), lease_seconds=60)
+    other = make_queue(db_path, StubDKG(), lease_seconds=60)
+    job = owner.enqueue("p1")
+    owner.claim()
+    owner._conn.execute("UPDATE dkg_jobs SET lease_expires_at = ? WHERE id = ?", (time.time() + 1, job["id"]))
+
+    assert other.renew([job["id"]]) == 0
+    assert owner.renew([job["id"]]) == 1
+    assert owner.get(job["id"])["lease_expires_at"] > time.time() + 50
+
+
+def test_lease_is_renewed_while_publishing(tmp_path):
+    queue = make_queue(tmp_path / "jobs.sqlite3", None, lease_seconds=0.3)
+    job = queue.enqueue("p1")
+    observed = []
+
+    async def slow_publish(claimed):
+        await asyncio.sleep(0.5)
+        observed.append(queue.get(claimed["id"])["lease_expires_at"])
+        # Still leased, so a concurrent recovery leaves it alone
+        observed.append(queue.recover())
+        return "did:dkg:stub/p1"
+
+    queue.handler = slow_publish
+    start = time.time()
+    asyncio.run(queue.process_one())
+
+    assert observed[0] > start + 0.3
+    assert observed[1] == 0
+    assert queue.get(job["id"])["status"] == DONE
+
+
+def test_complete_ignores_jobs_taken_over_by_another_worker(tmp_path):
+    db_path = tmp_path / "jobs.sqlite3"
+    stalled = make_queue(db_path, StubDKG(), lease_seconds=60)
+    job = stalled.enqueue("p1")
+    stalled.claim()
+    stalled._conn.execute("UPDATE dkg_jobs SET lease_expires_at = ? WHERE id = ?", (time.time() - 1, job["id"]))
+
+    other = make_queue(db_path, StubDKG(), lease_seconds=60)
+    assert other.recover() == 1
+    assert other.claim()["id"] == job["id"]
+
+    stalled.complete(job["id"], "did:dkg:stub/stale")
+    assert other.get(job["id"])["status"] == RUNNING
+    other.complete(job["id"], "did:dkg:stub/p1")
+    assert other.get(job["id"])["ual"] == "did:dkg:stub/p1"
+    assert other.get(job["id"])["status"] == DONE
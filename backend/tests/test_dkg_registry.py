@@ -0,0 +1,97 @@
+import asyncio
+
+import pytest
+
+from dkg_registry import DKGPublishRegistry
+
+
+def make_registries(db_path, **kwargs):
+    """Two registries on the same file, standing in for two API processes."""
+    kwargs.setdefault("poll_interval", 0.01)
+    return DKGPublishRegistry(str(db_path), **kwargs), DKGPublishRegistry(str(db_path), **kwargs)
+
+
+def test_publish_once_shares_publish_across_processes(tmp_path):
+    first, second = make_registries(tmp_path / "registry.sqlite3")
+    calls = []
+
+    async def publish():
+        calls.append(1)
+        await asyncio.sleep(0.1)
+        return "did:dkg:stub/1", "hash"
+
+    async def main():
+        return await asyncio.gather(
+            first.publish_once("urn:prophet:a", publish, "1"),
+            second.publish_once("urn:prophet:a", publish, "1"),
+        )
+
+    assert asyncio.run(main()) == ["did:dkg:stub/1", "did:dkg:stub/1"]
+    assert len(calls) == 1
+    assert not first.claimed_elsewhere("urn:prophet:a")
+    assert not second.claimed_elsewhere("urn:prophet:a")
+
+
+def test_waiter_publishes_after_other_process_aborts(tmp_path):
+    first, second = make_registries(tmp_path / "registry.sqlite3")
+
+    async def failing():
+        await asyncio.sleep(0.05)
+        raise RuntimeError("node unavailable")
+
+    async def publish():
+        return "did:dkg:stub/2", "hash"
+
+    async def main():
+        return await asyncio.gather(
+            first.publish_once("urn:prophet:b", failing),
+            second.publish_once("urn:prophet:b", publish),
+            return_exceptions=True,
+        )
+
+    failed, ual = asyncio.run(main())
+    assert isinstance(failed, RuntimeError)
+    assert ual == "did:dkg:stub/2"
+    assert first.get("urn:prophet:b")["ual"] == "did:dkg:stub/2"
+
+
+def test_expired_claim_is_taken_over(tmp_path):
+    first, second = make_registries(tmp_path / "registry.sqlite3", claim_seconds=0.05)
+
+    async def main():
+        # The first process claims and then dies without releasing
+        assert first.begin("urn:prophet:c") is not None
+        assert second.begin("urn:prophet:c") is None
+        await asyncio.sleep(0.1)
+        assert not second.claimed_elsewhere("urn:prophet:c")
+        return second.begin("urn:prophet:c")
+
+    assert asyncio.run(main()) is not None
+
+
+def test_claims_are_renewed_while_publishing(tmp_path):
+    first, second = make_registries(tmp_path / "registry.sqlite3", claim_seconds=0.06)
+
+    async def publish():
+        await asyncio.sleep(0.2)
+        assert second.claimed_elsewhere("urn:prophet:d")
+        return "did:dkg:stub/4", "hash"
+
+    assert asyncio.run(first.publish_once("urn:prophet:d", publish)) == "did:dkg:stub/4"
+
+
+@pytest.mark.parametrize("recorded", [True, False])
+def test_wait_elsewhere_returns_recorded_ual(tmp_path, recorded):
+    first, second = make_registries(tmp_path / "registry.sqlite3")
+
+    async def main():
+        first.begin("urn:prophet:e")
+        waiter = asyncio.create_task(second.wait_elsewhere("urn:prophet:e"))
+        await asyncio.sleep(0.05)
+        if recorded:
+            first.finish("urn:prophet:e", "did:dkg:stub/5")
+        else:
+            first.abort("urn:prophet:e", RuntimeError("node unavailable"))
+        return await waiter
+
+    assert asyncio.run(main()) == ("did:dkg:stub/5" if recorded else None)
@@ -0,0 +1,35 @@
+import os
+
+import pytest
+
+from embedding import EmbeddingEngine, verify_backend_agreement
+
+# A small model with the same architecture and CLS pooling as the default bge-large-en
+MODEL_NAME = os.getenv("EMBEDDING_TEST_MODEL", "BAAI/bge-small-en")
+
+SENTENCES = [
+    "BTC will hit 100k by June",
+    "BBC reports rain in London",
+    "The Fed cuts rates twice before the end of the year",
+    "短い予言",
+]
+
+
+def test_onnx_matches_torch(tmp_path):
+    for module in ("onnxruntime", "torch", "transformers", "sentence_transformers"):
+        pytest.importorskip(module)
+    torch_engine = EmbeddingEngine(MODEL_NAME, device="cpu", backend="torch")
+    onnx_engine = EmbeddingEngine(MODEL_NAME, backend="onnx")
+    onnx_engine.backend.cache_dir = str(tmp_path)
+    try:
+        torch_engine.model
+    except OSError as e:
+        pytest.skip(f"Model {MODEL_NAME} is not available: {e}")
+
+    assert verify_backend_agreement(torch_engine, onnx_engine, SENTENCES, min_cosine=0.999) >= 0.999
+
+
+def test_onnx_rejects_float16():
+    # The onnx backend runs the float32 export, so float16 would only split the cache namespace
+    with pytest.raises(ValueError):
+        EmbeddingEngine(MODEL_NAME, precision="float16", backend="onnx")
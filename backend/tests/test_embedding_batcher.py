@@ -0,0 +1,54 @@
+import asyncio
+import threading
+
+import numpy as np
+
+from embedding_batcher import EmbeddingBatcher
+
+
+class SlowEngine:
+    """Blocks in encode until released, like a long forward pass."""
+
+    def __init__(self):
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.batches = []
+
+    def encode(self, texts):
+        self.batches.append(list(texts))
+        self.started.set()
+        self.release.wait(5)
+        return np.ones((len(texts), 4), dtype=np.float32)
+
+
+def test_concurrent_requests_share_a_batch():
+    engine = SlowEngine()
+    engine.release.set()
+    batcher = EmbeddingBatcher(engine, max_batch_size=8, max_wait_ms=50)
+
+    async def main():
+        try:
+            return await batcher.embed_many(["a", "b", "c"])
+        finally:
+            await batcher.close()
+
+    assert len(asyncio.run(main())) == 3
+    assert engine.batches == [["a", "b", "c"]]
+
+
+def test_close_cancels_requests_in_the_running_batch():
+    engine = SlowEngine()
+    batcher = EmbeddingBatcher(engine, max_batch_size=2, max_wait_ms=0)
+
+    async def main():
+        running = asyncio.ensure_future(batcher.embed("a"))
+        await asyncio.get_running_loop().run_in_executor(None, engine.started.wait, 5)
+        queued = asyncio.ensure_future(batcher.embed("b"))
+        await asyncio.sleep(0)
+        await batcher.close()
+        engine.release.set()
+        # Neither caller may be left waiting on a future nobody will resolve
+        return await asyncio.wait_for(asyncio.gather(running, queued, return_exceptions=True), 1)
+
+    results = asyncio.run(main())
+    assert all(isinstance(result, asyncio.CancelledError) for result in results)
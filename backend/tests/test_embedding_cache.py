@@ -0,0 +1,68 @@
+import multiprocessing
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from embedding_cache import DiskEmbeddingStore, EmbeddingCache, text_hash
+
+
+def _fill(directory, worker, count):
+    store = DiskEmbeddingStore(directory)
+    for i in range(count):
+        store.put(text_hash(f"{worker}-{i}"), np.full(8, worker * 1000 + i, dtype=np.float32))
+
+
+def test_concurrent_writers_keep_keys_and_vectors_aligned(tmp_path):
+    processes = [multiprocessing.Process(target=_fill, args=(str(tmp_path), worker, 100)) for worker in range(4)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+
+    store = DiskEmbeddingStore(str(tmp_path))
+    assert len(store) == 400
+    for worker in range(4):
+        for i in range(100):
+            assert store.get(text_hash(f"{worker}-{i}"))[0] == worker * 1000 + i
+
+
+def test_torn_record_is_truncated_on_load(tmp_path):
+    _fill(str(tmp_path), 1, 3)
+    records = os.path.join(str(tmp_path), "records.bin")
+    size = os.path.getsize(records)
+    with open(records, "ab") as f:
+        f.write(b"partial record")
+
+    store = DiskEmbeddingStore(str(tmp_path))
+    assert os.path.getsize(records) == size
+    store.put(text_hash("after crash"), np.ones(8, dtype=np.float32))
+    assert store.get(text_hash("after crash"))[0] == 1.0
+    assert store.get(text_hash("1-2"))[0] == 1002
+
+
+def test_reads_records_appended_by_another_process(tmp_path):
+    reader = DiskEmbeddingStore(str(tmp_path))
+    writer = DiskEmbeddingStore(str(tmp_path))
+    writer.put(text_hash("shared"), np.full(8, 7, dtype=np.float32))
+
+    assert reader.get(text_hash("shared"))[0] == 7
+
+
+def test_threads_share_one_disk_store_through_the_cache(tmp_path):
+    # Disk writes run outside the cache lock, so threads append to the store concurrently
+    cache = EmbeddingCache(max_entries=10, disk_dir=str(tmp_path))
+
+    def fill(worker):
+        for i in range(50):
+            cache.put("model", f"{worker}-{i}", np.full(8, worker * 1000 + i, dtype=np.float32))
+            assert cache.get("model", f"{worker}-{i // 2}")[0] == worker * 1000 + i // 2
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(fill, range(8)))
+
+    reopened = EmbeddingCache(max_entries=10, disk_dir=str(tmp_path))
+    for worker in range(8):
+        for i in range(50):
+            assert reopened.get("model", f"{worker}-{i}")[0] == worker * 1000 + i
+    assert reopened.stats()["disk_entries"] == 400
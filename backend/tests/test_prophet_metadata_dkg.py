@@ -0,0 +1,38 @@
+from types import SimpleNamespace
+
+import pytest
+
+# prophet_metadata_dkg loads .env settings through python-dotenv
+pytest.importorskip("dotenv")
+
+import prophet_metadata_dkg
+from prophet_metadata_dkg import create_knowledge_batch, prophet_id
+
+
+class FakeAssets:
+    """Publishes every asset except those containing a sentence listed in failing."""
+
+    def __init__(self, failing):
+        self.failing = failing
+        self.created = 0
+
+    def create(self, content, options):
+        if any(node["prophet"] in self.failing for node in content["public"]):
+            raise RuntimeError("insufficient TRAC allowance")
+        self.created += 1
+        return {"UAL": f"did:dkg:stub/{self.created}"}
+
+
+def test_batch_returns_the_error_of_each_failed_asset(monkeypatch):
+    assets = FakeAssets(failing={"c"})
+    monkeypatch.setattr(prophet_metadata_dkg, "get_dkg", lambda: SimpleNamespace(asset=assets))
+    data = [{"prophet": sentence, "embededProphet": [0.0], "embededProphetHash": "h"} for sentence in "abcd"]
+
+    published = create_knowledge_batch(data, max_per_asset=2)
+
+    assert published[prophet_id(data[0])] == {"ual": "did:dkg:stub/1", "sub_id": prophet_id(data[0])}
+    assert published[prophet_id(data[1])]["ual"] == "did:dkg:stub/1"
+    for prophet_data in data[2:]:
+        error = published[prophet_id(prophet_data)]
+        assert isinstance(error, RuntimeError)
+        assert str(error) == "insufficient TRAC allowance"
@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+
+from quantization import QuantizedMatrix
+
+
+def unit_vectors(n, dimension=64, seed=0):
+    vectors = np.random.default_rng(seed).standard_normal((n, dimension)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def test_binary_keeps_only_sign_bits_in_memory():
+    vectors = unit_vectors(1000)
+    binary = QuantizedMatrix(64, "binary")
+    int8 = QuantizedMatrix(64, "int8")
+    binary.add(vectors)
+    int8.add(vectors)
+
+    assert binary.nbytes == 1000 * 64 // 8
+    assert binary.nbytes * 8 < int8.nbytes
+
+
+def test_binary_rescores_with_exact_similarity():
+    vectors = unit_vectors(500)
+    matrix = QuantizedMatrix(64, "binary")
+    matrix.add(vectors)
+
+    scores, rows = matrix.search(vectors[:5], 1)
+
+    assert rows[:, 0].tolist() == [0, 1, 2, 3, 4]
+    assert np.allclose(scores[:, 0], 1.0, atol=1e-5)
+
+
+@pytest.mark.parametrize("precision", ["float16", "int8", "binary"])
+def test_adds_between_searches_match_a_single_add(precision):
+    vectors = unit_vectors(3000, seed=1)
+    growing = QuantizedMatrix(64, precision)
+    for start in range(0, len(vectors), 250):
+        growing.add(vectors[start:start + 250])
+        growing.search(vectors[:1], 5)
+    whole = QuantizedMatrix(64, precision)
+    whole.add(vectors)
+
+    grown_scores, grown_rows = growing.search(vectors[:20], 5)
+    whole_scores, whole_rows = whole.search(vectors[:20], 5)
+
+    assert growing.ntotal == whole.ntotal == 3000
+    assert np.array_equal(grown_rows, whole_rows)
+    assert np.allclose(grown_scores, whole_scores)
@@ -0,0 +1,123 @@
+import numpy as np
+import pytest
+
+from settlement import payouts, settle, settle_blocks, settle_export, settle_windows
+from vector_io import write_vector_export
+
+
+def random_case(m, n, dimension=12, seed=0):
+    rng = np.random.RandomState(seed)
+    oracles = rng.randn(m, dimension).astype(np.float32)
+    prophecies = rng.randn(n, dimension).astype(np.float32)
+    bets = rng.randint(1, 100, size=n).astype(np.float64)
+    return oracles, prophecies, bets
+
+
+def brute_force_payout(oracle, prophecy, bet, threshold):
+    similarity = float(np.dot(oracle, prophecy) / (np.linalg.norm(oracle) * np.linalg.norm(prophecy)))
+    factor = 1.0 if abs(similarity) < threshold else 1.0 + similarity
+    return similarity, bet * factor
+
+
+@pytest.mark.parametrize("threshold", [0.0, 0.2])
+def test_settle_matches_brute_force(threshold):
+    oracles, prophecies, bets = random_case(3, 40)
+
+    result = settle(oracles, prophecies, bets, threshold)
+
+    assert result["payouts"].shape == (3, 40)
+    for i, oracle in enumerate(oracles):
+        for j, prophecy in enumerate(prophecies):
+            similarity, payout = brute_force_payout(oracle, prophecy, bets[j], threshold)
+            assert result["similarities"][i, j] == pytest.approx(similarity, abs=1e-5)
+            assert result["payouts"][i, j] == pytest.approx(payout, rel=1e-5)
+            assert result["deltas"][i, j] == pytest.approx(payout - bets[j], abs=1e-3)
+    single = settle(oracles[0], prophecies, bets, threshold)
+    np.testing.assert_allclose(single["payouts"], result["payouts"][0], rtol=1e-5)
+
+
+def test_payouts_keep_stakes_below_threshold():
+    np.testing.assert_allclose(payouts([10.0, 10.0, 10.0], [0.05, -0.5, 0.5], threshold=0.1), [10.0, 5.0, 15.0])
+
+
+def test_settle_blocks_and_export_match_in_memory_totals(tmp_path):
+    oracles, prophecies, bets = random_case(2, 103, seed=1)
+    users = [f"0x{i % 5}" for i in range(103)]
+    result = settle(oracles, prophecies, bets)
+    expected = {user: result["deltas"][:, [u == user for u in users]].sum(axis=1) for user in set(users)}
+
+    totals = settle_blocks(oracles, prophecies, bets, users, block_size=10)
+
+    np.testing.assert_allclose(totals["total_payout"], result["payouts"].sum(axis=1), rtol=1e-5)
+    assert totals["total_bet"] == pytest.approx(bets.sum())
+    for user, deltas in expected.items():
+        np.testing.assert_allclose(totals["user_deltas"][user], deltas, rtol=1e-4)
+
+    prefix = str(tmp_path / "export")
+    write_vector_export(({"prophecy_id": f"p{i}", "embedding": prophecies[i]} for i in range(103)), prefix)
+    stakes = {f"p{i}": (users[i], bets[i]) for i in range(103)}
+    exported = settle_export(prefix, oracles, lambda ids: {i: stakes[i] for i in ids}, block_size=10)
+
+    assert exported["count"] == 103
+    np.testing.assert_allclose(exported["total_payout"], totals["total_payout"], rtol=1e-5)
+    for user, deltas in expected.items():
+        np.testing.assert_allclose(exported["user_deltas"][user], deltas, rtol=1e-4)
+
+
+def windows_case(seed=2):
+    rng = np.random.RandomState(seed)
+    oracles, prophecies, bets = random_case(6, 300, seed=seed)
+    case = {
+        "oracle_embeddings": oracles,
+        "oracle_days": rng.randint(0, 10, size=6),
+        "oracle_groups": rng.randint(0, 2, size=6),
+        "prophecy_embeddings": prophecies,
+        "window_starts": rng.randint(0, 10, size=300),
+        "prophecy_groups": rng.randint(0, 2, size=300),
+        "bets": bets,
+    }
+    case["window_ends"] = case["window_starts"] + rng.randint(0, 4, size=300)
+    return case
+
+
+def as_pairs(result):
+    return {(int(o), int(p)): (s, payout) for o, p, s, payout in
+            zip(result["oracle_index"], result["prophecy_index"], result["similarity"], result["payout"])}
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_settle_windows_matches_brute_force(workers):
+    case = windows_case()
+
+    pairs = as_pairs(settle_windows(**case, threshold=0.1, workers=workers, block_size=64))
+
+    expected = {}
+    for o, oracle in enumerate(case["oracle_embeddings"]):
+        for p, prophecy in enumerate(case["prophecy_embeddings"]):
+            if (case["oracle_groups"][o] == case["prophecy_groups"][p]
+                    and case["window_starts"][p] <= case["oracle_days"][o] <= case["window_ends"][p]):
+                expected[(o, p)] = brute_force_payout(oracle, prophecy, case["bets"][p], 0.1)
+    assert expected and pairs.keys() == expected.keys()
+    for pair, (similarity, payout) in expected.items():
+        assert pairs[pair][0] == pytest.approx(similarity, abs=1e-5)
+        assert pairs[pair][1] == pytest.approx(payout, rel=1e-5)
+
+
+def test_settle_windows_process_pool_matches_in_process():
+    case = windows_case(seed=3)
+
+    in_process = settle_windows(**case, workers=1, block_size=32)
+    pooled = settle_windows(**case, workers=2, block_size=32)
+
+    for key in ("oracle_index", "prophecy_index", "similarity", "payout"):
+        np.testing.assert_array_equal(in_process[key], pooled[key])
+
+
+def test_settle_windows_without_prophecies():
+    case = windows_case()
+    for key in ("prophecy_embeddings", "window_starts", "window_ends", "prophecy_groups", "bets"):
+        case[key] = case[key][:0]
+
+    result = settle_windows(**case, workers=2)
+
+    assert all(len(values) == 0 for values in result.values())
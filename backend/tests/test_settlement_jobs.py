@@ -0,0 +1,73 @@
+import numpy as np
+import pytest
+
+# settlement_jobs talks to Supabase through the client library
+pytest.importorskip("supabase")
+
+import settlement_jobs
+from settlement_jobs import fetch_pending_prophecies, run_settlement
+
+
+class FixedEngine:
+    """Stands in for the embedding model with fixed vectors per sentence."""
+
+    def __init__(self, vectors):
+        self.vectors = vectors
+
+    def encode(self, texts):
+        return np.stack([self.vectors[text] for text in texts])
+
+
+def prophecy(prophecy_id, oracle, dates, status="PENDING", bet=10):
+    return {"id": prophecy_id, "oracle": oracle, "target_dates": dates, "status": status,
+            "betting_amount": bet, "creator": f"0x{prophecy_id}"}
+
+
+@pytest.fixture
+def tables():
+    rng = np.random.RandomState(0)
+    prophecies = [
+        prophecy("a", "BBC", ["2025-01-01", "2025-01-03"]),
+        prophecy("b", "BBC", ["2025-01-05"]),
+        prophecy("c", "AP", ["2025-01-02"]),
+        prophecy("d", "BBC", ["2025-01-02"], status="SETTLED"),
+        prophecy("e", "BBC", ["2025-01-02"], bet=20),
+    ]
+    vectors = [{"id": i + 1, "prophecy_id": row["id"], "text": row["id"], "embedding": rng.randn(8).tolist()}
+               for i, row in enumerate(prophecies)]
+    return {"prophecies": prophecies, "prophecy_vectors": vectors}
+
+
+def test_fetch_pending_prophecies_filters_status_and_window(fake_supabase, tables):
+    supabase = fake_supabase(tables)
+    first, last = settlement_jobs._ordinal("2025-01-02"), settlement_jobs._ordinal("2025-01-04")
+
+    rows = fetch_pending_prophecies(supabase, first, last, page_size=2)
+
+    assert [row["id"] for row in rows] == ["a", "c", "e"]
+    assert rows[0]["window_end"] == settlement_jobs._ordinal("2025-01-03")
+
+
+def test_run_settlement_settles_only_eligible_pairs(fake_supabase, tables, monkeypatch):
+    supabase = fake_supabase(tables)
+    headline = np.ones(8, dtype=np.float32) / np.sqrt(8)
+    monkeypatch.setattr(settlement_jobs, "get_embedding_engine",
+                        lambda: FixedEngine({"rain": headline, "vote": -headline}))
+    headlines = [{"oracle": "BBC", "date": "2025-01-02", "sentence": "rain"},
+                 {"oracle": "AP", "date": "2025-01-02", "sentence": "vote"}]
+
+    rows = run_settlement(headlines, supabase=supabase, workers=1)
+
+    assert sorted((row["headline"], row["prophecy_id"]) for row in rows) == [("rain", "a"), ("rain", "e"), ("vote", "c")]
+    for row in rows:
+        embedding = np.asarray(next(v["embedding"] for v in tables["prophecy_vectors"]
+                                    if v["prophecy_id"] == row["prophecy_id"]))
+        sign = 1 if row["headline"] == "rain" else -1
+        similarity = sign * embedding.sum() / (np.sqrt(8) * np.linalg.norm(embedding))
+        assert row["similarity"] == pytest.approx(similarity, abs=1e-5)
+        assert row["payout"] == pytest.approx(row["betting_amount"] * (1 + similarity), rel=1e-5)
+    assert len(tables["settlements"]) == 3
+
+    # Re-running the night overwrites its results
+    run_settlement(headlines, supabase=supabase, workers=1)
+    assert len(tables["settlements"]) == 3
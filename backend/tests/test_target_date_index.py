@@ -0,0 +1,63 @@
+import random
+from datetime import date, timedelta
+
+from target_date_index import TargetDateIndex
+
+
+def row(prophecy_id, start, end, oracle="BBC", status="PENDING", updated_at="2025-01-01T00:00:00+00:00"):
+    return {"id": prophecy_id, "target_dates": [start, end], "oracle": oracle, "status": status,
+            "updated_at": updated_at}
+
+
+def test_query_matches_brute_force_overlap():
+    rng = random.Random(0)
+    base = date(2025, 1, 1)
+    index = TargetDateIndex()
+    windows = {}
+    for i in range(500):
+        start = base + timedelta(days=rng.randrange(120))
+        end = start + timedelta(days=rng.choice([0, 0, 1, 7, 30]))
+        oracle = rng.choice(["BBC", "AP"])
+        windows[f"p{i}"] = (start, end, oracle)
+        index.add(f"p{i}", [start.isoformat(), end.isoformat()], oracle)
+
+    for _ in range(50):
+        first = base + timedelta(days=rng.randrange(130))
+        last = first + timedelta(days=rng.randrange(10))
+        oracle = rng.choice([None, "BBC"])
+        expected = {pid for pid, (start, end, o) in windows.items()
+                    if start <= last and end >= first and (oracle is None or o == oracle)}
+        assert set(index.query(first, last, oracle=oracle)) == expected
+
+
+def test_re_adding_updates_status_and_window():
+    index = TargetDateIndex()
+    index.add("a", ["2025-01-01", "2025-01-02"], "BBC")
+    index.add("b", ["2025-01-01"], "BBC")
+    assert index.query("2025-01-01") == ["a", "b"]
+
+    index.add("a", ["2025-01-01", "2025-01-02"], "BBC", "SETTLED")
+    index.add("b", ["2025-03-01"], "BBC")
+
+    assert index.query("2025-01-01") == []
+    assert index.query("2025-01-01", status=None) == ["a"]
+    assert index.query("2025-03-01") == ["b"]
+    assert len(index) == 2
+
+
+def test_sync_picks_up_rows_created_and_settled_elsewhere(fake_supabase):
+    rows = [row("a", "2025-01-01", "2025-01-05"), row("b", "2025-01-03", "2025-01-03")]
+    supabase = fake_supabase({"prophecies": rows})
+    index = TargetDateIndex()
+    index.sync_from_supabase(supabase, page_size=1)
+    assert index.ready
+    assert index.query("2025-01-03") == ["a", "b"]
+
+    rows[0].update(status="SETTLED", updated_at="2025-01-01T00:10:00+00:00")
+    rows.append(row("c", "2025-01-02", "2025-01-04", updated_at="2025-01-01T00:10:00+00:00"))
+    # Committed late with an earlier timestamp, still inside the lookback
+    rows.append(row("d", "2025-01-03", "2025-01-03", updated_at="2025-01-01T00:08:00+00:00"))
+    index.sync_from_supabase(supabase, page_size=1, lookback=300)
+
+    assert index.query("2025-01-03") == ["c", "b", "d"]
+    assert index.query("2025-01-03", status="SETTLED") == ["a"]
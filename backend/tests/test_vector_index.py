@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+
+from vector_index import PartitionedVectorIndex
+
+
+def unit_vectors(n, dimension=16, seed=0):
+    vectors = np.random.RandomState(seed).randn(n, dimension).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def test_search_collapses_duplicates_to_canonical_id():
+    index = PartitionedVectorIndex()
+    vectors = unit_vectors(5)
+    query = vectors[0]
+    # Three stored copies of prophecy a, then two distinct prophecies
+    index.add(["a", "a2", "a3"], ["x", "x", "x"], np.stack([query, query, query]),
+              ["BBC"] * 3, canonical_ids=[None, "a", "a"])
+    index.add(["b", "c"], ["y", "z"], vectors[1:3], ["BBC", "BBC"])
+
+    hits = index.search(query, k=3, threshold=-1.0)
+
+    assert hits[0]["prophecy_id"] == "a"
+    assert hits[0]["similarity"] > 0.999
+    assert sorted(hit["prophecy_id"] for hit in hits[1:]) == ["b", "c"]
+
+
+def test_search_over_fetches_past_many_duplicates():
+    index = PartitionedVectorIndex()
+    vectors = unit_vectors(2, seed=1)
+    copies = 20
+    index.add([f"a{i}" for i in range(copies)], ["x"] * copies, np.repeat(vectors[:1], copies, axis=0),
+              ["AP"] * copies, canonical_ids=[None] + ["a0"] * (copies - 1))
+    index.add(["b"], ["y"], vectors[1:], ["AP"])
+
+    hits = index.search(vectors[0], k=2, threshold=-1.0, oracle="AP")
+
+    assert [hit["prophecy_id"] for hit in hits] == ["a0", "b"]
+
+
+def test_sync_loads_late_committed_rows_below_last_synced_id(fake_supabase):
+    # vector_columns reads the dedupe setting, whose module imports the Supabase client
+    pytest.importorskip("supabase")
+    vectors = unit_vectors(4, seed=2)
+    prophecies = [{"id": p, "oracle": "BBC", "target_dates": ["2025-01-01"]} for p in "abcd"]
+    stored = [{"id": i + 1, "prophecy_id": p, "text": p, "embedding": vectors[i].tolist()}
+              for i, p in enumerate("abc")]
+    supabase = fake_supabase({"prophecies": prophecies, "prophecy_vectors": [stored[0], stored[2]]})
+    index = PartitionedVectorIndex()
+
+    assert index.sync_from_supabase(supabase) == 2
+    assert index.last_synced_id == 3
+
+    # Row 2 commits after row 3 was read; row 4 is new
+    supabase.tables["prophecy_vectors"] += [stored[1], {"id": 4, "prophecy_id": "d", "text": "d",
+                                                        "embedding": vectors[3].tolist()}]
+    assert index.sync_from_supabase(supabase) == 2
+    assert index.sync_from_supabase(supabase) == 0
+    assert index.search(vectors[1], k=1, threshold=-1.0, oracle="BBC")[0]["prophecy_id"] == "b"
+    assert len(index) == 4
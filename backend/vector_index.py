@@ -0,0 +1,524 @@
+import heapq
+import json
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import faiss
+import numpy as np
+
+from embedding_cache import text_hash
+from quantization import QuantizedMatrix, VECTOR_PRECISIONS
+
+
+def parse_embedding(value: Any) -> np.ndarray:
+    """
+    Convert an embedding as returned by PostgREST (pgvector text or JSON list) to float32.
+    """
+    if isinstance(value, str):
+        value = json.loads(value)
+    return np.asarray(value, dtype=np.float32)
+
+
+def fetch_embeddings(supabase,
+                     prophecy_ids: Sequence[str],
+                     table_name: str = "prophecy_vectors",
+                     chunk_size: int = 200) -> Dict[str, np.ndarray]:
+    """
+    Fetch the stored embeddings of specific prophecies, chunking the id filter.
+
+    Returns:
+        {prophecy_id: float32 embedding} for the ids that have a vector
+    """
+    embeddings = {}
+    for start in range(0, len(prophecy_ids), chunk_size):
+        rows = (supabase.table(table_name)
+                .select("prophecy_id,embedding")
+                .in_("prophecy_id", list(prophecy_ids[start:start + chunk_size]))
+                .execute().data or [])
+        for row in rows:
+            embeddings[row["prophecy_id"]] = parse_embedding(row["embedding"])
+    return embeddings
+
+
+class LocalVectorIndex:
+    def __init__(self,
+                 dimension: Optional[int] = None,
+                 m: int = 32,
+                 ef_construction: int = 200,
+                 ef_search: int = 64,
+                 precision: str = "float32"):
+        """
+        In-process index over normalized embeddings, mirroring prophecy_vectors.
+
+        Supabase stays the source of truth; PartitionedVectorIndex rebuilds one of
+        these per partition on startup and keeps it up to date as vectors are stored. float32 vectors go into an
+        HNSW graph; other precisions are held as quantized codes and scanned.
+
+        Args:
+            dimension: Embedding dimension (inferred from the first vectors added when None)
+            m: HNSW graph degree
+            ef_construction: HNSW build-time candidate list size
+            ef_search: HNSW query-time candidate list size
+            precision: In-memory vector precision ('float32', 'float16', 'int8', 'binary')
+        """
+        if precision not in VECTOR_PRECISIONS:
+            raise ValueError(f"Unsupported vector precision: {precision}. Use one of {', '.join(VECTOR_PRECISIONS)}")
+
+        self.dimension = dimension
+        self.precision = precision
+        self.m = m
+        self.ef_construction = ef_construction
+        self.ef_search = ef_search
+        self.prophecy_ids: List[str] = []
+        self.texts: List[str] = []
+        self._known_ids = set()
+        # Normalized text hash -> first prophecy id stored with that text
+        self._text_hashes: Dict[str, str] = {}
+        self._index: Optional[faiss.Index] = None
+        self._lock = threading.RLock()
+
+    def _create_index(self, dimension: int):
+        if self.precision != "float32":
+            return QuantizedMatrix(dimension, self.precision)
+        index = faiss.IndexHNSWFlat(dimension, self.m, faiss.METRIC_INNER_PRODUCT)
+        index.hnsw.efConstruction = self.ef_construction
+        index.hnsw.efSearch = self.ef_search
+        return index
+
+    def __len__(self) -> int:
+        return len(self.prophecy_ids)
+
+    def add(self, prophecy_ids: Sequence[str], texts: Sequence[str], embeddings) -> int:
+        """
+        Add vectors to the index, skipping prophecy ids that are already present.
+
+        Args:
+            prophecy_ids: Prophecy id for each vector
+            texts: Source text for each vector
+            embeddings: Array-like of shape (n, dimension)
+
+        Returns:
+            Number of vectors added
+        """
+        vectors = np.ascontiguousarray(embeddings, dtype=np.float32).reshape(len(prophecy_ids), -1)
+        with self._lock:
+            keep = []
+            for i, prophecy_id in enumerate(prophecy_ids):
+                if prophecy_id not in self._known_ids:
+                    self._known_ids.add(prophecy_id)
+                    keep.append(i)
+            if not keep:
+                return 0
+
+            if self._index is None:
+                self.dimension = self.dimension or vectors.shape[1]
+                self._index = self._create_index(self.dimension)
+
+            self._index.add(vectors[keep])
+            self.prophecy_ids.extend(prophecy_ids[i] for i in keep)
+            self.texts.extend(texts[i] for i in keep)
+            for i in keep:
+                self._text_hashes.setdefault(text_hash(texts[i]), prophecy_ids[i])
+            return len(keep)
+
+    def find_exact(self, text: str) -> Optional[str]:
+        """
+        Return the prophecy id first stored with the same normalized text, if any.
+        """
+        with self._lock:
+            return self._text_hashes.get(text_hash(text))
+
+    def search(self, query, k: int = 5, threshold: float = 0.0) -> List[Dict[str, Any]]:
+        """
+        Find the nearest stored vectors by cosine similarity.
+
+        Args:
+            query: Normalized query embedding
+            k: Maximum number of results
+            threshold: Minimum similarity to include
+
+        Returns:
+            List of {"prophecy_id", "text", "similarity"} ordered by similarity
+        """
+        with self._lock:
+            if self._index is None or k <= 0:
+                return []
+            vector = np.ascontiguousarray(query, dtype=np.float32).reshape(1, -1)
+            scores, rows = self._index.search(vector, min(k, len(self.prophecy_ids)))
+
+            results = []
+            for score, row in zip(scores[0], rows[0]):
+                if row < 0 or score <= threshold:
+                    continue
+                results.append({
+                    "prophecy_id": self.prophecy_ids[row],
+                    "text": self.texts[row],
+                    "similarity": float(score),
+                })
+            return results
+
+
+VECTOR_PARTITIONS = ("oracle", "oracle_month")
+
+
+class PartitionedVectorIndex:
+    def __init__(self, partition_by: str = "oracle", **index_kwargs):
+        """
+        Vector index sharded by oracle (and optionally by target month).
+
+        Each partition is a LocalVectorIndex, so a search filtered to one oracle
+        only scans that oracle's vectors, and partitions are built in parallel.
+        Unfiltered searches query every partition and merge the results.
+        Vectors added without an oracle go to an unnamed partition.
+
+        Args:
+            partition_by: 'oracle' or 'oracle_month' (oracle plus YYYY-MM of the first target date)
+            **index_kwargs: Passed to each LocalVectorIndex (m, ef_search, precision, ...)
+        """
+        if partition_by not in VECTOR_PARTITIONS:
+            raise ValueError(f"Unsupported vector partitioning: {partition_by}. Use one of {', '.join(VECTOR_PARTITIONS)}")
+
+        self.partition_by = partition_by
+        self.index_kwargs = index_kwargs
+        self.precision = index_kwargs.get("precision", "float32")
+        self.partitions: Dict[str, LocalVectorIndex] = {}
+        self._partition_of: Dict[str, str] = {}
+        # Duplicate prophecy id -> canonical prophecy id (prophecy_vectors.canonical_id)
+        self._canonical: Dict[str, str] = {}
+        self._lock = threading.RLock()
+        # Serializes builds and resyncs, which advance last_synced_id
+        self._sync_lock = threading.Lock()
+        # Highest prophecy_vectors.id loaded from Supabase
+        self.last_synced_id = 0
+        self.ready = False
+
+    def __len__(self) -> int:
+        return sum(len(partition) for partition in list(self.partitions.values()))
+
+    def partition_key(self, oracle: Optional[str] = None, target_dates: Optional[Sequence[str]] = None) -> str:
+        if not oracle:
+            return ""
+        if self.partition_by == "oracle_month" and target_dates:
+            return f"{oracle}:{str(target_dates[0])[:7]}"
+        return oracle
+
+    def _partition(self, key: str) -> LocalVectorIndex:
+        with self._lock:
+            partition = self.partitions.get(key)
+            if partition is None:
+                partition = LocalVectorIndex(**self.index_kwargs)
+                self.partitions[key] = partition
+            return partition
+
+    def _matching(self, oracle: Optional[str] = None, month: Optional[str] = None) -> List[LocalVectorIndex]:
+        with self._lock:
+            items = list(self.partitions.items())
+        if oracle is None and month is None:
+            return [partition for _, partition in items]
+        matching = []
+        for key, partition in items:
+            key_oracle, _, key_month = key.partition(":")
+            if oracle is not None and key_oracle != oracle:
+                continue
+            if month is not None and key_month and key_month != month:
+                continue
+            matching.append(partition)
+        return matching
+
+    def add(self,
+            prophecy_ids: Sequence[str],
+            texts: Sequence[str],
+            embeddings,
+            oracles: Optional[Sequence[Optional[str]]] = None,
+            target_dates: Optional[Sequence[Optional[Sequence[str]]]] = None,
+            canonical_ids: Optional[Sequence[Optional[str]]] = None) -> int:
+        """
+        Add vectors to their partitions, skipping prophecy ids that are already present.
+
+        Args:
+            prophecy_ids: Prophecy id for each vector
+            texts: Source text for each vector
+            embeddings: Array-like of shape (n, dimension)
+            oracles: Oracle of each prophecy (unnamed partition when missing)
+            target_dates: target_dates of each prophecy (used by 'oracle_month')
+            canonical_ids: Canonical prophecy of each vector that duplicates another one
+
+        Returns:
+            Number of vectors added
+        """
+        vectors = np.ascontiguousarray(embeddings, dtype=np.float32).reshape(len(prophecy_ids), -1)
+        groups: Dict[str, List[int]] = {}
+        with self._lock:
+            for i, prophecy_id in enumerate(prophecy_ids):
+                if prophecy_id in self._partition_of:
+                    continue
+                key = self.partition_key(oracles[i] if oracles else None,
+                                         target_dates[i] if target_dates else None)
+                self._partition_of[prophecy_id] = key
+                if canonical_ids and canonical_ids[i]:
+                    self._canonical[prophecy_id] = canonical_ids[i]
+                groups.setdefault(key, []).append(i)
+
+        added = 0
+        for key, rows in groups.items():
+            added += self._partition(key).add([prophecy_ids[i] for i in rows],
+                                              [texts[i] for i in rows],
+                                              vectors[rows])
+        return added
+
+    def find_exact(self, text: str, oracle: Optional[str] = None) -> Optional[str]:
+        """
+        Return the prophecy id first stored with the same normalized text, if any.
+        """
+        for partition in self._matching(oracle):
+            prophecy_id = partition.find_exact(text)
+            if prophecy_id is not None:
+                return prophecy_id
+        return None
+
+    def canonical_of(self, prophecy_id: str) -> str:
+        """
+        The prophecy a stored duplicate links to, or the id itself.
+        """
+        with self._lock:
+            return self._canonical.get(prophecy_id, prophecy_id)
+
+    def find_duplicate(self, text: str, embedding, threshold: float, oracle: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        Find an existing prophecy that duplicates the given one, within the oracle's partitions when given.
+
+        Returns:
+            {"prophecy_id", "similarity", "exact"} for the canonical prophecy, or None
+        """
+        exact = self.find_exact(text, oracle)
+        if exact is not None:
+            return {"prophecy_id": self.canonical_of(exact), "similarity": 1.0, "exact": True}
+        hits = self.search(embedding, k=1, threshold=threshold, oracle=oracle)
+        if hits:
+            return {"prophecy_id": hits[0]["prophecy_id"], "similarity": hits[0]["similarity"], "exact": False}
+        return None
+
+    def search(self,
+               query,
+               k: int = 5,
+               threshold: float = 0.0,
+               oracle: Optional[str] = None,
+               month: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Find the nearest stored vectors, scanning only the partitions that match the filters.
+
+        Args:
+            query: Normalized query embedding
+            k: Maximum number of results
+            threshold: Minimum similarity to include
+            oracle: Only prophecies of this oracle
+            month: Only prophecies whose first target date is in this YYYY-MM
+                (requires 'oracle_month' partitioning; ignored otherwise)
+
+        Stored duplicates are collapsed into their canonical prophecy: each
+        canonical id appears once, with the best similarity among its copies,
+        and the search over-fetches until k distinct prophecies are found.
+
+        Returns:
+            List of {"prophecy_id", "text", "similarity"} ordered by similarity
+        """
+        partitions = self._matching(oracle, month if self.partition_by == "oracle_month" else None)
+        total = sum(len(partition) for partition in partitions)
+        fetch = k
+        while True:
+            hits = [hit for partition in partitions for hit in partition.search(query, k=fetch, threshold=threshold)]
+            hits = heapq.nlargest(fetch, hits, key=lambda hit: hit["similarity"])
+            collapsed: Dict[str, Dict[str, Any]] = {}
+            for hit in hits:
+                canonical_id = self.canonical_of(hit["prophecy_id"])
+                if canonical_id not in collapsed:
+                    collapsed[canonical_id] = dict(hit, prophecy_id=canonical_id)
+            # Done once k distinct prophecies are found or nothing more clears the threshold
+            if len(collapsed) >= k or len(hits) < fetch or fetch >= total:
+                return list(collapsed.values())[:k]
+            fetch *= 4
+
+    def build_from_supabase(self,
+                            supabase,
+                            table_name: str = "prophecy_vectors",
+                            page_size: int = 1000,
+                            workers: Optional[int] = None) -> int:
+        """
+        Load every stored vector from Supabase into its partition and mark the index ready.
+
+        Oracles and target dates are read from the prophecies table first. Vector
+        pages are then split by partition and added on a thread pool, so
+        partitions are built concurrently.
+
+        Returns:
+            Number of vectors loaded
+        """
+        with self._sync_lock:
+            return self._build_from_supabase(supabase, table_name, page_size, workers)
+
+    def _build_from_supabase(self, supabase, table_name: str, page_size: int, workers: Optional[int]) -> int:
+        partition_info: Dict[str, Tuple[str, Any]] = {}
+        last_id = ""
+        while True:
+            rows = (supabase.table("prophecies")
+                    .select("id,oracle,target_dates")
+                    .gt("id", last_id)
+                    .order("id")
+                    .limit(page_size)
+                    .execute().data or [])
+            for row in rows:
+                partition_info[row["id"]] = (row.get("oracle"), row.get("target_dates"))
+            if len(rows) < page_size:
+                break
+            last_id = rows[-1]["id"]
+
+        workers = workers or int(os.getenv("LOCAL_VECTOR_INDEX_BUILD_WORKERS", "4"))
+        loaded = 0
+        in_flight: List[Future] = []
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="index-build") as pool:
+            last_id = 0
+            while True:
+                rows = (supabase.table(table_name)
+                        .select(vector_columns())
+                        .gt("id", last_id)
+                        .order("id")
+                        .limit(page_size)
+                        .execute().data or [])
+                if not rows:
+                    break
+                groups: Dict[str, List[Dict[str, Any]]] = {}
+                for row in rows:
+                    oracle, target_dates = partition_info.get(row["prophecy_id"], (None, None))
+                    row["oracle"], row["target_dates"] = oracle, target_dates
+                    groups.setdefault(self.partition_key(oracle, target_dates), []).append(row)
+                for group in groups.values():
+                    in_flight.append(pool.submit(
+                        self.add,
+                        [row["prophecy_id"] for row in group],
+                        [row["text"] for row in group],
+                        np.stack([parse_embedding(row["embedding"]) for row in group]),
+                        [row["oracle"] for row in group],
+                        [row["target_dates"] for row in group],
+                        [row.get("canonical_id") for row in group],
+                    ))
+                # Bound the pages held in memory while partitions catch up
+                if len(in_flight) >= 2 * workers:
+                    done, pending = wait(in_flight, return_when="FIRST_COMPLETED")
+                    loaded += sum(future.result() for future in done)
+                    in_flight = list(pending)
+                last_id = rows[-1]["id"]
+                if len(rows) < page_size:
+                    break
+            loaded += sum(future.result() for future in in_flight)
+        self.last_synced_id = max(self.last_synced_id, last_id)
+        self.ready = True
+        sizes = ", ".join(f"{key or '-'}: {len(partition)}" for key, partition in sorted(self.partitions.items()))
+        print(f"Local vector index ready with {len(self)} vectors ({sizes})")
+        return loaded
+
+    def sync_from_supabase(self,
+                           supabase,
+                           table_name: str = "prophecy_vectors",
+                           page_size: int = 1000,
+                           overlap: int = 1000) -> int:
+        """
+        Add vectors stored since the last build or sync, e.g. by other API processes.
+
+        Pages through rows with an id above last_synced_id and looks up the
+        oracles and target dates of just those prophecies. Vectors this process
+        already added when storing them are skipped.
+
+        Ids are assigned at insert time, so a transaction that commits late can
+        land below last_synced_id after rows above it were read. The last
+        overlap ids are therefore re-listed on every sync (ids only), and any
+        rows missing from the index are loaded.
+
+        Returns:
+            Number of vectors added
+        """
+        added = 0
+        with self._sync_lock:
+            if overlap > 0 and self.last_synced_id > 0:
+                recent = (supabase.table(table_name)
+                          .select("id,prophecy_id")
+                          .gt("id", max(0, self.last_synced_id - overlap))
+                          .lte("id", self.last_synced_id)
+                          .execute().data or [])
+                with self._lock:
+                    missed = [row["id"] for row in recent if row["prophecy_id"] not in self._partition_of]
+                for start in range(0, len(missed), page_size):
+                    rows = (supabase.table(table_name)
+                            .select(vector_columns())
+                            .in_("id", missed[start:start + page_size])
+                            .execute().data or [])
+                    added += self._add_synced_rows(supabase, rows)
+
+            while True:
+                rows = (supabase.table(table_name)
+                        .select(vector_columns())
+                        .gt("id", self.last_synced_id)
+                        .order("id")
+                        .limit(page_size)
+                        .execute().data or [])
+                if not rows:
+                    break
+                added += self._add_synced_rows(supabase, rows)
+                self.last_synced_id = rows[-1]["id"]
+                if len(rows) < page_size:
+                    break
+        return added
+
+    def _add_synced_rows(self, supabase, rows: List[Dict[str, Any]]) -> int:
+        if not rows:
+            return 0
+        prophecy_ids = [row["prophecy_id"] for row in rows]
+        info = {row["id"]: row for row in (supabase.table("prophecies")
+                                           .select("id,oracle,target_dates")
+                                           .in_("id", prophecy_ids)
+                                           .execute().data or [])}
+        return self.add(
+            prophecy_ids,
+            [row["text"] for row in rows],
+            np.stack([parse_embedding(row["embedding"]) for row in rows]),
+            [info.get(prophecy_id, {}).get("oracle") for prophecy_id in prophecy_ids],
+            [info.get(prophecy_id, {}).get("target_dates") for prophecy_id in prophecy_ids],
+            [row.get("canonical_id") for row in rows],
+        )
+
+
+def vector_columns() -> str:
+    """
+    Columns of prophecy_vectors loaded into the index; canonical_id only exists when dedupe is used.
+    """
+    from dedupe import dedupe_enabled
+
+    return "id,prophecy_id,text,embedding" + (",canonical_id" if dedupe_enabled() else "")
+
+
+_indexes: Dict[Tuple[str, str], PartitionedVectorIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def local_index_enabled() -> bool:
+    return os.getenv("LOCAL_VECTOR_INDEX", "1").lower() not in ("0", "false", "no")
+
+
+def get_vector_index(table_name: str = "prophecy_vectors", precision: Optional[str] = None) -> PartitionedVectorIndex:
+    """
+    Return the process-wide index mirroring the given vector table.
+
+    The precision defaults to the VECTOR_PRECISION environment variable (float32)
+    and the partitioning to VECTOR_PARTITION ('oracle').
+    """
+    precision = precision or os.getenv("VECTOR_PRECISION", "float32")
+    key = (table_name, precision)
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is None:
+            index = PartitionedVectorIndex(partition_by=os.getenv("VECTOR_PARTITION", "oracle"),
+                                           ef_search=int(os.getenv("LOCAL_VECTOR_INDEX_EF_SEARCH", "64")),
+                                           precision=precision)
+            _indexes[key] = index
+    return index
@@ -0,0 +1,196 @@
+import base64
+import hashlib
+import json
+import os
+import struct
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+# embededProphet encodings: a JSON float list, or base64 of little-endian float32/float16 bytes
+EMBEDDING_ENCODINGS = ("list", "float32", "float16")
+
+# Fixed-size .npy v1.0 header so the shape can be rewritten in place once the row count is known
+NPY_HEADER_SIZE = 128
+
+
+def canonical_embedding_bytes(embedding) -> bytes:
+    """
+    Canonical byte form of an embedding: contiguous little-endian float32.
+    """
+    return np.ascontiguousarray(embedding, dtype="<f4").tobytes()
+
+
+def hash_embedding(embedding, hash_method: str = "sha256", hash_input: str = "bytes") -> str:
+    """
+    Hash an embedding.
+
+    Args:
+        embedding: Embedding as an array or list of floats
+        hash_method: Hashing algorithm ('sha256', 'md5', 'sha1')
+        hash_input: 'bytes' hashes the canonical float32 bytes; 'json' hashes the
+            JSON-encoded float list (the original scheme, kept for existing hashes)
+
+    Returns:
+        Hex digest
+    """
+    if hash_input == "bytes":
+        payload = canonical_embedding_bytes(embedding)
+    elif hash_input == "json":
+        values = embedding.tolist() if isinstance(embedding, np.ndarray) else embedding
+        payload = json.dumps(values, sort_keys=True).encode()
+    else:
+        raise ValueError(f"Unsupported hash input: {hash_input}. Use 'bytes' or 'json'")
+    return hashlib.new(hash_method, payload).hexdigest()
+
+
+def _check_encoding(encoding: str) -> None:
+    if encoding not in EMBEDDING_ENCODINGS:
+        raise ValueError(f"Unsupported embedding encoding: {encoding}. Use one of {', '.join(EMBEDDING_ENCODINGS)}")
+
+
+def published_embedding(embedding, encoding: str = "list") -> np.ndarray:
+    """
+    The float32 embedding a reader recovers after the given encoding.
+
+    float16 rounds the values, so hashes of float16-encoded assets are taken
+    over this rounded vector to stay reproducible from the payload.
+    """
+    _check_encoding(encoding)
+    embedding = np.asarray(embedding, dtype=np.float32)
+    if encoding == "float16":
+        return embedding.astype("<f2").astype(np.float32)
+    return embedding
+
+
+def encode_embedding(embedding, encoding: str = "float32") -> Any:
+    """
+    Encode an embedding for a JSON-LD payload.
+
+    Returns:
+        A float list for 'list', otherwise base64 of the little-endian float32/float16 bytes
+    """
+    _check_encoding(encoding)
+    if encoding == "list":
+        return np.asarray(embedding, dtype=np.float32).tolist()
+    dtype = "<f4" if encoding == "float32" else "<f2"
+    return base64.b64encode(np.ascontiguousarray(embedding, dtype=dtype).tobytes()).decode("ascii")
+
+
+def decode_embedding(value: Any, encoding: Optional[str] = None) -> np.ndarray:
+    """
+    Decode an embededProphet value back to float32.
+
+    Args:
+        value: Float list or base64 string
+        encoding: 'float32' or 'float16' for base64 strings (defaults to float32)
+    """
+    if not isinstance(value, str):
+        return np.asarray(value, dtype=np.float32)
+    dtype = "<f2" if encoding == "float16" else "<f4"
+    return np.frombuffer(base64.b64decode(value), dtype=dtype).astype(np.float32)
+
+
+def verify_prophet_hash(prophet_data: Dict[str, Any], hash_method: str = "sha256") -> bool:
+    """
+    Recompute embededProphetHash from the embededProphet in a prophet data dictionary or asset node.
+
+    Compact payloads declare their dtype in embededProphetDtype. List payloads
+    are checked against both the float32-bytes and the older JSON hash scheme.
+    """
+    embedding = decode_embedding(prophet_data["embededProphet"], prophet_data.get("embededProphetDtype"))
+    expected = prophet_data["embededProphetHash"]
+    if hash_embedding(embedding, hash_method) == expected:
+        return True
+    return (not isinstance(prophet_data["embededProphet"], str)
+            and hash_embedding(prophet_data["embededProphet"], hash_method, "json") == expected)
+
+
+def _npy_header(rows: int, dimension: int) -> bytes:
+    header = "{'descr': '<f4', 'fortran_order': False, 'shape': (%d, %d), }" % (rows, dimension)
+    prefix = b"\x93NUMPY\x01\x00"
+    padding = NPY_HEADER_SIZE - len(prefix) - 2 - len(header) - 1
+    if padding < 0:
+        raise ValueError("Shape too large for the reserved .npy header")
+    return prefix + struct.pack("<H", NPY_HEADER_SIZE - len(prefix) - 2) + (header + " " * padding + "\n").encode("latin1")
+
+
+def write_vector_export(rows: Iterable[Dict[str, Any]], path_prefix: str) -> int:
+    """
+    Stream exported vector rows to disk in constant memory.
+
+    Writes {path_prefix}.npy, a float32 (n, dimension) matrix that np.load can
+    memory-map, and {path_prefix}.jsonl holding the remaining columns of each
+    row in the same order.
+
+    Args:
+        rows: Iterable of dictionaries with an 'embedding' array and any other columns
+        path_prefix: Output path without extension
+
+    Returns:
+        Number of rows written
+    """
+    count = 0
+    dimension = 0
+    with open(f"{path_prefix}.npy", "wb") as vectors, open(f"{path_prefix}.jsonl", "w") as metadata:
+        vectors.write(b"\0" * NPY_HEADER_SIZE)
+        for row in rows:
+            embedding = np.ascontiguousarray(row["embedding"], dtype="<f4").reshape(-1)
+            if count == 0:
+                dimension = embedding.shape[0]
+            elif embedding.shape[0] != dimension:
+                raise ValueError(f"Expected dimension {dimension}, got {embedding.shape[0]}")
+            vectors.write(embedding.tobytes())
+            metadata.write(json.dumps({k: v for k, v in row.items() if k != "embedding"}, ensure_ascii=False) + "\n")
+            count += 1
+
+        vectors.seek(0)
+        vectors.write(_npy_header(count, dimension))
+    return count
+
+
+def _load_export_matrix(path_prefix: str) -> np.ndarray:
+    if os.path.getsize(f"{path_prefix}.npy") == NPY_HEADER_SIZE:
+        return np.empty((0, 0), dtype=np.float32)
+    return np.load(f"{path_prefix}.npy", mmap_mode="r")
+
+
+def load_vector_export(path_prefix: str) -> Tuple[np.ndarray, List[Dict[str, Any]]]:
+    """
+    Load an export written by write_vector_export.
+
+    Returns:
+        Tuple of the memory-mapped float32 matrix and the per-row metadata
+    """
+    matrix = _load_export_matrix(path_prefix)
+    with open(f"{path_prefix}.jsonl") as f:
+        metadata = [json.loads(line) for line in f]
+    return matrix, metadata
+
+
+def iter_vector_export(path_prefix: str, block_size: int) -> Iterator[Tuple[np.ndarray, List[Dict[str, Any]]]]:
+    """
+    Read an export written by write_vector_export block by block.
+
+    The metadata lines are read in step with the memory-mapped rows, so only
+    block_size rows of either are held at a time.
+
+    Yields:
+        Tuples of a memory-mapped (rows, dimension) block and the metadata of those rows
+    """
+    matrix = _load_export_matrix(path_prefix)
+    with open(f"{path_prefix}.jsonl") as f:
+        start = 0
+        while True:
+            metadata = []
+            for line in f:
+                metadata.append(json.loads(line))
+                if len(metadata) == block_size:
+                    break
+            if not metadata:
+                return
+            block = matrix[start:start + len(metadata)]
+            if len(block) != len(metadata):
+                raise ValueError(f"{path_prefix}.jsonl has more rows than {path_prefix}.npy")
+            yield block, metadata
+            start += len(metadata)
@@ -1,66 +1,121 @@
-import os
-from sentence_transformers import SentenceTransformer
-from supabase import create_client, Client
-from typing import List, Optional
+import numpy as np
+from supabase import Client
+from typing import Any, Dict, List, Optional, Tuple
+from db import execute, get_supabase
+from embedding import EmbeddingEngine, get_embedding_engine
+from embedding_batcher import get_embedding_batcher
+from dedupe import dedupe_enabled, find_duplicate, match_distinct
+from vector_index import PartitionedVectorIndex, get_vector_index, local_index_enabled
 
 class SupabaseVectorStore:
-    def __init__(self):
-        self.model = self._initialize_model()
-        self.supabase: Client = create_client(
-            os.getenv("SUPABASE_URL"),
-            os.getenv("SUPABASE_KEY")
-        )
+    def __init__(self, engine: Optional[EmbeddingEngine] = None):
+        self.engine = engine or self._initialize_model()
+        self.supabase: Client = get_supabase()
+        self.index: PartitionedVectorIndex = get_vector_index("prophecy_vectors")
 
-    def _initialize_model(self):
-        """BGE Large モデルの初期化"""
-        model_name = "BAAI/bge-large-en"
-        print(f"Loading model: {model_name}")
-        return SentenceTransformer(model_name)
+    def build_index(self) -> int:
+        """prophecy_vectorsからオラクルごとに分割したローカルANNインデックスを構築（ブロッキング）"""
+        return self.index.build_from_supabase(self.supabase, "prophecy_vectors")
+
+    def sync_index(self) -> int:
+        """前回の構築・同期以降に（他のプロセスも含めて）保存されたベクトルをローカルインデックスに追加（ブロッキング）"""
+        return self.index.sync_from_supabase(self.supabase, "prophecy_vectors")
+
+    def _initialize_model(self) -> EmbeddingEngine:
+        """共有埋め込みエンジンの取得（EMBEDDING_MODELのモデルを初回利用時にロード）"""
+        return get_embedding_engine()
+
+    @property
+    def model(self):
+        return self.engine.model
 
     def embed_text(self, text: str) -> List[float]:
         """テキストをベクトルに変換"""
         try:
-            embedding = self.model.encode([text], normalize_embeddings=True)
+            embedding = self.engine.encode([text])
             return embedding[0].tolist()
         except Exception as e:
             print(f"Error during text embedding: {e}")
             return None
 
-    async def store_vector(self, prophecy_id: str, text: str):
-        """ベクトルとメタデータをSupabaseに保存"""
+    async def aembed_array(self, text: str) -> Optional[np.ndarray]:
+        """イベントループを止めずにテキストをfloat32配列に変換（同時リクエストはバッチ化）"""
         try:
-            embedding = self.embed_text(text)
-            if embedding:
+            embedding = await get_embedding_batcher(self.engine).embed(text)
+            return np.ascontiguousarray(embedding, dtype=np.float32)
+        except Exception as e:
+            print(f"Error during text embedding: {e}")
+            return None
+
+    async def aembed_text(self, text: str) -> List[float]:
+        """aembed_arrayのリスト版（互換用）"""
+        embedding = await self.aembed_array(text)
+        return None if embedding is None else embedding.tolist()
+
+    async def store_vector(self,
+                           prophecy_id: str,
+                           text: str,
+                           dedupe: Optional[bool] = None,
+                           oracle: Optional[str] = None,
+                           target_dates: Optional[List[str]] = None) -> Dict[str, Any]:
+        """ベクトルとメタデータをSupabaseに保存。同じオラクル内で重複・ほぼ重複する予言もベクトルは保存し、既存の予言IDをcanonical_idとして記録する"""
+        if dedupe is None:
+            dedupe = dedupe_enabled()
+        try:
+            embedding = await self.aembed_array(text)
+            if embedding is not None:
+                duplicate = await self.find_duplicate(text, embedding, oracle) if dedupe else None
+                canonical_id = duplicate["prophecy_id"] if duplicate else None
+                if duplicate:
+                    print(f"Prophecy {prophecy_id} duplicates {canonical_id} "
+                          f"(similarity {duplicate['similarity']:.3f})")
+
                 data = {
                     "prophecy_id": prophecy_id,
-                    "embedding": embedding,
+                    "embedding": embedding.tolist(),
                     "text": text
                 }
+                if canonical_id:
+                    data["canonical_id"] = canonical_id
                 
-                response = self.supabase.table("prophecy_vectors").insert(data).execute()
+                await execute(self.supabase.table("prophecy_vectors").insert(data))
                 print(f"Successfully stored vector for prophecy: {prophecy_id}")
-                return response.data
+                if local_index_enabled():
+                    self.index.add([prophecy_id], [text], [embedding], [oracle], [target_dates], [canonical_id])
+                result = {"prophecy_id": prophecy_id, "canonical_id": canonical_id or prophecy_id,
+                          "duplicate": duplicate is not None}
+                if duplicate:
+                    result["similarity"] = duplicate["similarity"]
+                return result
         except Exception as e:
             print(f"Error storing vector in Supabase: {e}")
             raise e
 
-    async def find_similar(self, text: str, limit: int = 5) -> List[str]:
+    async def find_duplicate(self, text: str, embedding: np.ndarray, oracle: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """同一テキスト（正規化後）または類似度がしきい値以上の既存予言を探す（oracle指定時はそのオラクル内のみ）"""
+        return await find_duplicate(self.supabase, self.index, text, embedding, oracle)
+
+    async def find_similar(self, text: str, limit: int = 5, oracle: Optional[str] = None) -> List[str]:
         """類似予言の検索"""
+        return [prophecy_id for prophecy_id, _ in await self.search_similar(text, top_k=limit, oracle=oracle)]
+
+    async def search_similar(self,
+                             text: str,
+                             top_k: int = 5,
+                             threshold: float = 0.7,
+                             oracle: Optional[str] = None) -> List[Tuple[str, float]]:
+        """類似予言の(prophecy_id, 類似度)を返す。oracle指定時はそのオラクルのパーティションだけを検索。ローカルインデックスが未構築ならRPCにフォールバック。重複として保存された予言はcanonical_idにまとめて1件として返す"""
         try:
-            query_embedding = self.embed_text(text)
-            if not query_embedding:
+            query_embedding = await self.aembed_array(text)
+            if query_embedding is None:
                 return []
 
-            response = self.supabase.rpc(
-                'match_prophecies',
-                {
-                    'query_embedding': query_embedding,
-                    'match_threshold': 0.7,
-                    'match_count': limit
-                }
-            ).execute()
+            if local_index_enabled() and self.index.ready:
+                hits = self.index.search(query_embedding, k=top_k, threshold=threshold, oracle=oracle)
+                return [(hit['prophecy_id'], hit['similarity']) for hit in hits]
 
-            return [item['prophecy_id'] for item in response.data]
+            matches = await match_distinct(self.supabase, query_embedding, top_k, threshold, oracle=oracle)
+            return [(item['prophecy_id'], item['similarity']) for item in matches]
         except Exception as e:
             print(f"Error during similarity search: {e}")
-            return [] 
\ No newline at end of file
+            return []
@@ -88,6 +88,18 @@ contract ProphecyNFT is ERC721, Ownable {
     }
 
     function updateReward(uint256 _tokenId, uint256 _reward) external onlyOwner {
+        _setReward(_tokenId, _reward);
+    }
+
+    // 精算結果をまとめて反映（1トランザクションで複数トークンの報酬を設定）
+    function updateRewards(uint256[] calldata _tokenIds, uint256[] calldata _rewards) external onlyOwner {
+        require(_tokenIds.length == _rewards.length, "Length mismatch");
+        for (uint256 i = 0; i < _tokenIds.length; i++) {
+            _setReward(_tokenIds[i], _rewards[i]);
+        }
+    }
+
+    function _setReward(uint256 _tokenId, uint256 _reward) internal {
         require(ownerOf(_tokenId) != address(0), "Nonexistent token");
         ProphecyData storage p = prophecies[_tokenId];
         require(!p.redeemed, "Already redeemed");
@@ -73,4 +73,68 @@ contract ProphecyNFTTest is Test {
         
         vm.stopPrank();
     }
-} 
\ No newline at end of file
+
+    function _createProphecies(uint256 count) internal returns (uint256[] memory tokenIds) {
+        tokenIds = new uint256[](count);
+        uint256[] memory targetDates = new uint256[](1);
+        targetDates[0] = block.timestamp + 1 days;
+
+        vm.startPrank(user);
+        for (uint256 i = 0; i < count; i++) {
+            tokenIds[i] = prophet.createProphecy("I think next iphone is se 4", 1_000_000, "BBC", targetDates);
+        }
+        vm.stopPrank();
+    }
+
+    function _reward(uint256 tokenId) internal view returns (uint256 reward) {
+        (, , , , reward, ) = prophet.prophecies(tokenId);
+    }
+
+    function test_UpdateRewards() public {
+        uint256[] memory tokenIds = _createProphecies(3);
+        uint256[] memory rewards = new uint256[](3);
+        rewards[0] = 1_500_000;
+        rewards[1] = 0;
+        rewards[2] = 700_000;
+
+        prophet.updateRewards(tokenIds, rewards);
+
+        for (uint256 i = 0; i < tokenIds.length; i++) {
+            assertEq(_reward(tokenIds[i]), rewards[i]);
+        }
+    }
+
+    function test_UpdateRewardsLengthMismatch() public {
+        uint256[] memory tokenIds = _createProphecies(2);
+        uint256[] memory rewards = new uint256[](1);
+        rewards[0] = 1_000_000;
+
+        vm.expectRevert("Length mismatch");
+        prophet.updateRewards(tokenIds, rewards);
+    }
+
+    function test_UpdateRewardsOnlyOwner() public {
+        uint256[] memory tokenIds = _createProphecies(1);
+        uint256[] memory rewards = new uint256[](1);
+        rewards[0] = 1_000_000;
+
+        vm.prank(user);
+        vm.expectRevert("Ownable: caller is not the owner");
+        prophet.updateRewards(tokenIds, rewards);
+    }
+
+    function test_UpdateRewardsRevertsForRedeemedToken() public {
+        uint256[] memory tokenIds = _createProphecies(2);
+        uint256[] memory rewards = new uint256[](2);
+        rewards[0] = 500_000;
+        rewards[1] = 500_000;
+        prophet.updateRewards(tokenIds, rewards);
+
+        vm.prank(user);
+        prophet.redeem(tokenIds[0]);
+
+        vm.expectRevert("Already redeemed");
+        prophet.updateRewards(tokenIds, rewards);
+        assertEq(_reward(tokenIds[1]), 500_000);
+    }
+}
@@ -18,6 +18,11 @@ def load_model():
 
 model = load_model()
 
+# 再実行のたびに全ステートメントを再エンコードしないようにキャッシュ
+@st.cache_data
+def encode_texts(texts):
+    return model.encode(list(texts))
+
 # Default example statements
 DEFAULT_STATEMENTS = """Alice, iPhone 16 will feature USB-C ports across all models, 500
 Bob, iPhone 16 Pro will have a periscope camera with 10x optical zoom, 300
@@ -129,8 +134,8 @@ if hasattr(st.session_state, 'calculation_done'):
         
         # 基本的なデータ準備（全ステップで使用）
         all_statements = [s.text for s in statements]
-        all_embeddings = model.encode(all_statements)
-        oracle_embedding = model.encode([oracle_sentence])[0]
+        all_embeddings = encode_texts(tuple(all_statements))
+        oracle_embedding = encode_texts((oracle_sentence,))[0]
         
         # 全embeddings（Oracle含む）
         combined_embeddings = np.vstack([all_embeddings, oracle_embedding.reshape(1, -1)])
@@ -154,10 +159,8 @@ if hasattr(st.session_state, 'calculation_done'):
         })
         
         # コサイン類似度の計算
-        similarities = np.array([
-            np.dot(emb, oracle_embedding) / (np.linalg.norm(emb) * np.linalg.norm(oracle_embedding))
-            for emb in all_embeddings
-        ])
+        statement_norms = np.linalg.norm(all_embeddings, axis=1) * np.linalg.norm(oracle_embedding)
+        similarities = (all_embeddings @ oracle_embedding) / statement_norms
         plot_df['Similarity'] = similarities
         
         # ステップごとの表示処理
@@ -238,10 +241,7 @@ if hasattr(st.session_state, 'calculation_done'):
             
         else:  # "4. Show Fund Transfer"
             # 資金移動後の金額を計算
-            plot_df['Final_Bet'] = [
-                s.supporters[0][1] * (1 + sim) if sim > 0 else s.supporters[0][1] * (1 - abs(sim))
-                for s, sim in zip(statements, similarities)
-            ]
+            plot_df['Final_Bet'] = plot_df['Initial_Bet'].to_numpy() * (1 + similarities)
             
             fig = px.scatter_3d(
                 plot_df,